@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -19,9 +20,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -62,6 +61,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -85,6 +86,12 @@ class Input(NamedTuple):
     proxy_server_options: ProxyServerOptions
     proxy_server_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    batcher_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    server_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_server_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
@@ -93,6 +100,7 @@ Output = benchmark.RecorderOutput
 class BatchedUnreplicatedNet:
     def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
         self._cluster = cluster.f(1)
+        self._port_base = cluster.port_base
         self._input = input
 
     class Placement(NamedTuple):
@@ -102,7 +110,7 @@ class BatchedUnreplicatedNet:
         proxy_servers: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify_one(h: host.Host) -> host.Endpoint:
             return host.Endpoint(h, next(ports))
@@ -151,17 +159,19 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                                                        self._connect)
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = BatchedUnreplicatedNet(self._cluster, input)
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
+
+        net = BatchedUnreplicatedNet(self._cluster.pool(args), input)
 
         # Write config file.
         config = net.config()
@@ -170,27 +180,19 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        # If we're monitoring the code, run garbage collection verbosely.
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
 
         # Launch batchers.
         batcher_procs: List[proc.Proc] = []
         for (i, batcher) in enumerate(net.placement().batchers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=batcher.host,
                 label=f'batcher_{i}',
-                cmd=java(input.batcher_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'batcher') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.batchedunreplicated.BatcherMain',
@@ -207,20 +209,19 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                     '--options.batchSize',
                     str(input.batcher_options.batch_size),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, batcher.host, p,
-                                           f'batcher_{i}')
             batcher_procs.append(p)
+        launcher.barrier()
         bench.log('Batchers started.')
 
         # Launch proxy_servers.
         proxy_server_procs: List[proc.Proc] = []
         for (i, proxy_server) in enumerate(net.placement().proxy_servers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_server.host,
                 label=f'proxy_server_{i}',
-                cmd=java(input.proxy_server_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_server') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.batchedunreplicated.ProxyServerMain',
@@ -237,18 +238,17 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                     '--options.flushEveryN',
                     str(input.proxy_server_options.flush_every_n),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_server.host, p,
-                                           f'proxy_server_{i}')
             proxy_server_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyServers started.')
 
         # Launch server.
-        server_proc = bench.popen(
+        server_proc = launcher.popen(
             host=net.placement().server.host,
             label=f'server',
-            cmd=java(input.server_jvm_heap_size) + [
+            cmd=jvm_util.java(input, 'server') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.batchedunreplicated.ServerMain',
@@ -266,11 +266,9 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                 '--options.flushEveryN',
                 str(input.server_options.flush_every_n),
             ],
+            profiled=input.profiled,
         )
-        if input.profiled:
-            server_proc = perf_util.JavaPerfProc(bench,
-                                                 net.placement().server.host,
-                                                 server_proc, f'server')
+        launcher.barrier()
         bench.log('Servers started.')
 
         # Launch Prometheus.
@@ -306,9 +304,9 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -318,13 +316,13 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.batchedunreplicated.ClientMain',
@@ -360,28 +358,38 @@ class BatchedUnreplicatedSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in batcher_procs + [server_proc] + proxy_server_procs:
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'batchers': batcher_procs,
+                                   'server': [server_proc],
+                                   'proxy_servers': proxy_server_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(batcher_procs + [server_proc] + proxy_server_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_labeled_recorder_data(
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)['write']
 
 
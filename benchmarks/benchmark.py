@@ -13,25 +13,42 @@
 #
 # This file contains utilities for running and organizing benchmarks suites.
 
+from . import ci_util
+from . import flamegraph_util
+from . import gc_util
 from . import host
+from . import jvm_util
 from . import pd_util
 from . import proc
+from . import recorder_util
+from . import recovery_util
+from . import resource_util
+from . import steady_state_util
 from . import util
-from typing import (Any, Collection, Dict, Generic, Iterable, IO, List,
-                    NamedTuple, Optional, Sequence, Tuple, TypeVar, Union)
+from typing import (Any, Callable, Collection, Counter, Dict, Generic, Iterable,
+                    IO, List, NamedTuple, Optional, Sequence, Tuple, TypeVar,
+                    Union)
+import collections
 import colorful
+import concurrent.futures
 import contextlib
 import csv
 import datetime
 import datetime
+import glob
+import hashlib
 import json
+import math
 import os
 import pandas as pd
 import queue
 import random
+import socket
 import string
 import subprocess
 import threading
+import time
+import typing
 
 
 def _random_string(n: int) -> str:
@@ -66,15 +83,129 @@ class _Reaped(object):
             f.write(str(returncode) + '\n')
 
 
+# BenchmarkAborted is raised by BenchmarkDirectory.wait_for_clients when the
+# watchdog aborts a benchmark, and by BenchmarkDirectory.wait_until_ready when
+# a role never starts serving. Suites record an aborted benchmark as failed
+# and move on to the next one (see Suite.run_suite).
+class BenchmarkAborted(Exception):
+    pass
+
+
+# A _Watchdog watches a running benchmark from a background thread. It aborts
+# the benchmark, by killing all of its processes, if
+#
+#   - the clients' recorder data stops growing for `stall_timeout` (or doesn't
+#     start growing within `startup_timeout`), which means that no requests
+#     are being completed, or
+#   - a process in one of `roles` exits while the clients are still running,
+#     which means that a role crashed.
+#
+# Clients buffer their recorder data, so it grows in bursts. `stall_timeout`
+# has to be long enough for a client to fill its buffer at the lowest
+# throughput a benchmark expects. If `stall_timeout` is falsy, we only watch
+# for exited roles.
+class _Watchdog(threading.Thread):
+    def __init__(self, bench: 'BenchmarkDirectory',
+                 clients: Sequence[proc.Proc],
+                 roles: Dict[str, Sequence[proc.Proc]], data_glob: str,
+                 stall_timeout: Optional[datetime.timedelta],
+                 startup_timeout: datetime.timedelta,
+                 poll_interval: datetime.timedelta) -> None:
+        super().__init__(daemon=True)
+        self._bench = bench
+        self._clients = clients
+        self._roles = roles
+        self._data_glob = data_glob
+        self._stall_timeout = stall_timeout
+        self._startup_timeout = startup_timeout
+        self._poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._data_size = 0
+        self._data_grew_at = time.monotonic()
+
+        # Why the benchmark was aborted, or None if it wasn't.
+        self.reason: Optional[str] = None
+
+    def _total_data_size(self) -> int:
+        size = 0
+        for filename in glob.glob(self._bench.abspath(self._data_glob)):
+            try:
+                size += os.path.getsize(filename)
+            except OSError:
+                pass
+        return size
+
+    def _check(self) -> Optional[str]:
+        """_check returns why the benchmark should be aborted, if it should."""
+        for (role, procs) in self._roles.items():
+            for (i, p) in enumerate(procs):
+                returncode = p.poll()
+                if returncode is not None:
+                    return (f'{role} {i} exited with return code '
+                            f'{returncode} while clients were running.')
+
+        if not self._stall_timeout:
+            return None
+        now = time.monotonic()
+        size = self._total_data_size()
+        if size > self._data_size:
+            self._data_size = size
+            self._data_grew_at = now
+        if self._data_size == 0:
+            if now - self._data_grew_at > self._startup_timeout.total_seconds():
+                return (f'No client recorded any data within '
+                        f'{self._startup_timeout}.')
+        elif now - self._data_grew_at > self._stall_timeout.total_seconds():
+            return f'No client recorded any data for {self._stall_timeout}.'
+        return None
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._poll_interval.total_seconds()):
+            reason = self._check()
+            if reason is None:
+                continue
+
+            self.reason = reason
+            self._bench.log(f'Watchdog aborting benchmark. {reason}')
+            procs = list(self._clients)
+            for role_procs in self._roles.values():
+                procs += role_procs
+            for p in procs:
+                try:
+                    p.kill()
+                except Exception as e:
+                    self._bench.log(f'Watchdog failed to kill {p.cmd()}: {e}')
+            return
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
 # A SuiteDirectory is a directory in which you can run a suite. It has
 # convenient methods to record information within the directory (e.g., the
 # start time, the set of inputs). It also contains methods to create
 # subdirectories for each benchmark in the suite.
+#
+# If `resume` is true, `path` is instead an existing suite directory (e.g., one
+# left behind by a suite that crashed), and new benchmark directories are
+# numbered after the existing ones.
 class SuiteDirectory(object):
-    def __init__(self, path: str, name: str = None) -> None:
+    def __init__(self, path: str, name: str = None,
+                 resume: bool = False) -> None:
         assert os.path.exists(path)
 
         self.benchmark_dir_id = 1
+        self._lock = threading.Lock()
+
+        if resume:
+            self.path = os.path.abspath(path)
+            for filename in os.listdir(self.path):
+                prefix = filename.split('_')[0]
+                if prefix.isdigit():
+                    self.benchmark_dir_id = max(self.benchmark_dir_id,
+                                                int(prefix) + 1)
+            return
 
         name_suffix = ("_" + name) if name else ""
         self.path = os.path.join(
@@ -109,14 +240,130 @@ class SuiteDirectory(object):
         return self.abspath(filename)
 
     def benchmark_directory(self, name: str = None) -> 'BenchmarkDirectory':
-        benchmark_dir_id = self.benchmark_dir_id
-        self.benchmark_dir_id += 1
+        with self._lock:
+            benchmark_dir_id = self.benchmark_dir_id
+            self.benchmark_dir_id += 1
         name_suffix = ("_" + name) if name else ""
         path = os.path.join(self.path, "{:03}{}".format(benchmark_dir_id,
                                                         name_suffix))
         return BenchmarkDirectory(path)
 
 
+# placement_endpoints returns the endpoints of the roles in `placement`, a
+# NamedTuple of endpoints and (possibly nested) lists of endpoints, keyed by
+# role. By default, every role but clients and drivers is returned, since those
+# are the roles that a benchmark waits on before launching clients. For
+# example,
+#
+#     bench.wait_until_ready(placement_endpoints(net.placement()))
+def placement_endpoints(
+        placement: Any,
+        roles: Optional[Collection[str]] = None
+) -> Dict[str, List[host.Endpoint]]:
+    def flatten(x: Any) -> List[host.Endpoint]:
+        if isinstance(x, host.Endpoint):
+            return [x]
+        elif isinstance(x, list):
+            return [e for y in x for e in flatten(y)]
+        else:
+            return []
+
+    if roles is None:
+        roles = [
+            role for role in placement._fields
+            if role not in ('clients', 'driver')
+        ]
+    return {role: flatten(getattr(placement, role)) for role in roles}
+
+
+# placement_labels returns the label of the process at every endpoint in
+# `placement` (see placement_endpoints), following the convention that every
+# benchmark uses to label processes: the process at `acceptors[1][2]` is
+# labeled `acceptor_1_2`, and the process at `server` is labeled `server`.
+# Some roles listen on more than one port (e.g., a leader's leader election
+# port), and their extra ports are placed in separate fields named after them
+# (e.g., `leader_elections`). Those fields are skipped.
+def placement_labels(placement: Any) -> List[Tuple[str, host.Endpoint]]:
+    def labels(x: Any, label: str) -> List[Tuple[str, host.Endpoint]]:
+        if isinstance(x, host.Endpoint):
+            return [(label, x)]
+        elif isinstance(x, list):
+            return [
+                l for (i, y) in enumerate(x) for l in labels(y, f'{label}_{i}')
+            ]
+        else:
+            return []
+
+    result: List[Tuple[str, host.Endpoint]] = []
+    for field in placement._fields:
+        if field.endswith('heartbeats') or field.endswith('elections'):
+            continue
+        role = field[:-1] if field.endswith('s') else field
+        result += labels(getattr(placement, field), role)
+    return result
+
+
+# When several processes share a machine, they fight over its cores, and the
+# results of a benchmark depend on how the scheduler happens to place them.
+# assign_cpus takes the label and endpoint of every process of a benchmark
+# (typically from placement_labels) and splits the cores of every host into
+# disjoint, contiguous ranges, one per process on the host. It returns the
+# range of every process keyed by label. Ranges are as even as possible, with
+# the first processes getting one extra core if the cores don't divide evenly.
+# On hosts with more than one NUMA node, cores are ordered by node, and a range
+# that fits within a node binds the memory of its process to that node too. If
+# a host has more processes than cores, processes share cores round robin, one
+# core each. For example,
+#
+#     bench.pin_cpus(assign_cpus(placement_labels(net.placement())))
+def assign_cpus(
+        processes: Iterable[Tuple[str,
+                                  host.Endpoint]]) -> Dict[str, host.CpuSet]:
+    by_host: Dict[str, Tuple[host.Host, List[str]]] = dict()
+    for (label, endpoint) in processes:
+        ip = endpoint.host.ip()
+        if ip not in by_host:
+            by_host[ip] = (endpoint.host, [])
+        by_host[ip][1].append(label)
+
+    assignment: Dict[str, host.CpuSet] = dict()
+    for (h, labels) in by_host.values():
+        nodes = h.cpus()
+        cpus = sorted(nodes, key=lambda cpu: (nodes[cpu], cpu))
+        numa = len(set(nodes.values())) > 1
+        if len(labels) > len(cpus):
+            chunks = [[cpus[i % len(cpus)]] for i in range(len(labels))]
+        else:
+            (size, extra) = divmod(len(cpus), len(labels))
+            chunks = []
+            start = 0
+            for i in range(len(labels)):
+                stop = start + size + (1 if i < extra else 0)
+                chunks.append(cpus[start:stop])
+                start = stop
+
+        for (label, chunk) in zip(labels, chunks):
+            chunk_nodes = {nodes[cpu] for cpu in chunk}
+            numa_node = None
+            if numa and len(chunk_nodes) == 1:
+                numa_node = chunk_nodes.pop()
+            assignment[label] = host.CpuSet(tuple(sorted(chunk)), numa_node)
+    return assignment
+
+
+def _tcp_ready(endpoint: host.Endpoint) -> bool:
+    try:
+        with socket.create_connection((endpoint.host.ip(), endpoint.port),
+                                      timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+# The unit of the counts of every profiling mode (see perf_util.PROFILE_MODES).
+_PROFILE_UNITS = {'cpu': 'samples', 'alloc': 'bytes', 'lock': 'ns'}
+
+
 # A BenchmarkDirectory is like a SuiteDirectory. It provides methods to record
 # information about a benchmark as well as other helpful methods. For example,
 # the popen method allows you to run an executable and record its standard out,
@@ -142,6 +389,30 @@ class BenchmarkDirectory(object):
         # Whether we have already exited. We want to avoid exiting twice.
         self.exited = False
 
+        # Processes may be launched concurrently (see launch_util), so we
+        # guard process_stack and pids.
+        self._lock = threading.Lock()
+
+        # If resource_sample_interval is set, we sample the resource usage of
+        # every process we launch (see resource_util). `_samplers` maps the ip
+        # address of every host with a sampler to the sampler's output file.
+        self.resource_sample_interval: Optional[datetime.timedelta] = None
+        self._samplers: Dict[str, str] = dict()
+
+        # The cores to pin processes to, keyed by label (see pin_cpus), and the
+        # host and cores of every process that was pinned.
+        self.cpu_sets: Dict[str, host.CpuSet] = dict()
+        self.pinned: Dict[str, Tuple[str, host.CpuSet]] = dict()
+
+        # The profiler that profiled processes are profiled with, and what it
+        # profiles (see perf_util.profile).
+        self.profiler: str = 'async_profiler'
+        self.profile_modes: List[str] = ['cpu']
+
+        # The labels of the processes that log their garbage collections to
+        # their stdout (see jvm_util.GC_LOG_FLAGS).
+        self.gc_logged: List[str] = []
+
     def __str__(self) -> str:
         return f'BenchmarkDirectory({self.path})'
 
@@ -159,6 +430,11 @@ class BenchmarkDirectory(object):
         self.write_dict(
             'pids.json',
             {f'{ip}:{pid}': label for ((ip, pid), label) in self.pids.items()})
+        if len(self._samplers) > 0:
+            self._summarize_resources()
+        if len(self.gc_logged) > 0:
+            self._summarize_gc()
+        self._render_flamegraphs()
         self.write_string('stop_time.txt', str(datetime.datetime.now()))
 
     def abspath(self, filename: str) -> str:
@@ -180,8 +456,11 @@ class BenchmarkDirectory(object):
         self.logfile.write(f'[{_pretty_now_string()}] {s}\n')
         self.logfile.flush()
 
-    def popen(self, host: host.Host, label: str,
-              cmd: Union[str, Sequence[str]]) -> proc.Proc:
+    def popen(self,
+              host: host.Host,
+              label: str,
+              cmd: Union[str, Sequence[str]],
+              cpus: Optional[host.CpuSet] = None) -> proc.Proc:
         """Runs a command within this directory.
 
         `popen` runs a command, recording the command, its stdout, its stderr,
@@ -193,18 +472,328 @@ class BenchmarkDirectory(object):
         and stderr of `ls -l` are written to `ls_out.txt` and `ls_err.txt`
         respectively. The return code of `ls -l` is return to
         `ls_returncode.txt`.
+
+        If `cpus` is given, or if `label` was assigned cores with `pin_cpus`,
+        the command is pinned to those cores, and the assignment is recorded
+        in `cpus.json`.
         """
+        if cpus is None:
+            cpus = self.cpu_sets.get(label)
+        args = cmd.split() if isinstance(cmd, str) else cmd
+        if jvm_util.GC_LOG_FLAGS[0] in args:
+            with self._lock:
+                self.gc_logged.append(label)
         proc = host.popen(cmd,
                           stdout=self.abspath(f'{label}_out.txt'),
-                          stderr=self.abspath(f'{label}_err.txt'))
+                          stderr=self.abspath(f'{label}_err.txt'),
+                          cpus=cpus)
         self.write_string(f'{label}_cmd.txt', proc.cmd())
-        self.process_stack.enter_context(
-            _Reaped(proc, self.abspath(f'{label}_returncode.txt')))
+        if cpus is not None:
+            with self._lock:
+                self.pinned[label] = (host.ip(), cpus)
+                self.write_dict(
+                    'cpus.json', {
+                        l: {
+                            'host': ip,
+                            'cpus': c.cpulist(),
+                            'numa_node': c.numa_node,
+                        } for (l, (ip, c)) in self.pinned.items()
+                    })
+        with self._lock:
+            self.process_stack.enter_context(
+                _Reaped(proc, self.abspath(f'{label}_returncode.txt')))
         pid = proc.pid()
         if pid:
-            self.pids[(host.ip(), pid)] = label
+            with self._lock:
+                self.pids[(host.ip(), pid)] = label
+                if self.resource_sample_interval:
+                    self._sample(host, pid)
         return proc
 
+    def pin_cpus(self, cpu_sets: Dict[str, host.CpuSet]) -> None:
+        """
+        pin_cpus pins every process launched from now on with a label in
+        `cpu_sets` to the label's cores (see assign_cpus).
+        """
+        self.cpu_sets.update(cpu_sets)
+
+    def _render_flamegraphs(self) -> None:
+        """
+        _render_flamegraphs merges the collapsed stacks of every profiled
+        process (see perf_util.AsyncProfilerProc) by role and profiling mode.
+        The collapsed stacks of role r and mode m are written to
+        flamegraph_r_m.collapsed, and their flame graph to flamegraph_r_m.svg.
+        """
+        suffix = '.collapsed'
+        profiles: Dict[Tuple[str, str], List[str]] = dict()
+        for filename in glob.glob(self.abspath(f'*_profile_*{suffix}')):
+            name = os.path.basename(filename)[:-len(suffix)]
+            (label, mode) = name.rsplit('_profile_', 1)
+            profiles.setdefault((resource_util.role(label), mode),
+                                []).append(filename)
+
+        for ((role, mode), filenames) in sorted(profiles.items()):
+            self.log(f'Rendering {mode} flame graph of {role}.')
+            stacks = flamegraph_util.merge(
+                flamegraph_util.read_collapsed(f) for f in filenames)
+            name = f'flamegraph_{role}_{mode}'
+            flamegraph_util.write_collapsed(stacks,
+                                            self.abspath(f'{name}{suffix}'))
+            unit = _PROFILE_UNITS.get(mode, 'samples')
+            svg = flamegraph_util.render(stacks, f'{role} ({mode})', unit=unit)
+            self.write_string(f'{name}.svg', svg)
+
+    def _sample(self, host: host.Host, pid: int) -> None:
+        """
+        _sample samples the resource usage of process `pid` on `host`, starting
+        a sampler on `host` if there isn't one already. The caller must hold
+        self._lock.
+        """
+        # The sampler rereads the pids file every time it samples.
+        ip = host.ip()
+        with open(self.abspath(f'resources_{ip}_pids.txt'), 'a') as f:
+            f.write(f'{pid}\n')
+        if ip in self._samplers:
+            return
+
+        output = self.abspath(f'resources_{ip}.txt')
+        assert self.resource_sample_interval is not None
+        sampler = host.popen(
+            [
+                'python3',
+                resource_util.SAMPLER,
+                '--pids_file',
+                self.abspath(f'resources_{ip}_pids.txt'),
+                '--output',
+                output,
+                '--interval',
+                str(self.resource_sample_interval.total_seconds()),
+            ],
+            stdout=self.abspath(f'resources_{ip}_sampler_out.txt'),
+            stderr=self.abspath(f'resources_{ip}_sampler_err.txt'))
+        self.process_stack.enter_context(
+            _Reaped(sampler,
+                    self.abspath(f'resources_{ip}_sampler_returncode.txt')))
+        self._samplers[ip] = output
+
+    def _summarize_resources(self) -> None:
+        """
+        _summarize_resources converts the samplers' output into per-process
+        (resources.csv) and per-host (host_resources.csv) time series, writes
+        the peak CPU usage of every role to peak_cpu.json, and ranks the roles
+        by how saturated they were in bottlenecks.json. If the steady state of
+        the benchmark was detected (see steady_state.json), we rank roles by
+        their saturation in the steady state only.
+        """
+        processes: List[pd.DataFrame] = []
+        hosts: List[pd.DataFrame] = []
+        for (ip, filename) in self._samplers.items():
+            if not os.path.exists(filename):
+                self.log(f'Resource sampler on {ip} wrote no output.')
+                continue
+            samples = resource_util.read_samples(filename)
+            samples.processes.insert(1, 'host', ip)
+            samples.processes.insert(
+                3, 'label',
+                [self.pids.get((ip, pid), '') for pid in samples.processes.pid])
+            samples.host.insert(1, 'host', ip)
+            processes.append(samples.processes)
+            hosts.append(samples.host)
+        if len(processes) == 0:
+            return
+
+        df = pd.concat(processes, ignore_index=True)
+        df.to_csv(self.abspath('resources.csv'), index=False)
+        pd.concat(hosts, ignore_index=True).to_csv(
+            self.abspath('host_resources.csv'), index=False)
+        self.write_dict('peak_cpu.json', resource_util.peak_cpu(df))
+
+        window: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None
+        if os.path.exists(self.abspath('steady_state.json')):
+            with open(self.abspath('steady_state.json')) as f:
+                steady_state = json.load(f)
+            window = (pd.Timestamp(steady_state['start']),
+                      pd.Timestamp(steady_state['stop']))
+        bottlenecks = [{
+            'role': role,
+            'saturation': saturation
+        } for (role, saturation) in resource_util.rank_bottlenecks(df, window)]
+        self.write_dict('bottlenecks.json', {'bottlenecks': bottlenecks})
+        self.log('Resource usage summarized.')
+
+    def _summarize_gc(self) -> None:
+        """
+        _summarize_gc reads the garbage collections logged by every JVM in
+        gc_logged (see gc_util) into gc_pauses.csv and summarizes the pauses of every role in
+        gc.json. If the recorder data was parsed (see parse_recorder_data),
+        the p99 client latency of every window in latency_windows.csv is
+        written to gc_latency_windows.csv, along with the pauses of the roles
+        in the commit path that overlap it, and gc.json also counts the
+        windows whose p99 latency spiked and how many of them overlap a pause.
+        """
+        processes: List[pd.DataFrame] = []
+        for label in sorted(set(self.gc_logged)):
+            filename = self.abspath(f'{label}_out.txt')
+            if not os.path.exists(filename):
+                continue
+            process_pauses = gc_util.read_pauses(filename)
+            if len(process_pauses) == 0:
+                continue
+            df = pd.DataFrame(process_pauses, columns=gc_util.Pause._fields)
+            df.insert(0, 'label', label)
+            df.insert(1, 'role', resource_util.role(label))
+            processes.append(df)
+        if len(processes) == 0:
+            return
+
+        pauses = pd.concat(processes, ignore_index=True)
+        pauses.to_csv(self.abspath('gc_pauses.csv'), index=False)
+        summary: Dict[str, Any] = {
+            'roles': {
+                role: gc._asdict()
+                for (role, gc) in gc_util.role_gc(pauses).items()
+            }
+        }
+
+        if os.path.exists(self.abspath('latency_windows.csv')):
+            windows = gc_util.flag_windows(
+                pd.read_csv(self.abspath('latency_windows.csv')), pauses)
+            windows.to_csv(self.abspath('gc_latency_windows.csv'), index=False)
+            spikes = windows[windows['spike']]
+            summary['p99_spikes'] = len(spikes)
+            summary['p99_spikes_during_gc'] = int(
+                (spikes['gc_pause_ms'] > 0).sum())
+        self.write_dict('gc.json', summary)
+        self.log('Garbage collections summarized.')
+
+    def gc(self) -> Dict[str, Any]:
+        """
+        gc returns the summary of the garbage collections written to gc.json
+        (see _summarize_gc), or an empty dict if no JVM logged any.
+        """
+        filename = self.abspath('gc.json')
+        if not os.path.exists(filename):
+            return dict()
+        with open(filename) as f:
+            return json.load(f)
+
+    def peak_cpu(self) -> Dict[str, float]:
+        """
+        peak_cpu returns the peak CPU usage of every role, as a percentage of
+        one core, or an empty dict if resources weren't sampled.
+        """
+        filename = self.abspath('peak_cpu.json')
+        if not os.path.exists(filename):
+            return dict()
+        with open(filename) as f:
+            return json.load(f)
+
+    def bottleneck_role(self) -> Optional[str]:
+        """
+        bottleneck_role returns the most saturated role (see
+        resource_util.rank_bottlenecks), or None if resources weren't sampled.
+        """
+        filename = self.abspath('bottlenecks.json')
+        if not os.path.exists(filename):
+            return None
+        with open(filename) as f:
+            bottlenecks = json.load(f)['bottlenecks']
+        return bottlenecks[0]['role'] if len(bottlenecks) > 0 else None
+
+    def resource_columns(self) -> Dict[str, Any]:
+        """
+        resource_columns returns the summary of the sampled resource usage and
+        of the garbage collections that Suite.run_suite adds to results.csv.
+        """
+        columns: Dict[str, Any] = dict()
+        bottleneck_role = self.bottleneck_role()
+        if bottleneck_role is not None:
+            columns['bottleneck_role'] = bottleneck_role
+        for (role, cpu) in sorted(self.peak_cpu().items()):
+            columns[f'peak_cpu.{role}'] = cpu
+        gc = self.gc()
+        for (role, summary) in sorted(gc.get('roles', dict()).items()):
+            for (field, value) in summary.items():
+                columns[f'gc_{field}.{role}'] = value
+        for field in ['p99_spikes', 'p99_spikes_during_gc']:
+            if field in gc:
+                columns[f'gc_{field}'] = gc[field]
+        return columns
+
+    def wait_until_ready(
+        self,
+        roles: Dict[str, List[host.Endpoint]],
+        timeout: datetime.timedelta = datetime.timedelta(seconds=60),
+        poll_interval: datetime.timedelta = datetime.timedelta(milliseconds=100)
+    ) -> None:
+        """Waits until every role is serving.
+
+        A role is ready once every one of its endpoints accepts TCP
+        connections. The time each role took to become ready is written to
+        `readiness.json`. If a role isn't ready within `timeout`, the
+        benchmark is aborted with a BenchmarkAborted, rather than starting
+        clients that can't connect.
+        """
+        start = time.time()
+        pending = {role: list(endpoints) for (role, endpoints) in roles.items()}
+        readiness: Dict[str, Optional[float]] = dict()
+        while True:
+            for role in list(pending.keys()):
+                pending[role] = [e for e in pending[role] if not _tcp_ready(e)]
+                if len(pending[role]) == 0:
+                    del pending[role]
+                    readiness[role] = time.time() - start
+                    self.log(f'{role} ready after {readiness[role]:.3f}s.')
+
+            if (len(pending) == 0 or
+                    time.time() - start > timeout.total_seconds()):
+                break
+            time.sleep(poll_interval.total_seconds())
+
+        for (role, endpoints) in pending.items():
+            readiness[role] = None
+            addresses = [f'{e.host.ip()}:{e.port}' for e in endpoints]
+            self.log(f'{role} not ready after {timeout}. {addresses} are not '
+                     'accepting connections.')
+        self.write_dict('readiness.json', readiness)
+        if len(pending) > 0:
+            raise BenchmarkAborted(
+                f'{", ".join(pending)} not ready after {timeout}.')
+
+    def wait_for_clients(
+        self,
+        clients: Sequence[proc.Proc],
+        roles: Dict[str, Sequence[proc.Proc]] = {},
+        stall_timeout: Optional[datetime.timedelta] = None,
+        startup_timeout: datetime.timedelta = datetime.timedelta(minutes=2),
+        poll_interval: datetime.timedelta = datetime.timedelta(seconds=1),
+        data_glob: str = 'client_*_data.*'
+    ) -> None:
+        """Waits for every client to finish, watching for hung benchmarks.
+
+        While the clients run, a watchdog thread watches the recorder data in
+        the files matching `data_glob` and the processes in `roles` (see
+        _Watchdog). If the data stops growing for `stall_timeout`, or if a
+        role's process exits, the watchdog kills every process, the reason is
+        written to `aborted.txt`, and BenchmarkAborted is raised. For example,
+
+            bench.wait_for_clients(client_procs,
+                                   {'leaders': leader_procs},
+                                   stall_timeout=args.get('stall_timeout'))
+        """
+        watchdog = _Watchdog(self, clients, roles, data_glob, stall_timeout,
+                             startup_timeout, poll_interval)
+        watchdog.start()
+        try:
+            for p in clients:
+                p.wait()
+        finally:
+            watchdog.stop()
+
+        if watchdog.reason is not None:
+            self.write_string('aborted.txt', watchdog.reason)
+            raise BenchmarkAborted(watchdog.reason)
+
 
 # A Suite represents a benchmark suite. A suite is parameterized on an input
 # type Input and output type Output. A suite must provide
@@ -217,6 +806,43 @@ Input = TypeVar('Input')
 Output = TypeVar('Output')
 
 
+# A LoadSearch describes an adaptive search for the peak throughput of a
+# single configuration (see Suite.run_search). `base` is the configuration,
+# and `load(base, n)` is the configuration under load n (e.g., with n client
+# processes). `throughput` and `latency_ms` extract the throughput and latency
+# from an output. For example,
+#
+#     LoadSearch(
+#         base=Input(...),
+#         load=lambda input, n: input._replace(num_client_procs=n),
+#         throughput=lambda output: output.start_throughput_1s.p90,
+#         latency_ms=lambda output: output.latency.median_ms,
+#         slo_ms=5,
+#     )
+#
+# The search starts at load `initial_load` and multiplies the load by `growth`
+# for as long as throughput keeps rising and latency stays within `slo_ms` (if
+# given). Throughput is rising if it grows by at least `min_gain` - 1 times the
+# relative increase in load (e.g., by 5% when the load doubles). If the SLO was
+# violated, the search then bisects for the largest load that meets it.
+# Otherwise, throughput has leveled off, and the search bisects for the
+# smallest load whose throughput is within a factor of `min_gain` of the peak.
+# Bisection stops when the bounds are within `resolution` (as a fraction of
+# the load) or when `max_probes` benchmarks have run.
+class LoadSearch(NamedTuple):
+    base: Any
+    load: Callable[[Any, int], Any]
+    throughput: Callable[[Any], float]
+    latency_ms: Callable[[Any], float] = lambda output: math.nan
+    slo_ms: Optional[float] = None
+    initial_load: int = 1
+    growth: float = 2
+    max_load: int = 1024
+    min_gain: float = 1.05
+    resolution: float = 0.1
+    max_probes: int = 8
+
+
 class Suite(Generic[Input, Output]):
     # `args` returns a set of global arguments, typically passed in via the
     # command line.
@@ -242,69 +868,580 @@ class Suite(Generic[Input, Output]):
                       input: Input) -> Output:
         raise NotImplementedError("")
 
+    # `run_suite` runs every input and records the results in `suite_dir`.
+    #
+    # By default, benchmarks are run one at a time. If args['num_pools'] is
+    # n > 1, the cluster's machines are split into n disjoint pools (see
+    # cluster.Cluster.pools), and up to n benchmarks are run concurrently, one
+    # per pool. The pool a benchmark was assigned is passed to `run_benchmark`
+    # in args['pool_index']. Either way, results are written to results.csv in
+    # input order.
+    #
+    # If args['resume'] is the path of an existing suite directory, the suite
+    # is resumed in that directory instead of `suite_dir`. Every input that
+    # already has a row in its results.csv is skipped (see `_input_hash`), and
+    # the results of the remaining inputs are appended to the same file.
+    #
+    # If args['columnar'] is true, results.csv is also converted to
+    # results.arrow once every benchmark has finished (see
+    # pd_util.write_columnar).
+    #
+    # If args['ci_metric'] is the name of an output column in results.csv
+    # (e.g., 'start_throughput_1s.p90'), inputs are repeated until they're
+    # precise enough. Once every input has run, we compute a bootstrap
+    # confidence interval on the mean of the metric for every distinct input
+    # (see ci_util). Every input whose interval is wider than
+    # args['ci_width'] (as a fraction of the mean) is run again, up to
+    # args['max_repeats'] times in total, and so on. The intervals are written
+    # to results_ci.csv after every round.
+    #
+    # If a benchmark is aborted (see BenchmarkDirectory.wait_for_clients), its
+    # row in results.csv has the input but no output, and the suite moves on.
+    # A resumed suite reruns aborted inputs.
+    #
+    # If args['sample_resources'] is true, the resource usage of every process
+    # is sampled (see BenchmarkDirectory.resource_sample_interval), and a
+    # summary of it (see BenchmarkDirectory.resource_columns) is added to
+    # results.csv after the output: the most saturated role in column
+    # bottleneck_role and the peak CPU usage of every role in columns
+    # peak_cpu.<role>. Likewise, if the JVMs log their garbage collections
+    # (i.e., if the benchmark is monitored), the total pause time, longest
+    # pause, and allocation rate of every role are added in columns
+    # gc_total_pause_ms.<role>, gc_max_pause_ms.<role>, and
+    # gc_alloc_mb_per_s.<role>, along with the number of windows whose p99
+    # latency spiked (gc_p99_spikes) and how many of them overlap a pause of
+    # a role in the commit path (gc_p99_spikes_during_gc). See
+    # BenchmarkDirectory._summarize_gc. If a benchmark has columns that the
+    # benchmarks before it didn't, they're added to results.csv and left empty
+    # in the earlier rows.
     def run_suite(self, suite_dir: SuiteDirectory) -> None:
-        print(f'Running suite in {suite_dir.path}.')
-
         # Sanity check args and inputs.
         args = self.args()
         inputs = self.inputs()
         assert len(inputs) > 0, inputs
+        num_pools = args.get('num_pools') or 1
+        assert num_pools >= 1, num_pools
+        ci_metric: Optional[str] = args.get('ci_metric')
+        ci_width: float = args.get('ci_width') or 0.05
+        max_repeats: int = args.get('max_repeats') or 10
+
+        metric_values: Dict[str, List[float]]
+        if args.get('resume'):
+            suite_dir.write_string('resume.txt', args['resume'])
+            suite_dir = SuiteDirectory(args['resume'], resume=True)
+            print(f'Resuming suite in {suite_dir.path}.')
+            completed = self._completed_input_hashes(suite_dir, inputs)
+            metric_values = (self._completed_metric_values(
+                suite_dir, inputs, ci_metric) if ci_metric else {})
+        else:
+            print(f'Running suite in {suite_dir.path}.')
+            completed = collections.Counter()
+            metric_values = dict()
+
+            # Record args and inputs.
+            suite_dir.write_dict('args.json', args)
+            suite_dir.write_string('inputs.txt',
+                                   '\n'.join(str(i) for i in inputs))
+
+        # Inputs may be repeated, so we skip only as many copies of an input
+        # as have already completed.
+        pending: List[Input] = []
+        for input in inputs:
+            h = _input_hash(input)
+            if completed[h] > 0:
+                completed[h] -= 1
+            else:
+                pending.append(input)
+        if len(pending) < len(inputs):
+            print(f'Skipping {len(inputs) - len(pending)} completed inputs.')
+
+        # The distinct inputs, in order, for computing confidence intervals.
+        distinct_inputs: Dict[str, Input] = dict()
+        for input in inputs:
+            distinct_inputs.setdefault(_input_hash(input), input)
+
+        def inputs_to_repeat() -> List[Input]:
+            if not ci_metric:
+                return []
+            intervals = {
+                h: ci_util.bootstrap(metric_values.get(h, []))
+                for h in distinct_inputs
+            }
+            self._write_confidence_intervals(suite_dir, ci_metric,
+                                             distinct_inputs, intervals)
+            return [
+                distinct_inputs[h]
+                for (h, ci) in intervals.items()
+                if not ci.narrower_than(ci_width) and
+                len(metric_values.get(h, [])) < max_repeats
+            ]
+
+        inputs = pending if len(pending) > 0 else inputs_to_repeat()
+        if len(inputs) == 0:
+            return
+
+        # The file to record suite results. The resource columns of a resumed
+        # suite are already in its header.
+        results_filename = suite_dir.abspath('results.csv')
+        header_written = [
+            os.path.exists(results_filename) and
+            os.path.getsize(results_filename) > 0
+        ]
+        resource_columns: List[str] = []
+        if header_written[0]:
+            with open(results_filename, 'r') as f:
+                header = next(csv.reader(f))
+            resource_columns = [c for c in header if _is_resource_column(c)]
+
+        # Benchmarks may finish out of order. `finished` holds the outputs of
+        # the benchmarks that have finished but whose results have not yet
+        # been written because an earlier benchmark is still running.
+        lock = threading.Lock()
+        finished: Dict[int, Tuple[Input, Optional[Output],
+                                  Dict[str, Any]]] = dict()
+        next_to_write = [1]
+        num_finished = [0]
+        num_inputs = [len(inputs)]
+        output_fields: List[Optional[List[str]]] = [None]
+
+        def write_results() -> None:
+            while next_to_write[0] in finished:
+                i = next_to_write[0]
+                (input, output, resources) = finished.pop(i)
+
+                # An aborted benchmark has no output, so we get the output
+                # fields from an earlier output or, failing that, from the
+                # Output type.
+                fields: List[str]
+                if output is not None:
+                    fields = output_fields[0] = util.flatten_tuple_fields(
+                        output)
+                    output_values = util.flatten_tuple(output)
+                else:
+                    previous_fields = output_fields[0]
+                    if previous_fields is None:
+                        fields = output_fields[0] = self._output_fields()
+                    else:
+                        fields = previous_fields
+                    output_values = [''] * len(fields)
+
+                # A benchmark may summarize resources that earlier ones
+                # didn't (e.g., if an earlier one was aborted before any
+                # garbage collection), in which case we add their columns.
+                new_columns = [
+                    c for c in resources if c not in resource_columns
+                ]
+                resource_columns.extend(new_columns)
+                if header_written[0] and len(new_columns) > 0:
+                    _add_csv_columns(results_filename, new_columns)
+
+                # Write the header if needed, and the results.
+                with open(results_filename, 'a') as f:
+                    results_writer = csv.writer(f)
+                    if not header_written[0]:
+                        results_writer.writerow(
+                            util.flatten_tuple_fields(input) + fields +
+                            resource_columns)
+                        header_written[0] = True
+                    row = (util.flatten_tuple(input) + output_values + [
+                        resources.get(column, '') for column in resource_columns
+                    ])
+                    results_writer.writerow([str(x) for x in row])
+                next_to_write[0] += 1
+
+                # Record the metric, if we're computing confidence intervals.
+                # Aborted benchmarks count towards the maximum number of
+                # repeats, but not towards the confidence interval.
+                if ci_metric:
+                    if ci_metric not in fields:
+                        raise ValueError(f'{ci_metric} is not an output '
+                                         f'field. Expected one of {fields}.')
+                    value = output_values[fields.index(ci_metric)]
+                    metric_values.setdefault(_input_hash(input), []).append(
+                        float(value) if value != '' else math.nan)
+
+        free_pools: queue.Queue = queue.Queue()
+        for pool_index in range(num_pools):
+            free_pools.put(pool_index)
+
+        suite_start_time = datetime.datetime.now()
 
-        # Record args and inputs.
+        def run(i: int, input: Input, bench: BenchmarkDirectory,
+                pool_index: int) -> None:
+            try:
+                bench_start_time = datetime.datetime.now()
+                output: Optional[Output]
+                try:
+                    output = self._run_benchmark_in(
+                        bench, dict(args, pool_index=pool_index), input)
+                except BenchmarkAborted as e:
+                    print(f'Benchmark {bench.path} aborted. {e}')
+                    output = None
+
+                with lock:
+                    finished[i] = (input, output, bench.resource_columns())
+                    write_results()
+                    num_finished[0] += 1
+                    self._print_progress(num_finished[0], num_inputs[0],
+                                         num_pools, pool_index, input, output,
+                                         bench_start_time, suite_start_time)
+            finally:
+                free_pools.put(pool_index)
+
+        with concurrent.futures.ThreadPoolExecutor(num_pools) as executor:
+            futures: List[concurrent.futures.Future] = []
+            i = 0
+            while len(inputs) > 0:
+                for input in inputs:
+                    # Wait for a pool to free up. If a benchmark failed, we
+                    # stop launching new ones and propagate the error.
+                    pool_index = free_pools.get()
+                    for future in futures:
+                        if future.done():
+                            future.result()
+                    bench = suite_dir.benchmark_directory()
+                    i += 1
+                    futures.append(
+                        executor.submit(run, i, input, bench, pool_index))
+                for future in futures:
+                    future.result()
+
+                # Repeat the inputs that aren't yet precise enough, if any.
+                inputs = inputs_to_repeat()
+                if len(inputs) > 0:
+                    print(f'Repeating {len(inputs)} inputs whose {ci_metric} '
+                          f'confidence interval is wider than {ci_width:.0%}.')
+                    with lock:
+                        num_inputs[0] += len(inputs)
+
+        # Also store the results in columnar form, if requested. See
+        # pd_util.write_columnar.
+        if args.get('columnar'):
+            pd_util.write_columnar(
+                pd.read_csv(suite_dir.abspath('results.csv')),
+                suite_dir.abspath('results.arrow'))
+
+    def _run_benchmark_in(self, bench: BenchmarkDirectory, args: Dict[Any, Any],
+                          input: Input) -> Output:
+        if args.get('sample_resources'):
+            bench.resource_sample_interval = datetime.timedelta(seconds=1)
+        if args.get('profiler'):
+            bench.profiler = args['profiler']
+        if args.get('profile_mode'):
+            bench.profile_modes = args['profile_mode']
+        with bench:
+            bench.write_string('input.txt', str(input))
+            bench.write_dict('input.json', util.tuple_to_dict(input))
+            return self.run_benchmark(bench, args, input)
+
+    # `run_search` searches for the peak throughput of a single configuration,
+    # as described by `search` (see LoadSearch), rather than running every
+    # input in `inputs`. Every probe is recorded in results.csv along with the
+    # phase of the search (grow or bisect) that ran it. The peak probe is
+    # written to peak.json and returned. An aborted probe is recorded without
+    # an output, like in run_suite, and counts as a probe that missed the SLO.
+    def run_search(self, suite_dir: SuiteDirectory,
+                   search: LoadSearch) -> Tuple[Input, Output]:
+        args = self.args()
+        print(f'Searching for peak throughput in {suite_dir.path}.')
         suite_dir.write_dict('args.json', args)
-        suite_dir.write_string('inputs.txt', '\n'.join(str(i) for i in inputs))
+        suite_dir.write_dict(
+            'search.json', {
+                'base': util.tuple_to_dict(search.base),
+                'slo_ms': search.slo_ms,
+                'initial_load': search.initial_load,
+                'growth': search.growth,
+                'max_load': search.max_load,
+                'min_gain': search.min_gain,
+                'resolution': search.resolution,
+                'max_probes': search.max_probes,
+            })
 
-        # Create file to record suite results.
         results_file = suite_dir.create_file('results.csv')
         results_writer = csv.writer(results_file)
-
+        probes: Dict[int, Tuple[Input, Optional[Output]]] = dict()
         suite_start_time = datetime.datetime.now()
-        for (i, input) in enumerate(inputs, 1):
-            bench_start_time = datetime.datetime.now()
-            with suite_dir.benchmark_directory() as bench:
-                # Run the benchmark.
-                bench.write_string('input.txt', str(input))
-                bench.write_dict('input.json', util.tuple_to_dict(input))
-                output = self.run_benchmark(bench, args, input)
-
-                # Write the header if needed.
-                if i == 1:
-                    results_writer.writerow(
-                        util.flatten_tuple_fields(input) +
-                        util.flatten_tuple_fields(output))
 
-                # Write the results.
-                row = util.flatten_tuple(input) + util.flatten_tuple(output)
-                results_writer.writerow([str(x) for x in row])
+        def probe(load: int, phase: str) -> Tuple[float, bool]:
+            # Runs load `load` (at most once), returning its throughput and
+            # whether it met the SLO.
+            if load not in probes:
+                input = search.load(search.base, load)
+                bench = suite_dir.benchmark_directory()
+                bench_start_time = datetime.datetime.now()
+                output: Optional[Output]
+                try:
+                    output = self._run_benchmark_in(bench,
+                                                    dict(args, pool_index=0),
+                                                    input)
+                except BenchmarkAborted as e:
+                    print(f'Benchmark {bench.path} aborted. {e}')
+                    output = None
+
+                if output is not None:
+                    output_fields = util.flatten_tuple_fields(output)
+                    output_values = util.flatten_tuple(output)
+                else:
+                    output_fields = self._output_fields()
+                    output_values = [''] * len(output_fields)
+                if len(probes) == 0:
+                    results_writer.writerow(
+                        util.flatten_tuple_fields(input) + output_fields +
+                        ['search_phase'])
+                row = util.flatten_tuple(input) + output_values
+                results_writer.writerow([str(x) for x in row] + [phase])
                 results_file.flush()
+                probes[load] = (input, output)
+                self._print_progress(len(probes), search.max_probes, 1, 0,
+                                     input, output, bench_start_time,
+                                     suite_start_time)
+
+            (_, output) = probes[load]
+            if output is None:
+                return (math.nan, False)
+            return (search.throughput(output), meets_slo(output))
+
+        def meets_slo(output: Optional[Output]) -> bool:
+            if output is None:
+                return False
+            return (search.slo_ms is None or
+                    search.latency_ms(output) <= search.slo_ms)
+
+        # Grow the load geometrically until the SLO is violated or throughput
+        # stops rising.
+        load = search.initial_load
+        last: Optional[Tuple[int, float]] = None
+        slo_violated = False
+        while len(probes) < search.max_probes:
+            (throughput, met_slo) = probe(load, 'grow')
+            if not met_slo:
+                slo_violated = True
+                break
+            if last is not None:
+                (last_load, last_throughput) = last
+                gain = (search.min_gain - 1) * (load - last_load) / last_load
+                if throughput < last_throughput * (1 + gain):
+                    break
+            last = (load, throughput)
+            if load >= search.max_load:
+                break
+            load = min(search.max_load,
+                       max(load + 1, int(math.ceil(load * search.growth))))
+
+        # Every load that met the SLO. If the SLO was violated, we look for the
+        # largest load that meets it. Otherwise, throughput has leveled off,
+        # and we look for the smallest load that saturates it, i.e. that gets
+        # within a factor of `min_gain` of the peak.
+        def passing() -> Dict[int, float]:
+            return {
+                load: search.throughput(output)
+                for (load, (_, output)) in probes.items()
+                if output is not None and meets_slo(output)
+            }
+
+        def saturated(load: int) -> bool:
+            if slo_violated:
+                return load not in passing()
+            peak = max(passing().values())
+            return passing()[load] * search.min_gain >= peak
+
+        def bounds() -> Tuple[Optional[int], Optional[int]]:
+            lo = [l for l in probes if l in passing() and not saturated(l)]
+            hi = [l for l in probes if l not in passing() or saturated(l)]
+            return (max(lo) if lo else None, min(hi) if hi else None)
+
+        # Bisect.
+        (lo, hi) = bounds()
+        while (lo is not None and hi is not None and
+               len(probes) < search.max_probes and
+               hi - lo > max(1, search.resolution * lo)):
+            probe((lo + hi) // 2, 'bisect')
+            (lo, hi) = bounds()
+        results_file.close()
+
+        # If the SLO was violated, the peak is the largest load that met it.
+        # Otherwise, it's the smallest load that saturated throughput. If no
+        # load met the SLO, we report the smallest load that wasn't aborted.
+        finished = [l for (l, (_, o)) in probes.items() if o is not None]
+        if len(finished) == 0:
+            raise BenchmarkAborted('Every probe of the search was aborted.')
+        elif len(passing()) == 0:
+            peak = min(finished)
+        elif slo_violated:
+            peak = max(passing().keys())
+        else:
+            peak = min(l for l in passing() if saturated(l))
+        (input, output) = probes[peak]
+        assert output is not None
+        suite_dir.write_dict(
+            'peak.json', {
+                'load': peak,
+                'input': util.tuple_to_dict(input),
+                'output': util.tuple_to_dict(output),
+            })
+        print(f'Peak throughput at load {peak}: '
+              f'{self.summary(input, output)}')
+        return (input, output)
+
+    def _completed_input_hashes(self, suite_dir: SuiteDirectory,
+                                inputs: Collection[Input]) -> Counter[str]:
+        """
+        Returns the multiset of hashes of the inputs that have a row in
+        `suite_dir`'s results.csv. The input columns of a row are the
+        flattened input, so we hash them exactly like `_input_hash` does.
+        """
+        completed: Counter[str] = collections.Counter()
+        filename = suite_dir.abspath('results.csv')
+        if not os.path.exists(filename):
+            return completed
+
+        num_input_fields = len(util.flatten_tuple_fields(next(iter(inputs))))
+        with open(filename, 'r') as f:
+            rows = list(csv.reader(f))
+        if len(rows) == 0:
+            return completed
+
+        # Aborted benchmarks have no output and are rerun, even if their
+        # resource usage was summarized.
+        output_columns = [
+            i for (i, c) in enumerate(rows[0])
+            if i >= num_input_fields and not _is_resource_column(c)
+        ]
+        for row in rows[1:]:
+            if len(row) >= num_input_fields and any(
+                    i < len(row) and row[i] != '' for i in output_columns):
+                completed[_hash_strings(row[:num_input_fields])] += 1
+        return completed
+
+    def _completed_metric_values(self, suite_dir: SuiteDirectory,
+                                 inputs: Collection[Input],
+                                 metric: str) -> Dict[str, List[float]]:
+        """
+        Returns the values of output column `metric` in `suite_dir`'s
+        results.csv, keyed by input hash (see `_completed_input_hashes`).
+        """
+        values: Dict[str, List[float]] = dict()
+        filename = suite_dir.abspath('results.csv')
+        if not os.path.exists(filename):
+            return values
+
+        num_input_fields = len(util.flatten_tuple_fields(next(iter(inputs))))
+        with open(filename, 'r') as f:
+            rows = list(csv.reader(f))
+        if len(rows) == 0:
+            return values
+        column = rows[0].index(metric, num_input_fields)
+        for row in rows[1:]:
+            if len(row) > column:
+                h = _hash_strings(row[:num_input_fields])
+                values.setdefault(h, []).append(
+                    float(row[column]) if row[column] != '' else math.nan)
+        return values
+
+    def _output_fields(self) -> List[str]:
+        """
+        Returns the flattened fields of the Output type, as annotated on
+        `run_benchmark`.
+        """
+        output_type = typing.get_type_hints(self.run_benchmark).get('return')
+        if output_type is None or not hasattr(output_type, '_fields'):
+            raise ValueError(f'{type(self).__name__}.run_benchmark must be '
+                             'annotated with a named tuple return type.')
+        return util.flatten_type_fields(output_type)
+
+    def _write_confidence_intervals(
+            self, suite_dir: SuiteDirectory, metric: str,
+            inputs: Dict[str, Input],
+            intervals: Dict[str, ci_util.ConfidenceInterval]) -> None:
+        with open(suite_dir.abspath('results_ci.csv'), 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                util.flatten_tuple_fields(next(iter(inputs.values()))) + [
+                    'num_repeats', f'{metric}.mean', f'{metric}.ci_lower',
+                    f'{metric}.ci_upper'
+                ])
+            for (h, input) in inputs.items():
+                ci = intervals[h]
+                row = util.flatten_tuple(input) + [
+                    ci.num_samples, ci.mean, ci.lower, ci.upper
+                ]
+                writer.writerow([str(x) for x in row])
+
+    def _print_progress(self, i: int, n: int, num_pools: int, pool_index: int,
+                        input: Input, output: Optional[Output],
+                        bench_start_time: datetime.datetime,
+                        suite_start_time: datetime.datetime) -> None:
+        # Display some information about the benchmark.
+        colorful.use_style('monokai')
+
+        # First, we show the progress of the suite.
+        percent = (i / n) * 100
+        info = f'{colorful.bold}[{i:03}/{n:03}{colorful.reset}; '
+        info += f'{percent:#.4}%] '
+        if num_pools > 1:
+            info += f'(pool {pool_index}) '
+
+        # Next, we show the time taken to run this benchmark, the total
+        # elapsed time, and the estimated time left. Because benchmarks run
+        # concurrently on `num_pools` pools, the average time between
+        # completed benchmarks already accounts for the parallelism.
+        current_time = datetime.datetime.now()
+        bench_duration = current_time - bench_start_time
+        suite_duration = current_time - suite_start_time
+        duration_per_iteration = suite_duration / i
+        remaining_duration = (n - i) * duration_per_iteration
+
+        def round_delta(d):
+            return datetime.timedelta(seconds=int(d.total_seconds()))
+
+        info += f'{colorful.blue(round_delta(bench_duration))} / '
+        info += f'{colorful.green(round_delta(suite_duration))} + '
+        info += f'{colorful.magenta(round_delta(remaining_duration))}? '
+
+        # Finally, we display a summary of the benchmark.
+        if output is None:
+            info += f'{colorful.orange("aborted")}'
+        else:
+            info += f'{colorful.lightGray(self.summary(input, output))}'
+        print(info)
 
-            # Display some information about the benchmark.
-            colorful.use_style('monokai')
 
-            # First, we show the progress of the suite.
-            n = len(inputs)
-            percent = (i / n) * 100
-            info = f'{colorful.bold}[{i:03}/{n:03}{colorful.reset}; '
-            info += f'{percent:#.4}%] '
+def _hash_strings(xs: Sequence[str]) -> str:
+    return hashlib.sha256('\x1f'.join(xs).encode('utf-8')).hexdigest()
 
-            # Next, we show the time taken to run this benchmark, the total
-            # elapsed time, and the estimated time left.
-            current_time = datetime.datetime.now()
-            bench_duration = current_time - bench_start_time
-            suite_duration = current_time - suite_start_time
-            duration_per_iteration = suite_duration / i
-            remaining_duration = (n - i) * duration_per_iteration
 
-            def round_delta(d):
-                return datetime.timedelta(seconds=int(d.total_seconds()))
+def _input_hash(input: Any) -> str:
+    """
+    _input_hash is a content hash of a (potentially nested) input. Two inputs
+    have the same hash if they have the same values, as written to
+    results.csv.
+    """
+    return _hash_strings([str(x) for x in util.flatten_tuple(input)])
 
-            info += f'{colorful.blue(round_delta(bench_duration))} / '
-            info += f'{colorful.green(round_delta(suite_duration))} + '
-            info += f'{colorful.magenta(round_delta(remaining_duration))}? '
 
-            # Finally, we display a summary of the benchmark.
-            info += f'{colorful.lightGray(self.summary(input, output))}'
-            print(info)
+def _add_csv_columns(filename: str, columns: List[str]) -> None:
+    """
+    _add_csv_columns adds `columns` to the end of the header of CSV file
+    `filename`, leaving them empty in every row. The file is replaced
+    atomically, so a crash leaves either the old or the new file.
+    """
+    with open(filename, 'r') as f:
+        rows = list(csv.reader(f))
+    with open(filename + '.tmp', 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(rows[0] + columns)
+        for row in rows[1:]:
+            writer.writerow(row + [''] * len(columns))
+    os.replace(filename + '.tmp', filename)
+
+
+def _is_resource_column(column: str) -> bool:
+    """
+    _is_resource_column returns whether `column` of results.csv is one of the
+    columns of BenchmarkDirectory.resource_columns.
+    """
+    prefixes = ('peak_cpu.', 'gc_')
+    return column == 'bottleneck_role' or column.startswith(prefixes)
 
 
 class LatencyOutput(NamedTuple):
@@ -356,14 +1493,41 @@ def _throughput(s):
     )
 
 
+def _steady_state_window(
+        bench: BenchmarkDirectory,
+        bins: steady_state_util.Bins) -> steady_state_util.Window:
+    bench.log('Detecting steady state of aggregate recorder data.')
+    window = steady_state_util.detect(bins)
+    end_ns = bins.origin_ns + len(bins.throughput()) * steady_state_util.BIN_NS
+    bench.write_dict(
+        'steady_state.json', {
+            'start': pd.Timestamp(window.start_ns, tz='UTC'),
+            'stop': pd.Timestamp(window.stop_ns, tz='UTC'),
+            'dropped_prefix_s': (window.start_ns - bins.origin_ns) / 1e9,
+            'dropped_suffix_s': (end_ns - window.stop_ns) / 1e9,
+        })
+    bench.log(f'Steady state detected: {window}.')
+    return window
+
+
+def _write_latency_windows(bench: BenchmarkDirectory,
+                           windows: gc_util.LatencyWindows) -> None:
+    bench.log('Writing p99 latency windows to latency_windows.csv.')
+    windows.windows().to_csv(bench.abspath('latency_windows.csv'), index=False)
+    bench.log('p99 latency windows written.')
+
+
 def _wrangle_recorder_data(bench: BenchmarkDirectory,
                            filenames: Iterable[str],
                            drop_prefix: datetime.timedelta,
-                           save_data: bool = True) -> pd.DataFrame:
+                           save_data: bool = True,
+                           columnar: bool = False,
+                           steady_state: bool = False) -> pd.DataFrame:
     bench.log('Reading recorder data from the following CSVs:')
     for filename in filenames:
         bench.log(f'- {filename}')
-    df = pd_util.read_csvs(filenames, parse_dates=['start', 'stop'])
+    df = pd.concat([pd_util.read_recorder_data(f) for f in filenames],
+                   ignore_index=True)
     bench.log('Recorder data read.')
 
     bench.log('Setting aggregate recorder data index.')
@@ -374,7 +1538,12 @@ def _wrangle_recorder_data(bench: BenchmarkDirectory,
     df = df.sort_index(0)
     bench.log('Aggregate recorder data sorted on index.')
 
-    if save_data:
+    if save_data and columnar:
+        save_data_filename = bench.abspath('data.arrow')
+        bench.log(f'Saving aggregate recorder data to {save_data_filename}.')
+        pd_util.write_columnar(df, save_data_filename)
+        bench.log('Aggregate recorder data written.')
+    elif save_data:
         save_data_filename = bench.abspath('data.csv')
         bench.log(f'Saving aggregate recorder data to {save_data_filename}.')
         df.to_csv(save_data_filename)
@@ -387,12 +1556,22 @@ def _wrangle_recorder_data(bench: BenchmarkDirectory,
         os.remove(filename)
     bench.log('Individual recorder data removed.')
 
-    # We also compress the output data since it can get big.
-    if save_data:
+    # We also compress the output data since it can get big. Columnar data is
+    # left uncompressed so that it can be memory-mapped.
+    if save_data and not columnar:
         bench.log('Compressing aggregate recorder data.')
         subprocess.call(['gzip', bench.abspath('data.csv')])
         bench.log('Aggregate recorder data compressed.')
 
+    # The p99 latency windows cover all of the data, so that the garbage
+    # collections of the JVM warm-up are accounted for (see
+    # BenchmarkDirectory._summarize_gc).
+    windows = gc_util.LatencyWindows(df.index[0].value)
+    windows.add(
+        pd.DatetimeIndex(df['stop']).asi8, df['latency_nanos'].values,
+        df['count'].values if 'count' in df.columns else None)
+    _write_latency_windows(bench, windows)
+
     # Drop prefix of data.
     start_time = df.index[0]
     new_start_time = (start_time +
@@ -401,19 +1580,140 @@ def _wrangle_recorder_data(bench: BenchmarkDirectory,
     df = df[df.index >= new_start_time]
     bench.log('Prefix of aggregate recorder data dropped.')
 
+    if steady_state and len(df) > 0:
+        bins = steady_state_util.Bins(df.index[0].value)
+        bins.add(df.index.asi8, df['latency_nanos'].values,
+                 df['count'].values if 'count' in df.columns else None)
+        window = _steady_state_window(bench, bins)
+        df = df[(df.index.asi8 >= window.start_ns) &
+                (df.index.asi8 < window.stop_ns)]
+
     return df
 
 
+def _stream_recorder_data(bench: BenchmarkDirectory,
+                          filenames: Iterable[str],
+                          drop_prefix: datetime.timedelta,
+                          save_data: bool,
+                          labeled: bool,
+                          columnar: bool = False,
+                          steady_state: bool = False) \
+                          -> Dict[Optional[str], recorder_util.RecorderSummary]:
+    """
+    _stream_recorder_data is the bounded memory counterpart of
+    _wrangle_recorder_data. Rather than returning the aggregate recorder data,
+    it returns a summary of the data for every label (or for None if the data
+    is unlabeled). See recorder_util.RecorderDataStream.
+    """
+    bench.log('Streaming recorder data from the following CSVs:')
+    for filename in filenames:
+        bench.log(f'- {filename}')
+
+    with contextlib.ExitStack() as stack:
+        stream = stack.enter_context(recorder_util.RecorderDataStream(filenames))
+        bench.log('Recorder data sorted into runs.')
+
+        data_file: Optional[IO] = None
+        arrow_writer: Any = None
+        if save_data and columnar and len(stream.columns()) > 0:
+            pa = pd_util.import_pyarrow()
+            save_data_filename = bench.abspath('data.arrow')
+            bench.log(f'Saving aggregate recorder data to '
+                      f'{save_data_filename}.')
+            schema = stream.arrow_schema()
+            arrow_writer = stack.enter_context(
+                pa.ipc.new_file(
+                    stack.enter_context(pa.OSFile(save_data_filename, 'wb')),
+                    schema))
+        elif save_data and not columnar:
+            save_data_filename = bench.abspath('data.csv')
+            bench.log(f'Saving aggregate recorder data to '
+                      f'{save_data_filename}.')
+            data_file = stack.enter_context(open(save_data_filename, 'w'))
+
+        # See _wrangle_recorder_data.
+        windows: Optional[gc_util.LatencyWindows] = None
+        if stream.min_start is not None:
+            windows = gc_util.LatencyWindows(stream.min_start)
+
+        def on_block(block: Dict[str, Any]) -> None:
+            if windows is not None:
+                windows.add(block['stop'], block['latency_nanos'],
+                            block.get('count'))
+            if arrow_writer is not None:
+                arrow_writer.write_batch(stream.to_record_batch(block, schema))
+            if data_file is not None:
+                stream.to_dataframe(block).to_csv(data_file,
+                                                  header=data_file.tell() == 0)
+
+        window: Optional[steady_state_util.Window] = None
+        if steady_state and stream.min_start is not None:
+            window = _steady_state_window(bench, stream.bins())
+
+        summaries = recorder_util.summarize(stream, drop_prefix, labeled,
+                                            on_block, window)
+        bench.log('Aggregate recorder data summarized.')
+        if windows is not None:
+            _write_latency_windows(bench, windows)
+
+    for filename in filenames:
+        bench.log(f'Removing {filename}.')
+        os.remove(filename)
+    bench.log('Individual recorder data removed.')
+
+    if save_data and not columnar:
+        bench.log('Compressing aggregate recorder data.')
+        subprocess.call(['gzip', bench.abspath('data.csv')])
+        bench.log('Aggregate recorder data compressed.')
+
+    return summaries
+
+
 # parse_recorder_data parses and summarizes data written by a
 # frankenpaxos.BenchmarkUtil.Recorder.
 #
-# TODO(mwhittaker): Drop the first couple of seconds from the data since it
-# takes a while for the JVM to fully ramp up.
+# If `streaming` is true, the data is never loaded into memory all at once.
+# Instead, it is merged and summarized in bounded memory. Means, mins, and maxes
+# are exact, but the median and tail latencies and throughputs are estimated
+# to within a relative error of 0.1%. See recorder_util.QuantileSketch.
+#
+# If `columnar` is true, the aggregate recorder data is saved to data.arrow, an
+# uncompressed Arrow file with start and stop stored as int64 nanoseconds and
+# labels dictionary encoded, instead of to a gzipped data.csv. Plot scripts can
+# read only the columns they need from it with pd_util.read_recorder_data.
+#
+# If `steady_state` is true, the JVM warm-up at the start of the data and the
+# client drain at the end are detected and dropped (see steady_state_util).
+# The steady state window is written to steady_state.json. The saved aggregate
+# recorder data is never trimmed.
+#
+# Either way, the p99 latency of every second of the untrimmed data is written
+# to latency_windows.csv, whether or not the data is saved, so that latency
+# spikes can be matched with garbage collections (see gc_util.LatencyWindows).
 def parse_recorder_data(bench: BenchmarkDirectory,
                         filenames: Iterable[str],
                         drop_prefix: datetime.timedelta,
-                        save_data: bool = True) -> RecorderOutput:
-    df = _wrangle_recorder_data(bench, filenames, drop_prefix, save_data)
+                        save_data: bool = True,
+                        streaming: bool = False,
+                        columnar: bool = False,
+                        steady_state: bool = False) -> RecorderOutput:
+    if streaming:
+        summaries = _stream_recorder_data(bench,
+                                          filenames,
+                                          drop_prefix,
+                                          save_data,
+                                          labeled=False,
+                                          columnar=columnar,
+                                          steady_state=steady_state)
+        summary = summaries.get(None, recorder_util.RecorderSummary(False))
+        return RecorderOutput(
+            latency=_latency(summary.latency_ms),
+            start_throughput_1s=_throughput(
+                summary.start_throughput_1s.sketch),
+        )
+
+    df = _wrangle_recorder_data(bench, filenames, drop_prefix, save_data,
+                                columnar, steady_state)
     return RecorderOutput(
         latency=_latency(df['latency_nanos'] / 1e6),
         start_throughput_1s=_throughput(pd_util.throughput(df.index, 1000)),
@@ -422,13 +1722,40 @@ def parse_recorder_data(bench: BenchmarkDirectory,
 
 # parse_labeled_recorder_data parses and summarizes data written by a
 # frankenpaxos.BenchmarkUtil.LabeledRecorder. Every label gets its own set of
-# outputs.
+# outputs. See parse_recorder_data for `streaming`, `columnar`, and
+# `steady_state`.
+#
+# If the LabeledRecorder grouped measurements, every row holds the mean latency
+# of a group along with a histogram of the group's latencies. Latencies are
+# then computed from the merged histograms rather than from the group means,
+# which would badly underestimate the tails. Merged latencies are accurate to
+# within about 1%; see recorder_util.add_latency_histograms.
 def parse_labeled_recorder_data(bench: BenchmarkDirectory,
                                 filenames: Iterable[str],
                                 drop_prefix: datetime.timedelta,
-                                save_data: bool = True) \
+                                save_data: bool = True,
+                                streaming: bool = False,
+                                columnar: bool = False,
+                                steady_state: bool = False) \
                                 -> Dict[str, RecorderOutput]:
-    df = _wrangle_recorder_data(bench, filenames, drop_prefix, save_data)
+    if streaming:
+        summaries = _stream_recorder_data(bench,
+                                          filenames,
+                                          drop_prefix,
+                                          save_data,
+                                          labeled=True,
+                                          columnar=columnar,
+                                          steady_state=steady_state)
+        return {
+            label: RecorderOutput(
+                latency=_latency(summary.latency_ms),
+                start_throughput_1s=_throughput(
+                    summary.start_throughput_1s.sketch),
+            ) for (label, summary) in summaries.items() if label is not None
+        }
+
+    df = _wrangle_recorder_data(bench, filenames, drop_prefix, save_data,
+                                columnar, steady_state)
 
     # Record output for each label.
     outputs = dict()
@@ -437,7 +1764,17 @@ def parse_labeled_recorder_data(bench: BenchmarkDirectory,
         ldf = df[df['label'] == label]
 
         bench.log(f'- Computing latency.')
-        latency = _latency(ldf['latency_nanos'] / 1e6)
+        if ('latency_histogram' in ldf.columns and
+                ldf['latency_histogram'].notna().any()):
+            # The measurements are grouped, so latency_nanos is only the mean
+            # latency of every group. We merge the groups' histograms instead.
+            sketch = recorder_util.QuantileSketch()
+            recorder_util.add_latency_histograms(
+                sketch, ldf['latency_nanos'].values, ldf['count'].values,
+                ldf['latency_histogram'].values)
+            latency = _latency(sketch)
+        else:
+            latency = _latency(ldf['latency_nanos'] / 1e6)
         bench.log(f'- Latency computed.')
 
         bench.log(f'- Computing 1 second start throughput.')
@@ -452,3 +1789,39 @@ def parse_labeled_recorder_data(bench: BenchmarkDirectory,
         bench.log(f'Aggregate recorder data for {label} computed.')
 
     return outputs
+
+
+# parse_recovery_data measures how a benchmark recovered from every event in
+# `events_filename`, written by a frankenpaxos.BenchmarkUtil.EventRecorder.
+# It reads the aggregate recorder data saved by parse_recorder_data (so call
+# that first, with save_data set), untrimmed by drop_prefix or steady_state,
+# since the events are themselves transients. The recovery from every event is
+# written to event_recoveries.csv. If `label` is given, only the measurements
+# with that label (see parse_labeled_recorder_data) are considered. See
+# recovery_util for details.
+def parse_recovery_data(bench: BenchmarkDirectory,
+                        events_filename: str,
+                        columnar: bool = False,
+                        label: Optional[str] = None) \
+                        -> recovery_util.RecoveryOutput:
+    if os.path.exists(events_filename):
+        events = recovery_util.read_events(events_filename)
+    else:
+        bench.log(f'{events_filename} not found. Assuming no events.')
+        events = []
+
+    data_filename = bench.abspath('data.arrow' if columnar else 'data.csv.gz')
+    bench.log(f'Reading aggregate recorder data from {data_filename}.')
+    columns = ['start', 'stop', 'latency_nanos']
+    if label is not None:
+        columns.append('label')
+    df = pd_util.read_recorder_data(data_filename, columns)
+    if label is not None:
+        df = df[df['label'] == label]
+    bench.log('Aggregate recorder data read.')
+
+    bench.log(f'Measuring recovery from {len(events)} events.')
+    recoveries = recovery_util.recoveries(df, events)
+    recoveries.to_csv(bench.abspath('event_recoveries.csv'), index=False)
+    bench.log('Recovery measured.')
+    return recovery_util.summarize(recoveries)
@@ -0,0 +1,618 @@
+from . import benchmark
+from . import host
+from . import perf_util
+from typing import Any, Collection, Dict, List, NamedTuple, Optional, Set
+import csv
+import datetime
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+
+class Input(NamedTuple):
+    x: int
+    sleep_ms: int
+
+
+class Output(NamedTuple):
+    y: int
+    pool_index: int
+
+
+class SquareSuite(benchmark.Suite[Input, Output]):
+    def __init__(self,
+                 num_pools: int,
+                 resume: Optional[str] = None,
+                 fail_at: Optional[int] = None) -> None:
+        self.num_pools = num_pools
+        self.resume = resume
+        self.fail_at = fail_at
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.xs: List[int] = []
+
+    def args(self) -> Dict[Any, Any]:
+        return {'num_pools': self.num_pools, 'resume': self.resume}
+
+    def inputs(self) -> Collection[Input]:
+        # Later inputs finish first.
+        return [Input(x=x, sleep_ms=10 * (6 - x)) for x in range(6)]
+
+    def summary(self, input: Input, output: Output) -> str:
+        return str(output.y)
+
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: Input) -> Output:
+        if input.x == self.fail_at:
+            raise ValueError(f'Benchmark {input.x} failed.')
+        with self.lock:
+            self.xs.append(input.x)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(input.sleep_ms / 1000)
+        with self.lock:
+            self.running -= 1
+        return Output(y=input.x**2, pool_index=args['pool_index'])
+
+
+class SuiteTest(unittest.TestCase):
+    def _run_suite(self, suite: SquareSuite) -> list:
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                suite.run_suite(suite_dir)
+            with open(suite_dir.abspath('results.csv')) as f:
+                return list(csv.reader(f))
+
+    def test_sequential(self):
+        suite = SquareSuite(num_pools=1)
+        rows = self._run_suite(suite)
+        self.assertEqual(rows[0], ['x', 'sleep_ms', 'y', 'pool_index'])
+        self.assertEqual([int(row[2]) for row in rows[1:]],
+                         [x**2 for x in range(6)])
+        self.assertEqual(suite.max_running, 1)
+
+    def test_pools(self):
+        suite = SquareSuite(num_pools=3)
+        rows = self._run_suite(suite)
+        self.assertEqual([int(row[2]) for row in rows[1:]],
+                         [x**2 for x in range(6)])
+        self.assertEqual(suite.max_running, 3)
+        self.assertEqual({row[3] for row in rows[1:]}, {'0', '1', '2'})
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                with self.assertRaises(ValueError):
+                    SquareSuite(num_pools=1, fail_at=3).run_suite(suite_dir)
+
+            suite = SquareSuite(num_pools=1, resume=suite_dir.path)
+            with benchmark.SuiteDirectory(directory) as resume_dir:
+                suite.run_suite(resume_dir)
+            self.assertEqual(suite.xs, [3, 4, 5])
+
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+            self.assertEqual([int(row[2]) for row in rows[1:]],
+                             [x**2 for x in range(6)])
+            # The failed benchmark ran in 004, so the resumed ones run in 005,
+            # 006, and 007.
+            self.assertIn('007', os.listdir(suite_dir.path))
+
+            # Resuming a completed suite runs nothing.
+            suite = SquareSuite(num_pools=1, resume=suite_dir.path)
+            with benchmark.SuiteDirectory(directory) as resume_dir:
+                suite.run_suite(resume_dir)
+            self.assertEqual(suite.xs, [])
+
+
+class NoisyInput(NamedTuple):
+    noise: float
+
+
+class NoisyOutput(NamedTuple):
+    throughput: float
+
+
+# Every input is listed once. The throughput of the noiseless input is always
+# 100, and the throughput of the noisy input alternates between 100 - noise
+# and 100 + noise.
+class NoisySuite(benchmark.Suite[NoisyInput, NoisyOutput]):
+    def __init__(self, **args) -> None:
+        self._args = args
+        self.noises: List[float] = []
+
+    def args(self) -> Dict[Any, Any]:
+        return dict(self._args, num_pools=1)
+
+    def inputs(self) -> Collection[NoisyInput]:
+        return [NoisyInput(noise=0), NoisyInput(noise=50)]
+
+    def summary(self, input: NoisyInput, output: NoisyOutput) -> str:
+        return str(output.throughput)
+
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: NoisyInput) -> NoisyOutput:
+        self.noises.append(input.noise)
+        sign = 1 if self.noises.count(input.noise) % 2 == 0 else -1
+        return NoisyOutput(throughput=100 + sign * input.noise)
+
+
+class ConfidenceIntervalTest(unittest.TestCase):
+    def test_repeat_until_narrow(self):
+        suite = NoisySuite(ci_metric='throughput', ci_width=0.05, max_repeats=6)
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                suite.run_suite(suite_dir)
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+            with open(suite_dir.abspath('results_ci.csv')) as f:
+                ci_rows = list(csv.reader(f))
+
+        # The noiseless input runs the minimum number of times, and the noisy
+        # input runs until it hits the cap.
+        self.assertEqual(suite.noises.count(0), 3)
+        self.assertEqual(suite.noises.count(50), 6)
+        self.assertEqual(len(rows), 1 + 3 + 6)
+        self.assertEqual(ci_rows[0], [
+            'noise', 'num_repeats', 'throughput.mean', 'throughput.ci_lower',
+            'throughput.ci_upper'
+        ])
+        self.assertEqual(ci_rows[1], ['0', '3', '100.0', '100.0', '100.0'])
+        self.assertEqual(ci_rows[2][:3], ['50', '6', '100.0'])
+        self.assertLess(float(ci_rows[2][3]), 100)
+        self.assertGreater(float(ci_rows[2][4]), 100)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                NoisySuite().run_suite(suite_dir)
+
+            # The resumed suite picks up the measurements of the first one.
+            suite = NoisySuite(ci_metric='throughput',
+                               max_repeats=4,
+                               resume=suite_dir.path)
+            with benchmark.SuiteDirectory(directory) as resume_dir:
+                suite.run_suite(resume_dir)
+            self.assertEqual(suite.noises, [0, 50, 0, 50, 50])
+
+    def test_unknown_metric(self):
+        suite = NoisySuite(ci_metric='latency')
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                with self.assertRaises(ValueError):
+                    suite.run_suite(suite_dir)
+
+
+class LoadInput(NamedTuple):
+    num_clients: int
+
+
+class LoadOutput(NamedTuple):
+    throughput: float
+    latency_ms: float
+
+
+# Throughput rises linearly up to 20 clients and then levels off, while latency
+# rises slowly and then sharply.
+class LoadSuite(benchmark.Suite[LoadInput, LoadOutput]):
+    def __init__(self) -> None:
+        self.loads: List[int] = []
+
+    def args(self) -> Dict[Any, Any]:
+        return {}
+
+    def summary(self, input: LoadInput, output: LoadOutput) -> str:
+        return str(output.throughput)
+
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: LoadInput) -> LoadOutput:
+        n = input.num_clients
+        self.loads.append(n)
+        return LoadOutput(throughput=100 * min(n, 20),
+                          latency_ms=1 + max(0, n - 20))
+
+
+# The clients stall with 30 or more clients.
+class AbortingLoadSuite(LoadSuite):
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: LoadInput) -> LoadOutput:
+        output = super().run_benchmark(bench, args, input)
+        if input.num_clients >= 30:
+            raise benchmark.BenchmarkAborted('Stalled.')
+        return output
+
+
+class SearchTest(unittest.TestCase):
+    def _search(self, **kwargs) -> benchmark.LoadSearch:
+        return benchmark.LoadSearch(
+            base=LoadInput(num_clients=1),
+            load=lambda input, n: input._replace(num_clients=n),
+            throughput=lambda output: output.throughput,
+            latency_ms=lambda output: output.latency_ms,
+            **kwargs)
+
+    def test_knee(self):
+        suite = LoadSuite()
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                (input, output) = suite.run_search(suite_dir, self._search())
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+
+        # 1, 2, 4, 8, 16, 32, and 64, which doesn't raise throughput. Then,
+        # bisect between 16 and 32 for the smallest load that saturates.
+        self.assertEqual(suite.loads[:6], [1, 2, 4, 8, 16, 32])
+        self.assertLessEqual(len(suite.loads), 8)
+        self.assertEqual(output.throughput, 2000)
+        self.assertLessEqual(input.num_clients, 24)
+        self.assertEqual(
+            rows[0],
+            ['num_clients', 'throughput', 'latency_ms', 'search_phase'])
+        self.assertEqual([row[3] for row in rows[1:7]], ['grow'] * 6)
+        self.assertEqual(len(rows), len(suite.loads) + 1)
+
+    def test_slo(self):
+        suite = LoadSuite()
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                (input,
+                 output) = suite.run_search(suite_dir,
+                                            self._search(slo_ms=5, min_gain=1))
+        # Latency passes the SLO after 24 clients.
+        self.assertLessEqual(output.latency_ms, 5)
+        self.assertEqual(output.throughput, 2000)
+
+    def test_aborted_probes(self):
+        suite = AbortingLoadSuite()
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                (input, output) = suite.run_search(suite_dir, self._search())
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+
+        # 32 clients is aborted, so the search bisects for the largest load
+        # below it that isn't.
+        self.assertEqual(suite.loads[:6], [1, 2, 4, 8, 16, 32])
+        self.assertEqual(rows[6], ['32', '', '', 'grow'])
+        self.assertLess(input.num_clients, 30)
+        self.assertGreaterEqual(input.num_clients, 26)
+        self.assertEqual(output.throughput, 2000)
+
+        # If every probe is aborted, there is no peak.
+        suite = AbortingLoadSuite()
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                with self.assertRaises(benchmark.BenchmarkAborted):
+                    suite.run_search(suite_dir, self._search(initial_load=30))
+
+
+class ReadinessTest(unittest.TestCase):
+    class Placement(NamedTuple):
+        clients: List[host.Endpoint]
+        leaders: List[host.Endpoint]
+        acceptors: List[List[host.Endpoint]]
+        driver: host.Endpoint
+
+    def test_placement_endpoints(self):
+        e = [host.Endpoint(host.FakeHost('1.2.3.4'), p) for p in range(5)]
+        placement = self.Placement(clients=[e[0]],
+                                   leaders=[e[1]],
+                                   acceptors=[[e[2]], [e[3]]],
+                                   driver=e[4])
+        self.assertEqual(benchmark.placement_endpoints(placement), {
+            'leaders': [e[1]],
+            'acceptors': [e[2], e[3]]
+        })
+        self.assertEqual(
+            benchmark.placement_endpoints(placement, roles=['clients']),
+            {'clients': [e[0]]})
+
+    def test_wait_until_ready(self):
+        with socket.socket() as listening, socket.socket() as closed:
+            listening.bind(('127.0.0.1', 0))
+            listening.listen()
+            closed.bind(('127.0.0.1', 0))
+            ready = host.Endpoint(host.LocalHost(), listening.getsockname()[1])
+            not_ready = host.Endpoint(host.LocalHost(), closed.getsockname()[1])
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench')
+                with benchmark.BenchmarkDirectory(path) as bench:
+                    bench.wait_until_ready({'a': [ready]})
+                    with self.assertRaises(benchmark.BenchmarkAborted):
+                        bench.wait_until_ready(
+                            {
+                                'a': [ready],
+                                'b': [ready, not_ready]
+                            },
+                            timeout=datetime.timedelta(milliseconds=300))
+                    with open(bench.abspath('readiness.json')) as f:
+                        readiness = json.load(f)
+                    self.assertIsNotNone(readiness['a'])
+                    self.assertIsNone(readiness['b'])
+
+
+class AssignCpusTest(unittest.TestCase):
+    class Placement(NamedTuple):
+        clients: List[host.Endpoint]
+        leaders: List[host.Endpoint]
+        leader_elections: List[host.Endpoint]
+        acceptors: List[List[host.Endpoint]]
+        server: host.Endpoint
+
+    def test_placement_labels(self):
+        e = [host.Endpoint(host.FakeHost('1.2.3.4'), p) for p in range(6)]
+        placement = self.Placement(clients=[e[0]],
+                                   leaders=[e[1]],
+                                   leader_elections=[e[2]],
+                                   acceptors=[[e[3]], [e[4]]],
+                                   server=e[5])
+        self.assertEqual(benchmark.placement_labels(placement), [
+            ('client_0', e[0]),
+            ('leader_0', e[1]),
+            ('acceptor_0_0', e[3]),
+            ('acceptor_1_0', e[4]),
+            ('server', e[5]),
+        ])
+
+    def test_assign_cpus(self):
+        a = host.FakeHost('a', cpus={i: 0 for i in range(8)})
+        b = host.FakeHost('b', cpus={i: 0 for i in range(2)})
+        assignment = benchmark.assign_cpus([
+            ('client_0', host.Endpoint(a, 0)),
+            ('client_1', host.Endpoint(b, 1)),
+            ('leader_0', host.Endpoint(a, 2)),
+            ('leader_1', host.Endpoint(b, 3)),
+            ('acceptor_0', host.Endpoint(a, 4)),
+            ('acceptor_1', host.Endpoint(b, 5)),
+        ])
+        self.assertEqual(
+            assignment, {
+                'client_0': host.CpuSet((0, 1, 2)),
+                'leader_0': host.CpuSet((3, 4, 5)),
+                'acceptor_0': host.CpuSet((6, 7)),
+                'client_1': host.CpuSet((0,)),
+                'leader_1': host.CpuSet((1,)),
+                'acceptor_1': host.CpuSet((0,)),
+            })
+
+    def test_assign_cpus_numa(self):
+        # Cores 0, 2, 4, and 6 are on node 0, and the rest are on node 1.
+        h = host.FakeHost('a', cpus={i: i % 2 for i in range(8)})
+        assignment = benchmark.assign_cpus([
+            ('a', host.Endpoint(h, 0)),
+            ('b', host.Endpoint(h, 1)),
+            ('c', host.Endpoint(h, 2)),
+        ])
+        self.assertEqual(
+            assignment, {
+                'a': host.CpuSet((0, 2, 4), numa_node=0),
+                'b': host.CpuSet((1, 3, 6), numa_node=None),
+                'c': host.CpuSet((5, 7), numa_node=1),
+            })
+
+    def test_pin_cpus(self):
+        local = host.LocalHost()
+        cpu = min(local.cpus())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                bench.pin_cpus({'pinned': host.CpuSet((cpu,))})
+                bench.popen(local, 'pinned', ['true']).wait()
+                bench.popen(local, 'unpinned', ['true']).wait()
+            with open(os.path.join(path, 'pinned_cmd.txt')) as f:
+                self.assertIn(f'taskset -c {cpu}', f.read())
+            with open(os.path.join(path, 'cpus.json')) as f:
+                self.assertEqual(
+                    json.load(f), {
+                        'pinned': {
+                            'host': '127.0.0.1',
+                            'cpus': str(cpu),
+                            'numa_node': None,
+                        }
+                    })
+
+
+class WatchdogTest(unittest.TestCase):
+    def _wait_for_clients(self, bench: benchmark.BenchmarkDirectory,
+                          client_cmd: str, role_cmd: str, **kwargs) -> float:
+        local = host.LocalHost()
+        client = bench.popen(local, 'client_0', ['bash', '-c', client_cmd])
+        role = bench.popen(local, 'role', ['bash', '-c', role_cmd])
+        start = time.time()
+        bench.wait_for_clients(
+            [client], {'roles': [role]},
+            poll_interval=datetime.timedelta(milliseconds=50),
+            **kwargs)
+        return time.time() - start
+
+    def test_clients_finish(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                self._wait_for_clients(
+                    bench,
+                    f'for i in 1 2 3; do echo $i >> {path}/client_0_data.csv; '
+                    'sleep 0.1; done',
+                    'sleep 60',
+                    stall_timeout=datetime.timedelta(seconds=1))
+            self.assertFalse(os.path.exists(os.path.join(path, 'aborted.txt')))
+
+    def test_stall(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                start = time.time()
+                with self.assertRaises(benchmark.BenchmarkAborted):
+                    self._wait_for_clients(
+                        bench,
+                        f'echo 1 > {path}/client_0_data.csv; sleep 60',
+                        'sleep 60',
+                        stall_timeout=datetime.timedelta(milliseconds=300))
+                self.assertLess(time.time() - start, 30)
+            with open(os.path.join(path, 'aborted.txt')) as f:
+                self.assertIn('No client recorded any data', f.read())
+
+    def test_startup_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                with self.assertRaises(benchmark.BenchmarkAborted):
+                    self._wait_for_clients(
+                        bench,
+                        'sleep 60',
+                        'sleep 60',
+                        stall_timeout=datetime.timedelta(seconds=60),
+                        startup_timeout=datetime.timedelta(milliseconds=300))
+
+    def test_role_exits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                with self.assertRaises(benchmark.BenchmarkAborted):
+                    self._wait_for_clients(bench, 'sleep 60', 'exit 3')
+            with open(os.path.join(path, 'aborted.txt')) as f:
+                self.assertIn('roles 0 exited with return code 3', f.read())
+
+
+class _UnavailableProfilerProc(perf_util.AsyncProfilerProc):
+    def _start_cmd(self, pid: int) -> List[str]:
+        return ['sh', '-c', 'exit 1']
+
+
+class ProfileTest(unittest.TestCase):
+    def test_render_flamegraphs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                for (label, stacks) in [('acceptor_0_1', 'a;b 2\n'),
+                                        ('acceptor_1_0', 'a;b 1\na;c 1\n'),
+                                        ('leader_0', 'a 5\n')]:
+                    bench.write_string(f'{label}_profile_cpu.collapsed', stacks)
+            with open(os.path.join(path,
+                                   'flamegraph_acceptor_cpu.collapsed')) as f:
+                self.assertEqual(f.read(), 'a;b 3\na;c 1\n')
+            for name in ['flamegraph_acceptor_cpu', 'flamegraph_leader_cpu']:
+                with open(os.path.join(path, f'{name}.svg')) as f:
+                    self.assertTrue(f.read().startswith('<svg'))
+
+    def test_unavailable_profiler(self):
+        local = host.LocalHost()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                p = bench.popen(local, 'server', ['sleep', '60'])
+                p = _UnavailableProfilerProc(bench, local, p, 'server', ['cpu'])
+                p.kill()
+                self.assertIsNotNone(p.wait())
+            self.assertFalse(
+                os.path.exists(os.path.join(path,
+                                            'server_profile_stop_cmd.txt')))
+            with open(os.path.join(path, 'log.txt')) as f:
+                self.assertIn('Could not profile server', f.read())
+
+
+class AbortingSuite(SquareSuite):
+    # The inputs to abort. Set by every test.
+    abort_at: Set[int]
+
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: Input) -> Output:
+        if input.x in self.abort_at:
+            self.xs.append(input.x)
+            raise benchmark.BenchmarkAborted('Stalled.')
+        return super().run_benchmark(bench, args, input)
+
+
+class SampledAbortingSuite(AbortingSuite):
+    def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                      args: Dict[Any, Any], input: Input) -> Output:
+        # Aborted benchmarks have their resource usage summarized too.
+        bench.write_dict('peak_cpu.json', {'server': 10.0 * input.x})
+        bench.write_dict('gc.json', {'roles': {}, 'p99_spikes': input.x})
+        return super().run_benchmark(bench, args, input)
+
+
+class AbortTest(unittest.TestCase):
+    def test_aborted_inputs_are_failed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                suite = AbortingSuite(num_pools=1)
+                suite.abort_at = {0, 3}
+                suite.run_suite(suite_dir)
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+
+            # Even though the first benchmark was aborted, the header comes
+            # from the Output type.
+            self.assertEqual(rows[0], ['x', 'sleep_ms', 'y', 'pool_index'])
+            self.assertEqual(suite.xs, list(range(6)))
+            self.assertEqual(rows[1], ['0', '60', '', ''])
+            self.assertEqual(rows[4], ['3', '30', '', ''])
+            self.assertEqual(rows[5][:3], ['4', '20', '16'])
+
+            # A resumed suite reruns the aborted inputs.
+            suite = AbortingSuite(num_pools=1, resume=suite_dir.path)
+            suite.abort_at = set()
+            with benchmark.SuiteDirectory(directory) as resume_dir:
+                suite.run_suite(resume_dir)
+            self.assertEqual(suite.xs, [0, 3])
+
+    def test_resource_columns_are_added(self):
+        class LateResourcesSuite(AbortingSuite):
+            def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
+                              args: Dict[Any, Any], input: Input) -> Output:
+                # The first benchmark is aborted before sampling anything, and
+                # only later benchmarks collect garbage.
+                if input.x not in self.abort_at:
+                    bench.write_dict('peak_cpu.json', {'server': 1.0})
+                if input.x >= 4:
+                    bench.write_dict('gc.json', {'p99_spikes': input.x})
+                return super().run_benchmark(bench, args, input)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                suite = LateResourcesSuite(num_pools=2)
+                suite.abort_at = {0}
+                suite.run_suite(suite_dir)
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0], [
+            'x', 'sleep_ms', 'y', 'pool_index', 'peak_cpu.server',
+            'gc_p99_spikes'
+        ])
+        self.assertEqual([len(row) for row in rows], [6] * 7)
+        self.assertEqual(rows[1][:2] + rows[1][4:], ['0', '60', '', ''])
+        self.assertEqual(rows[2][4:], ['1.0', ''])
+        self.assertEqual(rows[5][4:], ['1.0', '4'])
+        self.assertEqual(rows[6][4:], ['1.0', '5'])
+
+    def test_aborted_inputs_with_resources_are_rerun(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with benchmark.SuiteDirectory(directory) as suite_dir:
+                suite = SampledAbortingSuite(num_pools=1)
+                suite.abort_at = {0, 3}
+                suite.run_suite(suite_dir)
+            with open(suite_dir.abspath('results.csv')) as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0], [
+                'x', 'sleep_ms', 'y', 'pool_index', 'peak_cpu.server',
+                'gc_p99_spikes'
+            ])
+            self.assertEqual(rows[4], ['3', '30', '', '', '30.0', '3'])
+
+            suite = SampledAbortingSuite(num_pools=1, resume=suite_dir.path)
+            suite.abort_at = set()
+            with benchmark.SuiteDirectory(directory) as resume_dir:
+                suite.run_suite(resume_dir)
+            self.assertEqual(suite.xs, [0, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
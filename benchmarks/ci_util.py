@@ -0,0 +1,73 @@
+from typing import Iterable, NamedTuple
+import math
+import numpy as np
+
+# Benchmarks are noisy, so suites repeat every input a couple of times. How
+# many repetitions are enough depends on the input, though: some inputs are
+# stable after two runs, and others vary by 20% from run to run. Rather than
+# repeat every input a fixed number of times, a suite can repeat an input until
+# a bootstrap confidence interval on the mean of some metric is narrow enough
+# (see benchmark.Suite.run_suite).
+#
+# We use the percentile bootstrap: we resample the measurements with
+# replacement, compute the mean of every resample, and take the middle
+# `confidence` of the means. It makes no assumptions about the distribution of
+# the measurements, which often have a long tail (e.g., a run in which a
+# machine hiccuped).
+
+# A bootstrap with fewer than this many measurements is meaningless (with one
+# measurement, every resample is the same), so we always need at least this
+# many to decide that an interval is narrow enough.
+MIN_SAMPLES = 3
+
+
+# A ConfidenceInterval is a confidence interval on the mean of `num_samples`
+# measurements.
+class ConfidenceInterval(NamedTuple):
+    num_samples: int
+    mean: float
+    lower: float
+    upper: float
+
+    def relative_width(self) -> float:
+        """
+        relative_width returns the width of the interval as a fraction of the
+        mean, or infinity if it isn't defined.
+        """
+        width = self.upper - self.lower
+        if self.num_samples == 0 or math.isnan(width):
+            return math.inf
+        if width == 0:
+            return 0.0
+        if self.mean == 0:
+            return math.inf
+        return width / abs(self.mean)
+
+    def narrower_than(self, relative_width: float) -> bool:
+        return (self.num_samples >= MIN_SAMPLES and
+                self.relative_width() <= relative_width)
+
+
+def bootstrap(xs: Iterable[float],
+              confidence: float = 0.95,
+              num_resamples: int = 2000,
+              seed: int = 0) -> ConfidenceInterval:
+    """
+    bootstrap returns a percentile bootstrap confidence interval on the mean
+    of `xs`, ignoring NaNs. The resamples are seeded, so the same measurements
+    always produce the same interval.
+    """
+    xs = np.asarray(list(xs), dtype=np.float64)
+    xs = xs[~np.isnan(xs)]
+    if len(xs) == 0:
+        return ConfidenceInterval(0, math.nan, math.nan, math.nan)
+
+    rng = np.random.default_rng(seed)
+    resamples = rng.choice(xs, size=(num_resamples, len(xs)), replace=True)
+    means = resamples.mean(axis=1)
+    alpha = (1 - confidence) / 2
+    (lower, upper) = np.quantile(means, [alpha, 1 - alpha])
+    return ConfidenceInterval(num_samples=len(xs),
+                              mean=float(xs.mean()),
+                              lower=float(lower),
+                              upper=float(upper))
@@ -0,0 +1,42 @@
+from . import ci_util
+import math
+import numpy as np
+import unittest
+
+
+class BootstrapTest(unittest.TestCase):
+    def test_empty(self):
+        ci = ci_util.bootstrap([math.nan])
+        self.assertEqual(ci.num_samples, 0)
+        self.assertEqual(ci.relative_width(), math.inf)
+        self.assertFalse(ci.narrower_than(1))
+
+    def test_constant(self):
+        ci = ci_util.bootstrap([10, 10, 10])
+        self.assertEqual(ci, ci_util.ConfidenceInterval(3, 10, 10, 10))
+        self.assertEqual(ci.relative_width(), 0)
+        self.assertTrue(ci.narrower_than(0.01))
+
+        # Too few samples to tell.
+        self.assertFalse(ci_util.bootstrap([10, 10]).narrower_than(0.01))
+
+    def test_narrows_with_samples(self):
+        xs = np.random.default_rng(0).normal(100, 10, 1000)
+        few = ci_util.bootstrap(xs[:10])
+        many = ci_util.bootstrap(xs)
+        self.assertLess(few.lower, few.mean)
+        self.assertGreater(few.upper, few.mean)
+        self.assertLess(many.relative_width(), few.relative_width())
+        # The standard error of the mean is 10 / sqrt(1000), so a 95% interval
+        # is about 4 * 0.32 wide.
+        self.assertAlmostEqual(many.upper - many.lower, 1.24, delta=0.2)
+        self.assertLessEqual(many.lower, 100)
+        self.assertGreaterEqual(many.upper, 100)
+
+    def test_deterministic(self):
+        xs = [1, 5, 2, 8, 3]
+        self.assertEqual(ci_util.bootstrap(xs), ci_util.bootstrap(xs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
 from . import host
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 import json
+import threading
+
+# Linux picks the source ports of outgoing connections from 32768 up (see
+# /proc/sys/net/ipv4/ip_local_port_range), so a process listening on a port in
+# that range may find it taken by some connection. Pools are kept below it.
+_EPHEMERAL_PORT_START = 32768
+
+# Benchmarks space processes 100 ports apart, so every pool gets ports for at
+# least 10 processes.
+_MIN_POOL_PORTS = 1000
 
 
 # Say you have a function `connect` which converts an address (e.g., 127.0.0.1)
@@ -11,14 +21,18 @@ class _RemoteHostCache:
     def __init__(self, connect: Callable[[str], host.Host]) -> None:
         self._connect = connect
         self._hosts: Dict[str, host.Host] = dict()
+        # Benchmarks running concurrently on different pools (see
+        # Cluster.pools) share a cache.
+        self._lock = threading.Lock()
 
     def connect(self, address: str) -> host.Host:
-        if address in self._hosts:
-            return self._hosts[address]
-        else:
-            host = self._connect(address)
-            self._hosts[address] = host
-            return host
+        with self._lock:
+            if address in self._hosts:
+                return self._hosts[address]
+            else:
+                host = self._connect(address)
+                self._hosts[address] = host
+                return host
 
 
 # Say you want to run Paxos. You need a set of acceptors, a set of replicas, a
@@ -41,6 +55,10 @@ class _RemoteHostCache:
 #   }
 #
 # Placement helps us deal with this kind of data.
+#
+# A cluster can also be split into disjoint pools of machines (see `pools`),
+# so that multiple benchmarks can run on it concurrently. Every pool has its
+# own range of ports starting at `port_base`, below the ephemeral port range.
 class Cluster:
     @staticmethod
     def _sanitize_json(data: Dict[str, Any]) -> Dict[int, Dict[str, List[str]]]:
@@ -86,10 +104,86 @@ class Cluster:
                   connect: Callable[[str], host.Host]) -> 'Cluster':
         return Cluster(cluster, connect)
 
-    def __init__(self, cluster: Dict[int, Dict[str, List[str]]],
-                 connect: Callable[[str], host.Host]) -> None:
-        self._cache = _RemoteHostCache(connect)
+    def __init__(self,
+                 cluster: Dict[int, Dict[str, List[str]]],
+                 connect: Callable[[str], host.Host],
+                 port_base: int = 10000,
+                 cache: Optional[_RemoteHostCache] = None) -> None:
+        self._cache = cache or _RemoteHostCache(connect)
         self._cluster = cluster
+        self.port_base = port_base
+        self._pools: Dict[int, List['Cluster']] = dict()
+
+    def pools(self, n: int) -> List['Cluster']:
+        """
+        pools(n) splits the machines in this cluster into n disjoint pools.
+        Every pool is itself a cluster with the same f values and roles, but
+        no address appears in more than one pool, and every pool is given a
+        disjoint range of ports below the ephemeral port range. A ValueError is
+        raised if there are not enough machines to give every role of every
+        pool at least one address, or not enough ports to give every pool
+        _MIN_POOL_PORTS of them.
+        """
+        if n in self._pools:
+            return self._pools[n]
+
+        if n == 1:
+            self._pools[n] = [self]
+            return self._pools[n]
+
+        # We assign every address to a pool. The assignment is shared across
+        # f values, so that two benchmarks with different f values running on
+        # different pools never share a machine. For every role, we first
+        # hand out addresses to the pools that don't yet have any address for
+        # the role and then hand out the rest round robin.
+        assignment: Dict[str, int] = dict()
+        next_pool = 0
+        for (f, roles) in sorted(self._cluster.items()):
+            for (role, addresses) in roles.items():
+                assigned = {assignment[a] for a in addresses if a in assignment}
+                missing = [i for i in range(n) if i not in assigned]
+                for address in addresses:
+                    if address in assignment:
+                        continue
+                    if missing:
+                        assignment[address] = missing.pop(0)
+                    else:
+                        assignment[address] = next_pool
+                        next_pool = (next_pool + 1) % n
+
+        pools: List[Dict[int, Dict[str, List[str]]]] = [{} for _ in range(n)]
+        for (f, roles) in self._cluster.items():
+            for (role, addresses) in roles.items():
+                for (i, pool) in enumerate(pools):
+                    pool_addresses = [a for a in addresses if assignment[a] == i]
+                    if len(addresses) > 0 and len(pool_addresses) == 0:
+                        raise ValueError(
+                            f'Cannot split cluster into {n} pools. Role {role} '
+                            f'for f value {f} has addresses {addresses}, but '
+                            f'none of them are free for pool {i}.')
+                    pool.setdefault(f, dict())[role] = pool_addresses
+
+        port_stride = (_EPHEMERAL_PORT_START - self.port_base) // n
+        if port_stride < _MIN_POOL_PORTS:
+            raise ValueError(
+                f'{n} pools of ports starting at {self.port_base} do not fit '
+                f'below the ephemeral port range at {_EPHEMERAL_PORT_START}.')
+        self._pools[n] = [
+            Cluster(pool,
+                    self._cache._connect,
+                    port_base=self.port_base + i * port_stride,
+                    cache=self._cache) for (i, pool) in enumerate(pools)
+        ]
+        return self._pools[n]
+
+    def pool(self, args: Dict[Any, Any]) -> 'Cluster':
+        """
+        pool returns the pool that a benchmark was assigned by
+        benchmark.Suite.run_suite. `args` are the arguments passed to
+        run_benchmark.
+        """
+        num_pools = args.get('num_pools') or 1
+        return self.pools(num_pools)[args.get('pool_index', 0)]
 
     def f(self, x: int) -> Dict[str, List[host.Host]]:
         return {
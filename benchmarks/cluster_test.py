@@ -74,6 +74,53 @@ class ClusterTest(unittest.TestCase):
     def test_bad_address(self):
         self.assertRaises(ValueError, self._test_bad_address)
 
+    def test_pools(self):
+        json = """
+        {
+            "1": {
+                "leaders": ["l0", "l1"],
+                "acceptors": ["a0", "a1", "a2", "a3"]
+            },
+            "2": {
+                "leaders": ["l0", "l1", "l2"],
+                "acceptors": ["a0", "a1", "a2", "a3", "a4", "a5"]
+            }
+        }
+        """
+        c = cluster.Cluster.from_json_string(json, lambda a: host.FakeHost(a))
+        pools = c.pools(2)
+        self.assertEqual(len(pools), 2)
+        self.assertNotEqual(pools[0].port_base, pools[1].port_base)
+        # Pools' ports stay below the ephemeral port range.
+        stride = pools[1].port_base - pools[0].port_base
+        self.assertLessEqual(pools[1].port_base + stride, 32768)
+
+        addresses = []
+        for pool in pools:
+            pool_addresses = set()
+            for f in [1, 2]:
+                for (role, hosts) in pool.f(f).items():
+                    self.assertGreater(len(hosts), 0)
+                    pool_addresses |= {h.ip() for h in hosts}
+            addresses.append(pool_addresses)
+        self.assertEqual(addresses[0] & addresses[1], set())
+
+    def _test_too_many_pools(self):
+        json = """ { "1": { "leaders": ["l0", "l1"] } } """
+        c = cluster.Cluster.from_json_string(json, lambda a: host.FakeHost(a))
+        c.pools(3)
+
+    def test_too_many_pools(self):
+        self.assertRaises(ValueError, self._test_too_many_pools)
+
+    def _test_too_many_port_ranges(self):
+        roles = {1: {'leaders': ['l0', 'l1']}}
+        c = cluster.Cluster(roles, lambda a: host.FakeHost(a), port_base=32000)
+        c.pools(2)
+
+    def test_too_many_port_ranges(self):
+        self.assertRaises(ValueError, self._test_too_many_port_ranges)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -22,7 +22,7 @@ def main(args) -> None:
                     warmup_sleep = datetime.timedelta(seconds=0),
                     duration = datetime.timedelta(seconds=2),
                     timeout = datetime.timedelta(seconds=3),
-                    client_lag = datetime.timedelta(seconds=3),
+                    client_lag = datetime.timedelta(seconds=0),
                     workload_label = 'smoke',
                     workload = read_write_workload.PointSkewedReadWriteWorkload(
                         num_keys=10, read_fraction=read_fraction,
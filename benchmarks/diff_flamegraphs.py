@@ -0,0 +1,117 @@
+# diff_flamegraphs.py compares the profiles of two benchmarks, or of two
+# suites, role by role. For example, if we sweep batch_size and throughput
+# drops from one benchmark to the next, we can run
+#
+#     python -m benchmarks.diff_flamegraphs \
+#         /mnt/nfs/tmp/2021-04-07_18:41:18.893020_HAOSRTGXOI_multipaxos/001 \
+#         /mnt/nfs/tmp/2021-04-07_18:41:18.893020_HAOSRTGXOI_multipaxos/002
+#
+# to see where the CPU went. Both benchmarks have to have been profiled (i.e.
+# run with -p), so that their directories have a flamegraph_<role>_<mode>
+# .collapsed file for every role. If a suite directory is passed instead, the
+# profiles of all of its benchmarks are merged.
+#
+# For every role and mode profiled on both sides, we write a differential flame
+# graph of the second profile to diff_flamegraph_<role>_<mode>.svg, with the
+# frames whose share grew in red and those whose share shrank in blue (see
+# flamegraph_util.diff_color), and we print the frames whose self time share
+# changed the most.
+
+from . import flamegraph_util
+from typing import Dict, List, Tuple
+import argparse
+import glob
+import os
+
+
+def read_profiles(path: str) -> Dict[Tuple[str, str], flamegraph_util.Stacks]:
+    """
+    read_profiles reads the per-role profiles of the benchmark directory
+    `path`, or of every benchmark of the suite directory `path`, keyed by role
+    and mode.
+    """
+    prefix = 'flamegraph_'
+    suffix = '.collapsed'
+    filenames = (glob.glob(os.path.join(path, f'{prefix}*{suffix}')) +
+                 glob.glob(os.path.join(path, '*', f'{prefix}*{suffix}')))
+    profiles: Dict[Tuple[str, str], List[flamegraph_util.Stacks]] = dict()
+    for filename in filenames:
+        name = os.path.basename(filename)[len(prefix):-len(suffix)]
+        (role, mode) = name.rsplit('_', 1)
+        stacks = flamegraph_util.read_collapsed(filename)
+        profiles.setdefault((role, mode), []).append(stacks)
+    return {
+        key: flamegraph_util.merge(stacks)
+        for (key, stacks) in profiles.items()
+    }
+
+
+def format_diff(diff: List[Tuple[str, float, float]], n: int) -> str:
+    """format_diff formats the top `n` rows of diff_self_shares as a table."""
+    rows = [('before', 'after', 'change', 'frame')]
+    for (frame, before, after) in diff[:n]:
+        rows.append((f'{100 * before:.2f}%', f'{100 * after:.2f}%',
+                     f'{100 * (after - before):+.2f}%', frame))
+    widths = [max(len(row[i]) for row in rows) for i in range(3)]
+    lines = []
+    for row in rows:
+        numbers = ' '.join(row[i].rjust(widths[i]) for i in range(3))
+        lines.append(f'{numbers}  {row[3]}')
+    return '\n'.join(lines)
+
+
+def _name(path: str) -> str:
+    return os.path.basename(os.path.normpath(path))
+
+
+def main(args) -> None:
+    before = read_profiles(args.before)
+    after = read_profiles(args.after)
+    if len(before) == 0 or len(after) == 0:
+        print('No profiles found. Were the benchmarks run with -p?')
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    for (role, mode) in sorted(set(before) & set(after)):
+        (b, a) = (before[(role, mode)], after[(role, mode)])
+        title = f'{role} ({mode}): {_name(args.after)} vs {_name(args.before)}'
+        svg = flamegraph_util.render(a,
+                                     title,
+                                     color=flamegraph_util.diff_color(b, a))
+        filename = os.path.join(args.output,
+                                f'diff_flamegraph_{role}_{mode}.svg')
+        with open(filename, 'w') as f:
+            f.write(svg)
+
+        print(f'# {role} ({mode})')
+        print(f'Wrote differential flame graph to {filename}.')
+        print(format_diff(flamegraph_util.diff_self_shares(b, a), args.top))
+        print()
+
+    for (role, mode) in sorted(set(before) ^ set(after)):
+        print(f'Only one side profiled {role} ({mode}).')
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('before',
+                        type=str,
+                        help='Benchmark or suite directory to compare against')
+    parser.add_argument('after',
+                        type=str,
+                        help='Benchmark or suite directory to compare')
+    parser.add_argument('-o',
+                        '--output',
+                        type=str,
+                        default='.',
+                        help='Directory to write flame graphs to')
+    parser.add_argument('-n',
+                        '--top',
+                        type=int,
+                        default=20,
+                        help='Number of frames to print for every role')
+    return parser
+
+
+if __name__ == '__main__':
+    main(get_parser().parse_args())
@@ -1,6 +1,8 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import prometheus
 from .. import proto_util
@@ -14,8 +16,6 @@ import datetime
 import itertools
 import json
 import os
-import paramiko
-import time
 import yaml
 
 
@@ -65,6 +65,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -81,36 +83,41 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
 
 # Network ######################################################################
 class EPaxosNet:
-    def __init__(self, cluster_file: str, key_filename: Optional[str],
-                 input: Input) -> None:
+    def __init__(self,
+                 cluster_file: str,
+                 key_filename: Optional[str],
+                 input: Input,
+                 args: Optional[Dict[Any, Any]] = None) -> None:
         self._key_filename = key_filename
+        self._local = (args or {}).get('local', False)
         # It's important that we initialize the cluster after we set
-        # _key_filename since _connect reads _key_filename.
-        self._cluster = (cluster.Cluster.from_json_file(
-            cluster_file, self._connect).f(input.f))
+        # _key_filename and _local since _connect reads them. If the suite is
+        # run on multiple pools, `args` tells us which pool we were assigned.
+        pool = cluster.Cluster.from_json_file(cluster_file,
+                                              self._connect).pool(args or {})
+        self._cluster = pool.f(input.f)
+        self._port_base = pool.port_base
         self._input = input
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self._key_filename:
-            client.connect(address, key_filename=self._key_filename)
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address, self._key_filename, self._local)
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
         replicas: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -141,7 +148,7 @@ class EPaxosNet:
 class EPaxosSuite(benchmark.Suite[Input, Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = EPaxosNet(args['cluster'], args['identity_file'], input)
+        net = EPaxosNet(args['cluster'], args['identity_file'], input, args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -153,14 +160,19 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(net.config()))
         bench.log('Config file config.pbtxt written.')
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch replicas.
         replica_procs = []
         for (i, replica) in enumerate(net.placement().replicas):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.epaxos.ReplicaMain',
@@ -226,6 +238,7 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             replica_procs.append(proc)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch Prometheus.
@@ -253,9 +266,9 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -265,11 +278,10 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs = []
         for (i, client) in enumerate(net.placement().clients):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.client_java(input) + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.epaxos.BenchmarkClientMain',
@@ -308,13 +320,16 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
                         input.client_options.repropose_period.total_seconds()),
                 ])
             client_procs.append(proc)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for proc in client_procs:
-            proc.wait()
-        for proc in replica_procs:
-            proc.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'replicas': replica_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(replica_procs)
         bench.log('Clients finished and processes terminated.')
 
         # Client i writes results to `client_i_data.csv`.
@@ -323,7 +338,11 @@ class EPaxosSuite(benchmark.Suite[Input, Output]):
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
-            bench, client_csvs, drop_prefix=datetime.timedelta(seconds=0))
+            bench,
+            client_csvs,
+            drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False))
 
 
 def get_parser() -> argparse.ArgumentParser:
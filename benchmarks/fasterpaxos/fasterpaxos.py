@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -18,9 +19,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -75,6 +74,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: workload.Workload
@@ -90,6 +91,10 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    server_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 class FasterPaxosOutput(NamedTuple):
     output: benchmark.RecorderOutput
@@ -102,6 +107,7 @@ Output = FasterPaxosOutput
 class FasterPaxosNet:
     def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
         self._cluster = cluster.f(input.f)
+        self._port_base = cluster.port_base
         self._input = input
 
     class Placement(NamedTuple):
@@ -110,7 +116,7 @@ class FasterPaxosNet:
         heartbeats: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -152,46 +158,41 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
                                                        self._connect)
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self,
                       bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: Input) -> Output:
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
 
         # Write config file.
-        net = FasterPaxosNet(self._cluster, input)
+        net = FasterPaxosNet(self._cluster.pool(args), input)
         config = net.config()
         config_filename = bench.abspath('config.pbtxt')
         bench.write_string(config_filename,
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch servers.
         server_procs: List[proc.Proc] = []
         for (i, server) in enumerate(net.placement().servers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=server.host,
                 label=f'server_{i}',
-                cmd=java(input.server_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'server') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.fasterpaxos.ServerMain',
@@ -256,11 +257,10 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
                              .heartbeat_options
                              .network_delay_alpha),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, server.host, p,
-                                           f'server_{i}')
             server_procs.append(p)
+        launcher.barrier()
         bench.log('Servers started.')
 
         # Launch Prometheus.
@@ -288,9 +288,9 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -300,10 +300,10 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.fasterpaxos.ClientMain',
@@ -337,29 +337,35 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{input.num_clients_per_proc}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--workload',
                     f'{workload_filename}',
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in server_procs:
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'servers': server_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(server_procs)
         if input.monitored:
             prometheus_server.kill()
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
 
@@ -367,6 +373,8 @@ class FasterPaxosSuite(benchmark.Suite[Input, Output]):
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)
         output = labeled_data['write']
         return FasterPaxosOutput(output = output)
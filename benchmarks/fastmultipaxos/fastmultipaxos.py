@@ -1,6 +1,8 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
 from .. import prometheus
@@ -17,7 +19,6 @@ import itertools
 import json
 import os
 import pandas as pd
-import paramiko
 import subprocess
 import time
 import yaml
@@ -108,29 +109,35 @@ class Input(NamedTuple):
     client: ClientOptions = ClientOptions()
     client_log_level: str = 'debug'
 
+    # JVM options. #############################################################
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
 
 # Network ######################################################################
 class FastMultiPaxosNet:
-    def __init__(self, cluster_file: str, key_filename: Optional[str],
-                 input: Input) -> None:
+    def __init__(self,
+                 cluster_file: str,
+                 key_filename: Optional[str],
+                 input: Input,
+                 args: Optional[Dict[Any, Any]] = None) -> None:
         self._key_filename = key_filename
+        self._local = (args or {}).get('local', False)
         # It's important that we initialize the cluster after we set
-        # _key_filename since _connect reads _key_filename.
-        self._cluster = (cluster.Cluster.from_json_file(
-            cluster_file, self._connect).f(input.f))
+        # _key_filename and _local since _connect reads them. If the suite is
+        # run on multiple pools, `args` tells us which pool we were assigned.
+        pool = cluster.Cluster.from_json_file(cluster_file,
+                                              self._connect).pool(args or {})
+        self._cluster = pool.f(input.f)
+        self._port_base = pool.port_base
         self._input = input
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self._key_filename:
-            client.connect(address, key_filename=self._key_filename)
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address, self._key_filename, self._local)
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
@@ -141,7 +148,7 @@ class FastMultiPaxosNet:
         acceptor_heartbeats: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -198,7 +205,8 @@ class FastMultiPaxosNet:
 class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = FastMultiPaxosNet(args['cluster'], args['identity_file'], input)
+        net = FastMultiPaxosNet(args['cluster'], args['identity_file'], input,
+                                args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -210,30 +218,19 @@ class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(net.config()))
         bench.log('Config file config.pbtxt written.')
 
-        # If we're monitoring the code, run garbage collection verbosely.
-        java = ['java']
-        if input.monitored:
-            java += [
-                '-verbose:gc',
-                '-XX:-PrintGC',
-                '-XX:+PrintHeapAtGC',
-                '-XX:+PrintGCDetails',
-                '-XX:+PrintGCTimeStamps',
-                '-XX:+PrintGCDateStamps',
-            ]
-        # Increase the heap size.
-        # TODO(mwhittaker): Right now, not much thought has been put into the
-        # heap size. Think more carefully about this. We may want, for example,
-        # to increase the size of the young generation.
-        java += [f'-Xms{input.jvm_heap_size}', f'-Xmx{input.jvm_heap_size}']
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
 
         # Launch acceptors.
         acceptor_procs = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.fastmultipaxos.AcceptorMain',
@@ -254,15 +251,16 @@ class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             acceptor_procs.append(proc)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch leaders.
         leader_procs = []
         for (i, leader) in enumerate(net.placement().leaders):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.fastmultipaxos.LeaderMain',
@@ -313,6 +311,7 @@ class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             leader_procs.append(proc)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -357,10 +356,10 @@ class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs = []
         for (i, client) in enumerate(net.placement().clients):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.fastmultipaxos.BenchmarkClientMain',
@@ -396,26 +395,38 @@ class FastMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                 ])
             client_procs.append(proc)
+        launcher.barrier()
         bench.log('Clients started.')
 
         # Wait for clients to finish and then terminate everything.
-        for proc in client_procs:
-            proc.wait()
-        for proc in leader_procs + acceptor_procs:
-            proc.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'leaders': leader_procs,
+                                   'acceptors': acceptor_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(leader_procs + acceptor_procs)
         if input.monitored:
             prometheus_server.kill()
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
-            bench, client_csvs, drop_prefix=datetime.timedelta(seconds=0))
+            bench,
+            client_csvs,
+            drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False))
 
 
 def get_parser() -> argparse.ArgumentParser:
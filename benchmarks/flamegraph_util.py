@@ -0,0 +1,222 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import html
+import zlib
+
+# A profile is a set of collapsed stacks [1]: every stack of frames (from the
+# root, e.g. `java.lang.Thread.run`, to the leaf) that was sampled, along with
+# the number of samples (or bytes allocated, or nanoseconds blocked, depending
+# on what was profiled). A collapsed stack file has one stack per line, with
+# frames separated by semicolons and followed by the count:
+#
+#     java.lang.Thread.run;frankenpaxos.Actor.receive;... 42
+#
+# A flame graph [2] draws a profile as stacked boxes, one box per frame, with
+# the root at the bottom. A box is as wide as the number of samples of the
+# stacks that go through it, so the widest boxes are where the time goes. We
+# render flame graphs ourselves, as SVGs, so that benchmarks don't need
+# flamegraph.pl.
+#
+# [1]: https://github.com/brendangregg/FlameGraph#2-fold-stacks
+# [2]: http://www.brendangregg.com/flamegraphs.html
+
+Stacks = Dict[str, float]
+
+
+def read_collapsed(filename: str) -> Stacks:
+    """read_collapsed reads a collapsed stack file."""
+    stacks: Stacks = dict()
+    with open(filename) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if ' ' not in line:
+                continue
+            (stack, count) = line.rsplit(' ', 1)
+            try:
+                stacks[stack] = stacks.get(stack, 0) + float(count)
+            except ValueError:
+                continue
+    return stacks
+
+
+def write_collapsed(stacks: Stacks, filename: str) -> None:
+    """write_collapsed writes a collapsed stack file, largest stacks first."""
+    with open(filename, 'w') as f:
+        for (stack, count) in sorted(stacks.items(), key=lambda x: -x[1]):
+            f.write(f'{stack} {count:g}\n')
+
+
+def merge(profiles: Iterable[Stacks]) -> Stacks:
+    """merge adds up the counts of every stack of every profile."""
+    merged: Stacks = dict()
+    for stacks in profiles:
+        for (stack, count) in stacks.items():
+            merged[stack] = merged.get(stack, 0) + count
+    return merged
+
+
+def self_shares(stacks: Stacks) -> Dict[str, float]:
+    """
+    self_shares returns the self time share of every frame in `stacks`: the
+    fraction of the total count spent in the frame itself rather than in the
+    frames it calls (i.e., with the frame at the top of the stack).
+    """
+    total = sum(stacks.values())
+    shares: Dict[str, float] = dict()
+    if total <= 0:
+        return shares
+    for (stack, count) in stacks.items():
+        leaf = stack.rsplit(';', 1)[-1]
+        shares[leaf] = shares.get(leaf, 0) + count / total
+    return shares
+
+
+def diff_self_shares(before: Stacks,
+                     after: Stacks) -> List[Tuple[str, float, float]]:
+    """
+    diff_self_shares returns the self time share (see self_shares) of every
+    frame before and after, ranked by how much it changed, most first. The
+    profiles can have very different totals (e.g., if one benchmark ran
+    longer), so we compare shares rather than counts.
+    """
+    (b, a) = (self_shares(before), self_shares(after))
+    frames = set(b) | set(a)
+    diff = [(f, b.get(f, 0.0), a.get(f, 0.0)) for f in sorted(frames)]
+    return sorted(diff, key=lambda x: -abs(x[2] - x[1]))
+
+
+def _path_shares(stacks: Stacks) -> Dict[Tuple[str, ...], float]:
+    # The share of the total count of every frame, keyed by its stack (as
+    # passed to render's `color`).
+    total = sum(stacks.values())
+    shares: Dict[Tuple[str, ...], float] = dict()
+    if total <= 0:
+        return shares
+    for (stack, count) in stacks.items():
+        path: Tuple[str, ...] = ('all',)
+        shares[path] = shares.get(path, 0) + count / total
+        for name in stack.split(';'):
+            path = path + (name,)
+            shares[path] = shares.get(path, 0) + count / total
+    return shares
+
+
+def diff_color(before: Stacks,
+               after: Stacks) -> Callable[[Tuple[str, ...]], str]:
+    """
+    diff_color returns a `color` for rendering `after` as a differential flame
+    graph [3]. A frame is red if its share of the total grew since `before`
+    and blue if it shrank, the more so the more it changed. Frames that didn't
+    change are white.
+
+    [3]: http://www.brendangregg.com/blog/2014-11-09/differential-flame-graphs.html
+    """
+    (b, a) = (_path_shares(before), _path_shares(after))
+    deltas = {path: share - b.get(path, 0) for (path, share) in a.items()}
+    scale = max([abs(d) for d in deltas.values()], default=0) or 1
+
+    def color(path: Tuple[str, ...]) -> str:
+        d = deltas.get(path, 0) / scale
+        fade = int(255 * (1 - abs(d)))
+        if d > 0:
+            return f'rgb(255,{fade},{fade})'
+        return f'rgb({fade},{fade},255)'
+
+    return color
+
+
+# A _Frame is a node in the tree of stacks. `total` counts every sample that
+# goes through the frame.
+class _Frame:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.total = 0.0
+        self.children: Dict[str, '_Frame'] = dict()
+
+
+def _tree(stacks: Stacks) -> _Frame:
+    root = _Frame('all')
+    for (stack, count) in stacks.items():
+        if count <= 0:
+            continue
+        frame = root
+        frame.total += count
+        for name in stack.split(';'):
+            frame = frame.children.setdefault(name, _Frame(name))
+            frame.total += count
+    return root
+
+
+def _hot(path: Tuple[str, ...]) -> str:
+    # Like flamegraph.pl's default palette, colors are random shades of red,
+    # orange, and yellow, but we derive them from the frame name so that a
+    # frame has the same color in every flame graph.
+    h = zlib.crc32(path[-1].encode())
+    (v1, v2, v3) = ((h & 0xff) / 255, ((h >> 8) & 0xff) / 255,
+                    ((h >> 16) & 0xff) / 255)
+    return f'rgb({205 + int(50 * v3)},{int(230 * v1)},{int(55 * v2)})'
+
+
+_WIDTH = 1200
+_PAD = 10
+_FRAME_HEIGHT = 16
+_FONT_SIZE = 12
+_CHAR_WIDTH = 7
+_TITLE_HEIGHT = 2 * _FRAME_HEIGHT
+
+
+def render(stacks: Stacks,
+           title: str,
+           color: Optional[Callable[[Tuple[str, ...]], str]] = None,
+           unit: str = 'samples') -> str:
+    """
+    render renders `stacks` as a flame graph, returning an SVG. Every frame
+    is colored by `color`, which is passed the frame's stack (from the root to
+    the frame). Hovering over a frame shows its `unit` count.
+    """
+    color = color or _hot
+    root = _tree(stacks)
+
+    def depth(frame: _Frame) -> int:
+        return 1 + max([depth(c) for c in frame.children.values()], default=0)
+
+    height = _TITLE_HEIGHT + depth(root) * _FRAME_HEIGHT + 2 * _PAD
+    scale = (_WIDTH - 2 * _PAD) / root.total if root.total > 0 else 0.0
+    boxes: List[str] = []
+
+    def draw(frame: _Frame, path: Tuple[str, ...], x: float,
+             level: int) -> None:
+        width = frame.total * scale
+        # Frames too narrow to see are left out, along with their children.
+        if width < 0.1:
+            return
+        y = height - _PAD - (level + 1) * _FRAME_HEIGHT
+        percent = 100 * frame.total / root.total
+        name = html.escape(frame.name)
+        num_chars = int(width / _CHAR_WIDTH)
+        if num_chars >= len(frame.name):
+            label = name
+        elif num_chars >= 3:
+            label = html.escape(frame.name[:num_chars - 2] + '..')
+        else:
+            label = ''
+        boxes.append(
+            f'<g><title>{name} ({frame.total:g} {unit}, {percent:.2f}%)'
+            f'</title><rect x="{x:.1f}" y="{y}" width="{width:.1f}" '
+            f'height="{_FRAME_HEIGHT - 1}" fill="{color(path)}" rx="2"/>'
+            f'<text x="{x + 3:.1f}" y="{y + _FRAME_HEIGHT - 4}">{label}'
+            f'</text></g>')
+        for child in sorted(frame.children.values(), key=lambda c: c.name):
+            draw(child, path + (child.name,), x, level + 1)
+            x += child.total * scale
+
+    if root.total > 0:
+        draw(root, ('all',), _PAD, 0)
+    return '\n'.join([
+        f'<svg version="1.1" xmlns="http://www.w3.org/2000/svg" '
+        f'width="{_WIDTH}" height="{height}" '
+        f'font-family="Verdana" font-size="{_FONT_SIZE}">',
+        f'<rect width="100%" height="100%" fill="rgb(248,248,248)"/>',
+        f'<text x="{_WIDTH / 2}" y="{_TITLE_HEIGHT - _PAD}" '
+        f'text-anchor="middle" font-size="{_FONT_SIZE + 5}">'
+        f'{html.escape(title)}</text>',
+    ] + boxes + ['</svg>'])
@@ -0,0 +1,111 @@
+from . import flamegraph_util
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+
+class FlamegraphTest(unittest.TestCase):
+    def test_read_write_collapsed(self) -> None:
+        stacks = {'a;b': 3.0, 'a;c': 1.0, 'a': 2.0}
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'stacks.collapsed')
+            flamegraph_util.write_collapsed(stacks, filename)
+            with open(filename) as f:
+                self.assertEqual(f.read(), 'a;b 3\na 2\na;c 1\n')
+            with open(filename, 'a') as f:
+                f.write('a;b 1\n')
+                f.write('garbage\n')
+            self.assertEqual(flamegraph_util.read_collapsed(filename), {
+                'a;b': 4.0,
+                'a;c': 1.0,
+                'a': 2.0
+            })
+
+    def test_merge(self) -> None:
+        x = {'a;b': 1.0}
+        y = {'a;b': 2.0, 'a': 1.0}
+        self.assertEqual(flamegraph_util.merge([x, y]), {'a;b': 3, 'a': 1})
+
+    def test_self_shares(self) -> None:
+        self.assertEqual(
+            flamegraph_util.self_shares({
+                'a;b': 2,
+                'a': 1,
+                'c;b': 1
+            }), {
+                'b': 0.75,
+                'a': 0.25
+            })
+        self.assertEqual(flamegraph_util.self_shares({}), {})
+
+    def test_diff_self_shares(self) -> None:
+        # The profiles have different totals, so only shares are compared.
+        before = {'a;b': 2.0, 'a;c': 2.0}
+        after = {'a;b': 30.0, 'a;c': 10.0, 'a;d': 10.0}
+        self.assertEqual(flamegraph_util.diff_self_shares(before, after), [
+            ('c', 0.5, 0.2),
+            ('d', 0.0, 0.2),
+            ('b', 0.5, 0.6),
+        ])
+
+    def test_diff_color(self) -> None:
+        before = {'a;b': 1.0, 'a;c': 1.0}
+        after = {'a;b': 3.0, 'a;c': 1.0}
+        color = flamegraph_util.diff_color(before, after)
+        self.assertEqual(color(('all', 'a', 'b')), 'rgb(255,0,0)')
+        self.assertEqual(color(('all', 'a', 'c')), 'rgb(0,0,255)')
+        self.assertEqual(color(('all', 'a')), 'rgb(255,255,255)')
+
+    def test_render(self) -> None:
+        svg = flamegraph_util.render({'a;b': 3, 'a;c': 1, 'd<e>': 4}, 'title')
+        root = ET.fromstring(svg)
+        ns = '{http://www.w3.org/2000/svg}'
+
+        def find(g: ET.Element, tag: str) -> ET.Element:
+            e = g.find(f'{ns}{tag}')
+            assert e is not None
+            return e
+
+        def title(g: ET.Element) -> str:
+            text = find(g, 'title').text
+            assert text is not None
+            return text
+
+        titles = [title(g) for g in root.iter(f'{ns}g')]
+        self.assertEqual(titles, [
+            'all (8 samples, 100.00%)',
+            'a (4 samples, 50.00%)',
+            'b (3 samples, 37.50%)',
+            'c (1 samples, 12.50%)',
+            'd<e> (4 samples, 50.00%)',
+        ])
+
+        # Children sit on top of their parents, within their parents' width.
+        rects = {
+            title(g).split(' ')[0]: find(g, 'rect').attrib
+            for g in root.iter(f'{ns}g')
+        }
+        (a, b, c) = (rects['a'], rects['b'], rects['c'])
+        self.assertLess(float(b['y']), float(a['y']))
+        self.assertEqual(b['x'], a['x'])
+        self.assertAlmostEqual(float(b['width']) + float(c['width']),
+                               float(a['width']),
+                               delta=0.2)
+
+    def test_render_color(self) -> None:
+        def color(path):
+            return 'red' if path[-1] == 'b' else 'blue'
+
+        svg = flamegraph_util.render({'a;b': 1}, 'title', color=color)
+        self.assertEqual(svg.count('fill="red"'), 1)
+        self.assertEqual(svg.count('fill="blue"'), 2)
+
+    def test_render_empty(self) -> None:
+        root = ET.fromstring(flamegraph_util.render({}, 'title'))
+        ns = '{http://www.w3.org/2000/svg}'
+        self.assertEqual(list(root.iter(f'{ns}g')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+from . import recorder_util
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+import numpy as np
+import pandas as pd
+import re
+
+# When a benchmark is monitored, every JVM is run with
+#
+#     -verbose:gc -XX:+PrintGCDetails -XX:+PrintGCTimeStamps
+#     -XX:+PrintGCDateStamps
+#
+# so that it logs every garbage collection to its stdout (i.e., to
+# <label>_out.txt) [1]. With the default (parallel) collector of Java 8, a
+# young collection looks like this
+#
+#     2021-04-07T18:41:20.123+0000: 1.234: [GC (Allocation Failure)
+#     [PSYoungGen: 65536K->10720K(76288K)] 65536K->10736K(251392K),
+#     0.0123456 secs] [Times: user=0.03 sys=0.01, real=0.01 secs]
+#
+# but all on one line: the collection started at 18:41:20.123, 1.234 seconds
+# after the JVM started, because an allocation failed. It shrank the heap from
+# 65536K to 10736K (out of 251392K) and paused the JVM for 12 ms. Full
+# collections start with [Full GC instead. The serial and CMS collectors log
+# collections the same way. The G1 collector logs the heap on a later line,
+#
+#     2021-04-07T18:41:20.123+0000: 1.234: [GC pause (G1 Evacuation Pause)
+#     (young), 0.0123456 secs]
+#        ...
+#        [Eden: 24.0M(24.0M)->0.0B(13.0M) Survivors: 0.0B->3072.0K Heap:
+#        24.0M(256.0M)->4096.0K(256.0M)]
+#
+# which read_pauses also understands. Lines that aren't GC logs (e.g., the
+# log of the process itself) are ignored.
+#
+# [1]: https://www.oracle.com/technetwork/articles/java/g1gc-1984535.html
+
+# The p99 latency of the clients is measured in windows of WINDOW. A window's
+# p99 latency spikes if it is more than SPIKE_FACTOR times the median p99
+# latency of all windows.
+WINDOW = pd.Timedelta(seconds=1)
+SPIKE_FACTOR = 2
+
+# Roles that aren't in the commit path, and so whose pauses don't delay
+# commands.
+OFF_COMMIT_PATH = ['client', 'driver']
+
+_SIZE = r'(\d+(?:\.\d+)?[BKMG])'
+_HEADER = re.compile(r'(\d{4}-\d\d-\d\dT[\d:.]+[+-]\d{4}): '
+                     r'(?:(\d+\.\d+): )?'
+                     r'\[(Full GC|GC(?: pause| remark| cleanup)?)'
+                     r'(?: \(((?:[^()]|\(\))*)\))?')
+_DURATION = re.compile(r', (\d+\.\d+) secs\]')
+_HEAP = re.compile(r'[\])]\s+' + _SIZE + '->' + _SIZE + r'\(' + _SIZE + r'\)')
+_G1_HEAP = re.compile(r'Heap: ' + _SIZE + r'\(' + _SIZE + r'\)->' + _SIZE +
+                      r'\(' + _SIZE + r'\)')
+_UNITS = {'B': 1 / 1024, 'K': 1, 'M': 1024, 'G': 1024 * 1024}
+
+
+# A Pause is one garbage collection. The heap sizes are in kilobytes and are
+# NaN if they weren't logged. uptime_s is NaN if the JVM wasn't run with
+# -XX:+PrintGCTimeStamps.
+class Pause(NamedTuple):
+    start: pd.Timestamp
+    uptime_s: float
+    duration_ms: float
+    kind: str
+    cause: str
+    heap_before_kb: float
+    heap_after_kb: float
+    heap_capacity_kb: float
+
+
+# A RoleGc summarizes the pauses of a role. Like resource_util.peak_cpu, every
+# field is that of the process of the role that fared worst.
+class RoleGc(NamedTuple):
+    total_pause_ms: float
+    max_pause_ms: float
+    alloc_mb_per_s: float
+
+
+def _kb(size: str) -> float:
+    return float(size[:-1]) * _UNITS[size[-1]]
+
+
+def read_pauses(filename: str) -> List[Pause]:
+    """read_pauses reads the garbage collections logged to `filename`."""
+    pauses: List[Pause] = []
+    with open(filename, errors='replace') as f:
+        for line in f:
+            header = _HEADER.search(line)
+            if header is None:
+                # A G1 collection logs the heap after its header.
+                g1_heap = _G1_HEAP.search(line)
+                if (g1_heap is not None and len(pauses) > 0 and
+                        np.isnan(pauses[-1].heap_before_kb)):
+                    pauses[-1] = pauses[-1]._replace(
+                        heap_before_kb=_kb(g1_heap.group(1)),
+                        heap_after_kb=_kb(g1_heap.group(3)),
+                        heap_capacity_kb=_kb(g1_heap.group(4)))
+                continue
+
+            durations = _DURATION.findall(line, header.end())
+            if len(durations) == 0:
+                continue
+            heap = _HEAP.search(line, header.end())
+            (date, uptime, kind, cause) = header.groups()
+            pauses.append(
+                Pause(start=pd.Timestamp(date),
+                      uptime_s=float(uptime) if uptime else np.nan,
+                      duration_ms=float(durations[-1]) * 1000,
+                      kind=kind,
+                      cause=cause or '',
+                      heap_before_kb=_kb(heap.group(1)) if heap else np.nan,
+                      heap_after_kb=_kb(heap.group(2)) if heap else np.nan,
+                      heap_capacity_kb=_kb(heap.group(3)) if heap else np.nan))
+    return pauses
+
+
+def allocation_rate(pauses: pd.DataFrame) -> float:
+    """
+    allocation_rate returns how fast a JVM allocated memory, in MB/s, given
+    its `pauses` (with the columns of Pause, in order), or NaN if there aren't
+    enough of them. Between two collections, the JVM allocates whatever the
+    heap grows by. Before the first collection, it allocates the whole heap,
+    if we know when it started.
+    """
+    pauses = pauses.dropna(subset=['heap_before_kb'])
+    if len(pauses) == 0:
+        return np.nan
+    before = pauses['heap_before_kb'].values
+    after = pauses['heap_after_kb'].values
+    allocated_kb = float(np.maximum(0, before[1:] - after[:-1]).sum())
+    uptime_s = pauses['uptime_s'].values
+    if not np.isnan(uptime_s[-1]):
+        allocated_kb += before[0]
+        elapsed_s = uptime_s[-1]
+    else:
+        starts = pauses['start']
+        elapsed_s = (starts.iloc[-1] - starts.iloc[0]).total_seconds()
+    if elapsed_s <= 0:
+        return np.nan
+    return allocated_kb / 1024 / elapsed_s
+
+
+def role_gc(pauses: pd.DataFrame) -> Dict[str, RoleGc]:
+    """
+    role_gc summarizes the pauses of every role. `pauses` has the columns of
+    Pause along with label and role columns.
+    """
+    summaries: Dict[str, RoleGc] = dict()
+    for (role, df) in pauses.groupby('role'):
+        by_label = df.groupby('label')
+        totals = by_label['duration_ms'].sum()
+        rates = pd.Series([allocation_rate(d) for (_, d) in by_label])
+        summaries[role] = RoleGc(total_pause_ms=float(totals.max()),
+                                 max_pause_ms=float(df['duration_ms'].max()),
+                                 alloc_mb_per_s=float(rates.max()))
+    return summaries
+
+
+class LatencyWindows:
+    """
+    LatencyWindows accumulates the p99 client latency of every window of a
+    stream of measurements in bounded memory, so that the windows can be
+    computed while recorder data is parsed (see
+    benchmark.parse_recorder_data) rather than from the saved data.
+    Measurements are binned by when they finish (see latency_windows), all of
+    which is at or after origin_ns. Like steady_state_util.Bins, a grouped
+    measurement with count c and mean latency l counts as c measurements of
+    latency l. p99 latencies are estimated by a QuantileSketch.
+    """
+    def __init__(self, origin_ns: int, window: pd.Timedelta = WINDOW) -> None:
+        self.origin_ns = origin_ns
+        self.window = window
+        self._sketches: Dict[int, recorder_util.QuantileSketch] = dict()
+
+    def add(self,
+            stop_ns: np.ndarray,
+            latency_nanos: np.ndarray,
+            count: Optional[np.ndarray] = None) -> None:
+        if len(stop_ns) == 0:
+            return
+        if count is None:
+            count = np.ones(len(stop_ns), dtype=np.int64)
+        bins = ((np.asarray(stop_ns, dtype=np.int64) - self.origin_ns) //
+                self.window.value)
+        order = np.argsort(bins, kind='stable')
+        (keys, firsts) = np.unique(bins[order], return_index=True)
+        latencies_ms = np.split(
+            np.asarray(latency_nanos)[order] / 1e6, firsts[1:])
+        counts = np.split(np.asarray(count)[order], firsts[1:])
+        for (key, xs, weights) in zip(keys, latencies_ms, counts):
+            sketch = self._sketches.setdefault(int(key),
+                                               recorder_util.QuantileSketch())
+            sketch.add(xs, weights)
+
+    def windows(self) -> pd.DataFrame:
+        """
+        windows returns one row for every window in which a command finished,
+        with columns start, num_commands, and p99_ms (see latency_windows).
+        """
+        keys = sorted(self._sketches)
+        return pd.DataFrame({
+            'start':
+                pd.to_datetime(
+                    [self.origin_ns + k * self.window.value for k in keys],
+                    utc=True),
+            'num_commands': [len(self._sketches[k]) for k in keys],
+            'p99_ms': [self._sketches[k].quantile(.99) for k in keys],
+        })
+
+
+def latency_windows(df: pd.DataFrame,
+                    pauses: pd.DataFrame,
+                    roles: Optional[Iterable[str]] = None,
+                    window: pd.Timedelta = WINDOW,
+                    spike_factor: float = SPIKE_FACTOR) -> pd.DataFrame:
+    """
+    latency_windows returns the p99 client latency of every window of
+    `window`, flagged by flag_windows. `df` is aggregate recorder data with
+    stop and latency_nanos columns, and commands are binned by when they
+    finish, so that a command stuck behind a pause counts towards the window
+    the pause ends in.
+    """
+    if len(df) == 0:
+        return flag_windows(
+            pd.DataFrame([], columns=['start', 'num_commands', 'p99_ms']),
+            pauses, roles, window, spike_factor)
+    stops = pd.DatetimeIndex(df['stop']).asi8
+    windows = LatencyWindows(int(stops.min()), window)
+    windows.add(stops, df['latency_nanos'].values)
+    return flag_windows(windows.windows(), pauses, roles, window, spike_factor)
+
+
+def flag_windows(windows: pd.DataFrame,
+                 pauses: pd.DataFrame,
+                 roles: Optional[Iterable[str]] = None,
+                 window: pd.Timedelta = WINDOW,
+                 spike_factor: float = SPIKE_FACTOR) -> pd.DataFrame:
+    """
+    flag_windows flags the windows of `window` (see LatencyWindows.windows)
+    whose p99 latency spikes and the windows that overlap a pause of one of
+    `roles` (by default, every role in the commit path). `pauses` is like the
+    argument of role_gc.
+
+    There is one row per window, with columns
+      - start: the start of the window;
+      - num_commands: the number of commands that finished in the window;
+      - p99_ms: their p99 latency;
+      - spike: whether p99_ms spikes (see SPIKE_FACTOR);
+      - gc_pause_ms: how long the pauses that overlap the window paused in
+        it;
+      - gc_roles: the roles that paused, separated by semicolons.
+    """
+    columns = [
+        'start', 'num_commands', 'p99_ms', 'spike', 'gc_pause_ms', 'gc_roles'
+    ]
+    if len(windows) == 0:
+        return pd.DataFrame([], columns=columns)
+    if roles is None:
+        roles = [r for r in pauses['role'].unique() if r not in OFF_COMMIT_PATH]
+    pauses = pauses[pauses['role'].isin(list(roles))]
+
+    windows = windows.sort_values('start').reset_index(drop=True)
+    windows['start'] = pd.to_datetime(windows['start'], utc=True)
+    window_starts = pd.DatetimeIndex(windows['start']).asi8
+    origin_ns = int(window_starts[0])
+    window_ns = window.value
+    index = {
+        (s - origin_ns) // window_ns: i for (i, s) in enumerate(window_starts)
+    }
+    windows['spike'] = (windows['p99_ms'] >
+                        spike_factor * windows['p99_ms'].median())
+
+    gc_pause_ms = [0.0] * len(windows)
+    gc_roles: List[Set[str]] = [set() for _ in range(len(windows))]
+    starts = pd.DatetimeIndex(pauses['start']).asi8
+    for (start_ns, duration_ms, role) in zip(starts, pauses['duration_ms'],
+                                             pauses['role']):
+        stop_ns = start_ns + int(duration_ms * 1e6)
+        first = (start_ns - origin_ns) // window_ns
+        last = (stop_ns - origin_ns) // window_ns
+        for k in range(max(first, 0), last + 1):
+            if k not in index:
+                continue
+            window_start_ns = origin_ns + k * window_ns
+            overlap_ns = (min(stop_ns, window_start_ns + window_ns) -
+                          max(start_ns, window_start_ns))
+            if overlap_ns > 0:
+                gc_pause_ms[index[k]] += overlap_ns / 1e6
+                gc_roles[index[k]].add(role)
+    windows['gc_pause_ms'] = gc_pause_ms
+    windows['gc_roles'] = [';'.join(sorted(r)) for r in gc_roles]
+    return windows[columns]
@@ -0,0 +1,229 @@
+from . import benchmark
+from . import gc_util
+from . import host
+from . import jvm_util
+import datetime
+import json
+import numpy as np
+import os
+import pandas as pd
+import sys
+import tempfile
+import unittest
+
+# GC logs of a JVM run with the parallel collector, interleaved with the
+# process's own log and with -XX:+PrintHeapAtGC output.
+_PARALLEL_LOG = '''\
+[info] Leader started.
+{Heap before GC invocations=1 (full 0):
+ PSYoungGen      total 76288K, used 65536K [0x00000000, 0x00000000)
+2020-01-01T00:00:01.000+0000: 1.000: [GC (Allocation Failure) [PSYoungGen: 65536K->10240K(76288K)] 65536K->10240K(251392K), 0.0100000 secs] [Times: user=0.03 sys=0.01, real=0.01 secs]
+Heap after GC invocations=1 (full 0):
+}
+2020-01-01T00:00:02.000+0000: 2.000: [GC (Allocation Failure) [PSYoungGen: 75776K->10240K(76288K)] 75776K->20480K(251392K), 0.0200000 secs] [Times: user=0.03 sys=0.01, real=0.02 secs]
+2020-01-01T00:00:03.000+0000: 3.000: [Full GC (System.gc()) [PSYoungGen: 10240K->0K(76288K)] [ParOldGen: 10240K->8192K(175104K)] 30720K->8192K(251392K), [Metaspace: 3000K->3000K(1056768K)], 0.1000000 secs] [Times: user=0.10 sys=0.00, real=0.10 secs]
+[info] Leader stopped.
+'''
+
+# A GC log of a JVM run with the G1 collector.
+_G1_LOG = '''\
+2020-01-01T00:00:01.500+0000: 1.500: [GC pause (G1 Evacuation Pause) (young), 0.0050000 secs]
+   [Parallel Time: 4.5 ms, GC Workers: 4]
+   [Eden: 24.0M(24.0M)->0.0B(13.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->4096.0K(256.0M)]
+ [Times: user=0.01 sys=0.00, real=0.01 secs]
+'''
+
+
+def _timestamp(s: float) -> pd.Timestamp:
+    return pd.Timestamp(int(s * 1e9), unit='ns', tz='UTC')
+
+
+def _write(directory: str, filename: str, s: str) -> str:
+    filename = os.path.join(directory, filename)
+    with open(filename, 'w') as f:
+        f.write(s)
+    return filename
+
+
+def _pauses(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['label', 'role', 'start', 'duration_ms'])
+
+
+class ReadPausesTest(unittest.TestCase):
+    def test_parallel(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = _write(directory, 'leader_0_out.txt', _PARALLEL_LOG)
+            pauses = gc_util.read_pauses(filename)
+        self.assertEqual(len(pauses), 3)
+        self.assertEqual(
+            pauses[0],
+            gc_util.Pause(start=pd.Timestamp('2020-01-01T00:00:01Z'),
+                          uptime_s=1.0,
+                          duration_ms=10.0,
+                          kind='GC',
+                          cause='Allocation Failure',
+                          heap_before_kb=65536,
+                          heap_after_kb=10240,
+                          heap_capacity_kb=251392))
+        self.assertEqual(pauses[2].kind, 'Full GC')
+        self.assertEqual(pauses[2].cause, 'System.gc()')
+        self.assertEqual(pauses[2].duration_ms, 100.0)
+        self.assertEqual(pauses[2].heap_before_kb, 30720)
+        self.assertEqual(pauses[2].heap_after_kb, 8192)
+
+    def test_g1(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = _write(directory, 'acceptor_0_out.txt', _G1_LOG)
+            pauses = gc_util.read_pauses(filename)
+        self.assertEqual(len(pauses), 1)
+        self.assertEqual(pauses[0].kind, 'GC pause')
+        self.assertEqual(pauses[0].cause, 'G1 Evacuation Pause')
+        self.assertEqual(pauses[0].duration_ms, 5.0)
+        self.assertEqual(pauses[0].heap_before_kb, 24 * 1024)
+        self.assertEqual(pauses[0].heap_after_kb, 4096)
+        self.assertEqual(pauses[0].heap_capacity_kb, 256 * 1024)
+
+    def test_no_gc(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = _write(directory, 'client_0_out.txt', '[info] Hi.\n')
+            self.assertEqual(gc_util.read_pauses(filename), [])
+
+
+class SummaryTest(unittest.TestCase):
+    def test_allocation_rate(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = _write(directory, 'leader_0_out.txt', _PARALLEL_LOG)
+            pauses = pd.DataFrame(gc_util.read_pauses(filename),
+                                  columns=gc_util.Pause._fields)
+        # 64M before the first collection, 64M between the first and second,
+        # and 10M between the second and third, all in 3 seconds.
+        self.assertAlmostEqual(gc_util.allocation_rate(pauses), 138 / 3)
+
+        # Without uptimes, we only know what was allocated after the first
+        # collection.
+        pauses['uptime_s'] = np.nan
+        self.assertAlmostEqual(gc_util.allocation_rate(pauses), 74 / 2)
+        self.assertTrue(np.isnan(gc_util.allocation_rate(pauses[:1])))
+
+    def test_role_gc(self) -> None:
+        pauses = _pauses([
+            ('leader_0', 'leader', _timestamp(1), 10.0),
+            ('leader_0', 'leader', _timestamp(2), 10.0),
+            ('leader_1', 'leader', _timestamp(1), 15.0),
+        ])
+        for field in ['uptime_s', 'heap_before_kb', 'heap_after_kb']:
+            pauses[field] = np.nan
+        summaries = gc_util.role_gc(pauses)
+        self.assertEqual(list(summaries), ['leader'])
+        self.assertEqual(summaries['leader'].total_pause_ms, 20.0)
+        self.assertEqual(summaries['leader'].max_pause_ms, 15.0)
+        self.assertTrue(np.isnan(summaries['leader'].alloc_mb_per_s))
+
+
+class LatencyWindowsTest(unittest.TestCase):
+    def test_spikes(self) -> None:
+        # A 1 ms command finishes every 10 ms for 5 seconds, except that the
+        # commands that finish in [2, 2.1) take 100 ms because the leader
+        # paused.
+        stops = np.arange(0, 5, 0.01)
+        latencies = np.where((stops >= 2) & (stops < 2.1), 0.1, 0.001)
+        df = pd.DataFrame({
+            'stop': [_timestamp(s) for s in stops],
+            'latency_nanos': (latencies * 1e9).astype(np.int64),
+        })
+        pauses = _pauses([
+            ('leader_0', 'leader', _timestamp(1.95), 100.0),
+            ('client_0', 'client', _timestamp(3.5), 100.0),
+            ('acceptor_0', 'acceptor', _timestamp(3.95), 100.0),
+        ])
+        windows = gc_util.latency_windows(df, pauses)
+        self.assertEqual(list(windows['start']),
+                         [_timestamp(s) for s in range(5)])
+        self.assertEqual(list(windows['num_commands']), [100] * 5)
+        self.assertEqual(list(windows['spike']),
+                         [False, False, True, False, False])
+        np.testing.assert_almost_equal(list(windows['gc_pause_ms']),
+                                       [0, 50, 50, 50, 50])
+        self.assertEqual(list(windows['gc_roles']),
+                         ['', 'leader', 'leader', 'acceptor', 'acceptor'])
+
+    def test_blocks(self) -> None:
+        # Grouped measurements, added in two blocks, count as `count`
+        # measurements of their mean latency.
+        windows = gc_util.LatencyWindows(_timestamp(0).value)
+        windows.add(np.array([_timestamp(0.5).value,
+                              _timestamp(1.5).value]), np.array([1e6, 2e6]),
+                    np.array([99, 10]))
+        windows.add(np.array([_timestamp(0.7).value]), np.array([5e6]),
+                    np.array([1]))
+        df = windows.windows()
+        self.assertEqual(list(df['start']), [_timestamp(0), _timestamp(1)])
+        self.assertEqual(list(df['num_commands']), [100, 10])
+        np.testing.assert_allclose(list(df['p99_ms']), [1, 2], rtol=0.01)
+
+    def test_empty(self) -> None:
+        df = pd.DataFrame({'stop': [], 'latency_nanos': []})
+        windows = gc_util.latency_windows(df, _pauses([]))
+        self.assertEqual(len(windows), 0)
+
+
+class SummarizeGcTest(unittest.TestCase):
+    def _test_summarize_gc(self, streaming: bool) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                # The leader logs its garbage collections, but the client
+                # doesn't, so its stdout isn't read.
+                local = host.LocalHost()
+                bench.popen(local, 'leader_0', [
+                    sys.executable, '-c', 'import sys; print(sys.argv[1])',
+                    _PARALLEL_LOG
+                ] + jvm_util.GC_LOG_FLAGS).wait()
+                bench.popen(local, 'client_0', ['echo', _PARALLEL_LOG]).wait()
+                # The latency windows don't need the recorder data to be
+                # saved.
+                starts = np.arange(0, 5, 0.01)
+                client_csv = bench.abspath('client_0_data.csv')
+                pd.DataFrame({
+                    'start': [_timestamp(s) for s in starts],
+                    'stop': [_timestamp(s + 0.001) for s in starts],
+                    'latency_nanos': 1000000,
+                }).to_csv(client_csv, index=False)
+                benchmark.parse_recorder_data(
+                    bench, [client_csv],
+                    drop_prefix=datetime.timedelta(seconds=1),
+                    save_data=False,
+                    streaming=streaming)
+            with open(os.path.join(path, 'gc.json')) as f:
+                summary = json.load(f)
+            columns = bench.resource_columns()
+            pauses = pd.read_csv(os.path.join(path, 'gc_pauses.csv'))
+            windows = pd.read_csv(os.path.join(path, 'gc_latency_windows.csv'))
+
+        self.assertEqual(list(pauses['label']), ['leader_0'] * 3)
+        self.assertEqual(list(pauses['role']), ['leader'] * 3)
+        self.assertEqual(list(summary['roles']), ['leader'])
+        self.assertEqual(len(windows), 5)
+        self.assertEqual(summary['p99_spikes'], 0)
+        self.assertEqual(columns['gc_total_pause_ms.leader'], 130.0)
+        self.assertEqual(columns['gc_max_pause_ms.leader'], 100.0)
+        self.assertAlmostEqual(columns['gc_alloc_mb_per_s.leader'], 46.0)
+        self.assertEqual(columns['gc_p99_spikes_during_gc'], 0)
+
+    def test_summarize_gc(self) -> None:
+        self._test_summarize_gc(streaming=False)
+
+    def test_summarize_gc_streaming(self) -> None:
+        self._test_summarize_gc(streaming=True)
+
+    def test_no_gc_logs(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                bench.write_string('leader_0_out.txt', _PARALLEL_LOG)
+            self.assertFalse(os.path.exists(os.path.join(path, 'gc.json')))
+            self.assertEqual(bench.resource_columns(), dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,14 @@ from . import driver_workload
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
+from .. import recovery_util
 from .. import util
 from .. import workload
 from typing import Any, Callable, Collection, Dict, List, NamedTuple, Optional
@@ -19,9 +21,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -82,6 +82,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: workload.Workload
@@ -109,14 +111,28 @@ class Input(NamedTuple):
     # Driver options. ##########################################################
     driver_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    driver_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
 
-Output = benchmark.RecorderOutput
+
+# The driver perturbs the protocol (e.g., kills a leader) in the middle of the
+# benchmark, so along with the usual latency and throughput, we record how the
+# protocol recovered from every event the driver triggered.
+class Output(NamedTuple):
+    latency: benchmark.LatencyOutput
+    start_throughput_1s: benchmark.ThroughputOutput
+    recovery: recovery_util.RecoveryOutput
 
 
 # Networks #####################################################################
 class HorizontalNet:
     def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
         self._cluster = cluster.f(input.f)
+        self._port_base = cluster.port_base
         self._input = input
 
     class Placement(NamedTuple):
@@ -128,7 +144,7 @@ class HorizontalNet:
         driver: host.Endpoint
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -185,46 +201,41 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                                                        self._connect)
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self,
                       bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: Input) -> Output:
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
 
         # Write config file.
-        net = HorizontalNet(self._cluster, input)
+        net = HorizontalNet(self._cluster.pool(args), input)
         config = net.config()
         config_filename = bench.abspath('config.pbtxt')
         bench.write_string(config_filename,
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch acceptors.
         acceptor_procs: List[proc.Proc] = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            p = bench.popen(
+            p = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=java(input.acceptor_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.horizontal.AcceptorMain',
@@ -239,20 +250,19 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                     '--prometheus_port',
                     str(acceptor.port + 1) if input.monitored else '-1',
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                           f'acceptor_{i}')
             acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java(input.replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.horizontal.ReplicaMain',
@@ -281,20 +291,19 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeDontRecover',
                     str(input.replica_options.unsafe_dont_recover),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java(input.leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.horizontal.LeaderMain',
@@ -328,10 +337,10 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.leader_options.election_options.
                                  no_ping_timeout_max.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p, f'leader_{i}')
             leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -367,9 +376,9 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -379,13 +388,13 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.horizontal.ClientMain',
@@ -419,15 +428,17 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                     f'{input.num_clients_per_proc}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--workload',
                     f'{workload_filename}',
                     "--options.resendClientRequestPeriod",
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Launch driver.
@@ -436,10 +447,11 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
             driver_workload_filename,
             proto_util.message_to_pbtext(input.driver_workload.to_proto()))
 
+        events_filename = bench.abspath('driver_events.csv')
         driver_proc: proc.Proc = bench.popen(
             host=net.placement().driver.host,
             label=f'driver',
-            cmd=java(input.driver_jvm_heap_size) + [
+            cmd=jvm_util.java(input, 'driver') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.horizontal.DriverMain',
@@ -453,31 +465,46 @@ class HorizontalSuite(benchmark.Suite[Input, Output]):
                 input.driver_log_level,
                 '--driver_workload',
                 f'{driver_workload_filename}',
+                '--events_file',
+                events_filename,
             ])
         bench.log('Driver started')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (leader_procs + acceptor_procs + replica_procs +
-                  [driver_proc]):
-            p.kill()
+        # The driver kills roles on purpose, so we only watch for stalls.
+        bench.wait_for_clients(client_procs,
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(leader_procs + acceptor_procs + replica_procs +
+                      [driver_proc])
         if input.monitored:
             prometheus_server.kill()
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
+        columnar = args.get('columnar', False)
 
         labeled_data = benchmark.parse_labeled_recorder_data(
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
-            save_data=True)
-        return labeled_data['write']
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
+            save_data=True,
+            columnar=columnar)
+        recovery = benchmark.parse_recovery_data(bench,
+                                                 events_filename,
+                                                 columnar=columnar,
+                                                 label='write')
+        return Output(
+            latency=labeled_data['write'].latency,
+            start_throughput_1s=labeled_data['write'].start_throughput_1s,
+            recovery=recovery)
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -1,20 +1,95 @@
 from . import proc
-from typing import Any, NamedTuple, Sequence, Union
+from typing import (Any, Callable, Dict, List, NamedTuple, Optional, Sequence,
+                    Tuple, Union)
 import abc
+import os
 import paramiko
+import socket
+import subprocess
+import threading
+import time
+
+
+# A CpuSet is a set of cores to pin a process to. If `numa_node` is not None,
+# every core is on that NUMA node, and the process allocates its memory from
+# that node as well.
+class CpuSet(NamedTuple):
+    cpus: Tuple[int, ...]
+    numa_node: Optional[int] = None
+
+    def cpulist(self) -> str:
+        """cpulist returns the cores in cpulist format, e.g. `0-3,8`."""
+        ranges: List[str] = []
+        cpus = sorted(self.cpus)
+        start = 0
+        for i in range(1, len(cpus) + 1):
+            if i == len(cpus) or cpus[i] != cpus[i - 1] + 1:
+                if i - 1 == start:
+                    ranges.append(str(cpus[start]))
+                else:
+                    ranges.append(f'{cpus[start]}-{cpus[i - 1]}')
+                start = i
+        return ','.join(ranges)
+
+    def wrap(self, args: Union[str,
+                               Sequence[str]]) -> Union[str, Sequence[str]]:
+        """
+        wrap returns `args` wrapped in a taskset command (or a numactl command,
+        if `numa_node` is set) that runs `args` on these cores. Both exec the
+        command, so it keeps the pid of the wrapper.
+        """
+        if self.numa_node is None:
+            prefix = ['taskset', '-c', self.cpulist()]
+        else:
+            prefix = [
+                'numactl', f'--physcpubind={self.cpulist()}',
+                f'--membind={self.numa_node}'
+            ]
+        if isinstance(args, str):
+            return ' '.join(prefix) + ' ' + args
+        return prefix + list(args)
+
+
+# The command that prints the cores of a host and their NUMA nodes, as lines of
+# `<cpu>,<node>`. Machines without lscpu print one `<cpu>` line per core.
+_CPUS_COMMAND = 'lscpu -p=CPU,NODE 2>/dev/null || seq 0 $(($(nproc) - 1))'
+
+
+def _parse_cpus(output: str) -> Dict[int, int]:
+    cpus: Dict[int, int] = dict()
+    for line in output.splitlines():
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+        fields = line.split(',')
+        # Machines without NUMA leave the node empty.
+        node = fields[1] if len(fields) > 1 and fields[1] != '' else '0'
+        cpus[int(fields[0])] = int(node)
+    return cpus
 
 
 # A Host represents a machine (potentially virtual) on which you can run
 # processes. A Host may represent the local machine (LocalHost) or a remote
-# machine (RemoteHost).
+# machine (RemoteHost). If `cpus` is passed to popen, the process is pinned to
+# those cores.
 class Host(abc.ABC):
     @abc.abstractmethod
     def ip(self) -> str:
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def popen(self, args: Union[str, Sequence[str]], stdout: str,
-              stderr: str) -> proc.Proc:
+    def popen(self,
+              args: Union[str, Sequence[str]],
+              stdout: str,
+              stderr: str,
+              cpus: Optional[CpuSet] = None) -> proc.Proc:
+        raise NotImplementedError()
+
+    def cpus(self) -> Dict[int, int]:
+        """
+        cpus returns a mapping from every core that processes on this host can
+        run on to the NUMA node of the core.
+        """
         raise NotImplementedError()
 
 
@@ -25,34 +100,218 @@ class Endpoint(NamedTuple):
     port: int
 
 
+_local_cpus: Optional[Dict[int, int]] = None
+
+
 class LocalHost(Host):
     def ip(self) -> str:
         return "127.0.0.1"
 
-    def popen(self, args: Union[str, Sequence[str]], stdout: str,
-              stderr: str) -> proc.Proc:
+    def popen(self,
+              args: Union[str, Sequence[str]],
+              stdout: str,
+              stderr: str,
+              cpus: Optional[CpuSet] = None) -> proc.Proc:
+        if cpus is not None:
+            args = cpus.wrap(args)
         return proc.PopenProc(args, stdout=stdout, stderr=stderr)
 
+    def cpus(self) -> Dict[int, int]:
+        global _local_cpus
+        if _local_cpus is None:
+            output = subprocess.run(_CPUS_COMMAND,
+                                    shell=True,
+                                    stdout=subprocess.PIPE,
+                                    universal_newlines=True).stdout
+            # We may be confined to some of the machine's cores (e.g., in a
+            # container).
+            allowed = os.sched_getaffinity(0)
+            _local_cpus = {
+                cpu: node
+                for (cpu, node) in _parse_cpus(output).items()
+                if cpu in allowed
+            }
+            if len(_local_cpus) == 0:
+                _local_cpus = {cpu: 0 for cpu in allowed}
+        return _local_cpus
 
-class RemoteHost(Host):
+
+# A _Connection is an SSH connection to a remote host along with the number
+# of ParamikoProcs currently running on it.
+class _Connection:
     def __init__(self, client: paramiko.SSHClient) -> None:
         self.client = client
+        self.num_channels = 0
+
+    def active(self) -> bool:
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+# A RemoteHost runs processes on a remote machine over SSH. Every process runs
+# on its own SSH channel, and sshd limits the number of channels per connection
+# (MaxSessions, 10 by default), so a RemoteHost multiplexes processes over as
+# many connections as it needs, with at most `max_channels_per_connection`
+# processes running on any one of them. Connections send keepalives, and a
+# connection that has died (e.g., because its transport was reset) is replaced
+# the next time a process is launched.
+#
+# Don't construct a RemoteHost directly. Use `connect` instead, which shares
+# RemoteHosts across the whole process.
+class RemoteHost(Host):
+    def __init__(self,
+                 address: str,
+                 key_filename: Optional[str] = None,
+                 max_channels_per_connection: int = 8,
+                 keepalive_interval_s: int = 30,
+                 connect_attempts: int = 3) -> None:
+        self.address = address
+        self.key_filename = key_filename
+        self.max_channels_per_connection = max_channels_per_connection
+        self.keepalive_interval_s = keepalive_interval_s
+        self.connect_attempts = connect_attempts
+        self._lock = threading.Lock()
+        self._connections: List[_Connection] = []
+        self._ip: Optional[str] = None
+        self._cpus: Optional[Dict[int, int]] = None
+        self._pid_resolver = proc.PidResolver()
+
+        # Connect eagerly, so that unreachable hosts are reported right away.
+        with self._lock:
+            self._connections.append(self._connect())
+
+    def _new_client(self) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
+        if self.key_filename:
+            client.connect(self.address, key_filename=self.key_filename)
+        else:
+            client.connect(self.address)
+        return client
+
+    def _connect(self) -> _Connection:
+        for attempt in range(self.connect_attempts):
+            try:
+                client = self._new_client()
+                break
+            except (paramiko.SSHException, socket.error):
+                if attempt == self.connect_attempts - 1:
+                    raise
+                time.sleep(2**attempt)
+
+        transport = client.get_transport()
+        transport.set_keepalive(self.keepalive_interval_s)
+        if self._ip is None:
+            (self._ip, _port) = transport.getpeername()[:2]
+        return _Connection(client)
+
+    def _acquire(self) -> _Connection:
+        with self._lock:
+            # Drop connections that have died. Their processes are gone.
+            self._connections = [c for c in self._connections if c.active()]
+            for connection in self._connections:
+                if (connection.num_channels < self.max_channels_per_connection):
+                    break
+            else:
+                connection = self._connect()
+                self._connections.append(connection)
+            connection.num_channels += 1
+            return connection
+
+    def _release(self, connection: _Connection) -> None:
+        with self._lock:
+            connection.num_channels -= 1
+
+    @property
+    def client(self) -> paramiko.SSHClient:
+        """client returns a live SSH connection to the host."""
+        connection = self._acquire()
+        self._release(connection)
+        return connection.client
 
     def ip(self) -> str:
-        (ip, _port) = self.client.get_transport().getpeername()
-        return ip
+        assert self._ip is not None
+        return self._ip
+
+    def popen(self,
+              args: Union[str, Sequence[str]],
+              stdout: str,
+              stderr: str,
+              cpus: Optional[CpuSet] = None) -> proc.Proc:
+        if cpus is not None:
+            args = cpus.wrap(args)
+        connection = self._acquire()
+        try:
+            return proc.ParamikoProc(connection.client,
+                                     args,
+                                     stdout=stdout,
+                                     stderr=stderr,
+                                     on_close=lambda: self._release(connection),
+                                     pid_resolver=self._pid_resolver)
+        except Exception:
+            self._release(connection)
+            raise
+
+    def cpus(self) -> Dict[int, int]:
+        if self._cpus is None:
+            (_stdin, stdout, _stderr) = self.client.exec_command(_CPUS_COMMAND)
+            self._cpus = _parse_cpus(stdout.read().decode())
+        return self._cpus
 
-    def popen(self, args: Union[str, Sequence[str]], stdout: str,
-              stderr: str) -> proc.Proc:
-        return proc.ParamikoProc(self.client,
-                                 args,
-                                 stdout=stdout,
-                                 stderr=stderr)
+
+# A RemoteHostPool hands out one RemoteHost per address (and identity file).
+# Benchmarks that run several suites back to back reuse the warm connections
+# of the suites before them instead of paying for a new SSH handshake every
+# time.
+class RemoteHostPool:
+    def __init__(
+        self,
+        new_host: Callable[[str, Optional[str]],
+                           RemoteHost] = RemoteHost) -> None:
+        self._new_host = new_host
+        self._lock = threading.Lock()
+        self._hosts: Dict[Tuple[str, Optional[str]], RemoteHost] = dict()
+
+    def connect(self,
+                address: str,
+                key_filename: Optional[str] = None) -> RemoteHost:
+        with self._lock:
+            key = (address, key_filename)
+            if key not in self._hosts:
+                self._hosts[key] = self._new_host(address, key_filename)
+            return self._hosts[key]
+
+
+_remote_host_pool = RemoteHostPool()
+
+
+def is_local(address: str) -> bool:
+    """is_local returns whether `address` is a loopback address."""
+    return address == 'localhost' or address == '::1' or address.startswith(
+        '127.')
+
+
+def connect(address: str,
+            key_filename: Optional[str] = None,
+            local: bool = False) -> Host:
+    """
+    connect returns the process-wide RemoteHost for `address`, connecting to
+    it if needed. If `address` is a loopback address (see is_local) or if
+    `local` is true, connect instead returns a LocalHost, which runs processes
+    directly rather than over SSH. Passing `local` runs every process of a
+    cluster on this machine, whatever the cluster's addresses are.
+    """
+    if local or is_local(address):
+        return LocalHost()
+    return _remote_host_pool.connect(address, key_filename or None)
 
 
 class FakeHost(Host):
-    def __init__(self, address: str) -> None:
+    def __init__(self,
+                 address: str,
+                 cpus: Optional[Dict[int, int]] = None) -> None:
         self.address = address
+        self._cpus = cpus
 
     def __eq__(self, other: Any) -> bool:
         if isinstance(other, FakeHost):
@@ -63,6 +322,14 @@ class FakeHost(Host):
     def ip(self) -> str:
         return self.address
 
-    def popen(self, args: Union[str, Sequence[str]], stdout: str,
-              stderr: str) -> proc.Proc:
+    def popen(self,
+              args: Union[str, Sequence[str]],
+              stdout: str,
+              stderr: str,
+              cpus: Optional[CpuSet] = None) -> proc.Proc:
         raise NotImplementedError()
+
+    def cpus(self) -> Dict[int, int]:
+        if self._cpus is None:
+            raise NotImplementedError()
+        return self._cpus
@@ -0,0 +1,151 @@
+from . import host
+from typing import List, Optional
+import io
+import os
+import paramiko
+import tempfile
+import unittest
+
+
+class FakeChannel:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def exec_command(self, command: str) -> None:
+        pass
+
+    def makefile(self, mode: str) -> io.BytesIO:
+        return io.BytesIO()
+
+    def recv_exit_status(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeTransport:
+    def __init__(self) -> None:
+        self.active = True
+        self.keepalive: Optional[int] = None
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def set_keepalive(self, interval: int) -> None:
+        self.keepalive = interval
+
+    def getpeername(self):
+        return ('10.0.0.1', 22)
+
+    def open_session(self) -> FakeChannel:
+        return FakeChannel()
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.transport = FakeTransport()
+
+    def get_transport(self) -> FakeTransport:
+        return self.transport
+
+
+class FakeRemoteHost(host.RemoteHost):
+    def __init__(self,
+                 address: str,
+                 key_filename: Optional[str] = None,
+                 **kwargs) -> None:
+        self.clients: List[FakeClient] = []
+        super().__init__(address, key_filename, **kwargs)
+
+    def _new_client(self) -> paramiko.SSHClient:
+        client = FakeClient()
+        self.clients.append(client)
+        return client
+
+
+class RemoteHostTest(unittest.TestCase):
+    def test_connect(self):
+        h = FakeRemoteHost('localhost')
+        self.assertEqual(h.ip(), '10.0.0.1')
+        self.assertEqual(len(h.clients), 1)
+        self.assertEqual(h.clients[0].transport.keepalive, 30)
+
+    def test_max_channels_per_connection(self):
+        h = FakeRemoteHost('localhost', max_channels_per_connection=2)
+        procs = [h.popen(['true'], '/dev/null', '/dev/null') for _ in range(3)]
+        self.assertEqual(len(h.clients), 2)
+
+        # Once a process finishes, its channel is reused.
+        procs[0].wait()
+        h.popen(['true'], '/dev/null', '/dev/null')
+        self.assertEqual(len(h.clients), 2)
+
+    def test_reconnect(self):
+        h = FakeRemoteHost('localhost')
+        h.clients[0].transport.active = False
+        h.popen(['true'], '/dev/null', '/dev/null')
+        self.assertEqual(len(h.clients), 2)
+        self.assertIs(h.client, h.clients[1])
+
+
+class RemoteHostPoolTest(unittest.TestCase):
+    def test_connect(self):
+        pool = host.RemoteHostPool(FakeRemoteHost)
+        a = pool.connect('a')
+        self.assertIs(pool.connect('a'), a)
+        self.assertIsNot(pool.connect('b'), a)
+        self.assertIsNot(pool.connect('a', 'id_rsa'), a)
+
+
+class ConnectTest(unittest.TestCase):
+    def test_local(self):
+        for address in ['localhost', '127.0.0.1', '127.0.1.1', '::1']:
+            self.assertIsInstance(host.connect(address), host.LocalHost)
+        self.assertIsInstance(host.connect('10.0.0.1', local=True),
+                              host.LocalHost)
+        self.assertFalse(host.is_local('10.0.0.1'))
+
+
+class CpuSetTest(unittest.TestCase):
+    def test_cpulist(self):
+        self.assertEqual(host.CpuSet((0,)).cpulist(), '0')
+        self.assertEqual(
+            host.CpuSet((3, 0, 1, 2, 8, 10, 11)).cpulist(), '0-3,8,10-11')
+
+    def test_wrap(self):
+        self.assertEqual(
+            host.CpuSet((0, 1)).wrap(['java', '-version']),
+            ['taskset', '-c', '0-1', 'java', '-version'])
+        self.assertEqual(
+            host.CpuSet((4, 5), numa_node=1).wrap('java -version'),
+            'numactl --physcpubind=4-5 --membind=1 java -version')
+
+    def test_parse_cpus(self):
+        lscpu = '\n'.join([
+            '# CPU,Node',
+            '0,0',
+            '1,1',
+        ])
+        self.assertEqual(host._parse_cpus(lscpu), {0: 0, 1: 1})
+        # Without NUMA, lscpu leaves the node empty.
+        self.assertEqual(host._parse_cpus('0,\n1,\n'), {0: 0, 1: 0})
+        # Without lscpu, every core is on node 0.
+        self.assertEqual(host._parse_cpus('0\n1\n'), {0: 0, 1: 0})
+
+    def test_local_popen(self):
+        h = host.LocalHost()
+        cpu = min(h.cpus())
+        with tempfile.TemporaryDirectory() as directory:
+            stdout = os.path.join(directory, 'out.txt')
+            p = h.popen(['grep', 'Cpus_allowed_list', '/proc/self/status'],
+                        stdout,
+                        os.path.join(directory, 'err.txt'),
+                        cpus=host.CpuSet((cpu,)))
+            self.assertEqual(p.wait(), 0)
+            with open(stdout) as f:
+                self.assertEqual(f.read().split()[-1], str(cpu))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+from typing import Any, List, NamedTuple
+
+# Every benchmark runs its roles on JVMs, and how a JVM is configured (its
+# garbage collector, the size of its heap and young generation, its JIT) can
+# matter as much as how the protocol is configured. Every Input has a
+# JvmOptions for every role (e.g., acceptor_jvm_options), so suites can sweep
+# JVM options like any other input. For example,
+#
+#     inputs = [
+#         multipaxos.Input(
+#             ...,
+#             acceptor_jvm_options=jvm_util.JvmOptions(gc=gc,
+#                                                      young_gen_size=young),
+#         )
+#         for gc in ['parallel', 'g1']
+#         for young in ['', '1g']
+#     ]
+#
+# Like every other input, the options are recorded in results.csv (e.g., in
+# column acceptor_jvm_options.gc). Empty options are left to the JVM's
+# defaults.
+
+# The garbage collectors of Java 8, and the flags that select them.
+GCS = {
+    'parallel': '-XX:+UseParallelGC',
+    'g1': '-XX:+UseG1GC',
+    'cms': '-XX:+UseConcMarkSweepGC',
+    'serial': '-XX:+UseSerialGC',
+}
+
+# The flags that log every garbage collection (see gc_util).
+GC_LOG_FLAGS = [
+    '-verbose:gc',
+    '-XX:-PrintGC',
+    '-XX:+PrintHeapAtGC',
+    '-XX:+PrintGCDetails',
+    '-XX:+PrintGCTimeStamps',
+    '-XX:+PrintGCDateStamps',
+]
+
+
+class JvmOptions(NamedTuple):
+    # The heap size (i.e., -Xms and -Xmx), e.g. '2g'. If empty, the heap size
+    # of the role (e.g., acceptor_jvm_heap_size) is used.
+    heap_size: str = ''
+    # The size of the young generation (i.e., -Xmn), e.g. '1g'.
+    young_gen_size: str = ''
+    # The garbage collector, one of GCS.
+    gc: str = ''
+    # Whether to touch every page of the heap when the JVM starts (i.e.,
+    # -XX:+AlwaysPreTouch), so that the benchmark doesn't pay for page faults.
+    always_pre_touch: bool = False
+    # Flags that configure the JIT, separated by spaces, e.g.
+    # '-XX:-TieredCompilation -XX:CompileThreshold=1000'.
+    jit_flags: str = ''
+    # Any other flags, separated by spaces.
+    extra_args: str = ''
+
+
+def command(heap_size: str, options: JvmOptions, monitored: bool) -> List[str]:
+    """
+    command returns the command to run a JVM with heap size `heap_size` (or
+    none, if empty) and `options`. If `monitored` is true, the JVM logs every
+    garbage collection.
+    """
+    cmd = ['java']
+    heap_size = options.heap_size or heap_size
+    if heap_size:
+        cmd += [f'-Xms{heap_size}', f'-Xmx{heap_size}']
+    if options.young_gen_size:
+        cmd.append(f'-Xmn{options.young_gen_size}')
+    if options.gc:
+        if options.gc not in GCS:
+            raise ValueError(f'Unknown garbage collector {options.gc}. '
+                             f'Expected one of {list(GCS)}.')
+        cmd.append(GCS[options.gc])
+    if options.always_pre_touch:
+        cmd.append('-XX:+AlwaysPreTouch')
+    cmd += options.jit_flags.split()
+    cmd += options.extra_args.split()
+    if monitored:
+        cmd += GC_LOG_FLAGS
+    return cmd
+
+
+def java(input: Any, role: str) -> List[str]:
+    """
+    java returns the command to run role `role` of benchmark input `input` on
+    a JVM, with heap size input.<role>_jvm_heap_size (or input.jvm_heap_size,
+    if all roles have the same heap size, or the JVM's default, if the input
+    has neither) and options input.<role>_jvm_options. If input.monitored is
+    true, the JVM logs every garbage collection.
+    """
+    heap_size = getattr(input, f'{role}_jvm_heap_size',
+                        getattr(input, 'jvm_heap_size', ''))
+    return command(heap_size, getattr(input, f'{role}_jvm_options'),
+                   input.monitored)
+
+
+def client_java(input: Any) -> List[str]:
+    """
+    client_java is like java(input, 'client'), but without a heap size or
+    garbage collection logging, for benchmarks that colocate many clients on
+    one machine.
+    """
+    return command('', input.client_jvm_options, monitored=False)
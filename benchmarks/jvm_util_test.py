@@ -0,0 +1,78 @@
+from . import jvm_util
+from . import util
+from typing import NamedTuple
+import unittest
+
+
+class Input(NamedTuple):
+    jvm_heap_size: str
+    leader_jvm_heap_size: str
+    monitored: bool
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
+
+class JvmUtilTest(unittest.TestCase):
+    def test_command(self) -> None:
+        self.assertEqual(jvm_util.command('', jvm_util.JvmOptions(), False),
+                         ['java'])
+        self.assertEqual(jvm_util.command('1g', jvm_util.JvmOptions(), False),
+                         ['java', '-Xms1g', '-Xmx1g'])
+
+        options = jvm_util.JvmOptions(heap_size='4g',
+                                      young_gen_size='2g',
+                                      gc='g1',
+                                      always_pre_touch=True,
+                                      jit_flags='-XX:-TieredCompilation',
+                                      extra_args='-Xss1m -XX:+UseNUMA')
+        self.assertEqual(jvm_util.command('1g', options, True), [
+            'java',
+            '-Xms4g',
+            '-Xmx4g',
+            '-Xmn2g',
+            '-XX:+UseG1GC',
+            '-XX:+AlwaysPreTouch',
+            '-XX:-TieredCompilation',
+            '-Xss1m',
+            '-XX:+UseNUMA',
+        ] + jvm_util.GC_LOG_FLAGS)
+
+    def test_unknown_gc(self) -> None:
+        with self.assertRaises(ValueError):
+            jvm_util.command('', jvm_util.JvmOptions(gc='zgc'), False)
+
+    def test_java(self) -> None:
+        input = Input(jvm_heap_size='1g',
+                      leader_jvm_heap_size='2g',
+                      monitored=False,
+                      acceptor_jvm_options=jvm_util.JvmOptions(gc='parallel'),
+                      client_jvm_options=jvm_util.JvmOptions(gc='serial'))
+        self.assertEqual(jvm_util.java(input, 'leader'),
+                         ['java', '-Xms2g', '-Xmx2g'])
+        # Acceptors don't have their own heap size.
+        self.assertEqual(jvm_util.java(input, 'acceptor'),
+                         ['java', '-Xms1g', '-Xmx1g', '-XX:+UseParallelGC'])
+        self.assertEqual(jvm_util.client_java(input._replace(monitored=True)),
+                         ['java', '-XX:+UseSerialGC'])
+
+        class NoHeapInput(NamedTuple):
+            monitored: bool
+            replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
+        self.assertEqual(jvm_util.java(NoHeapInput(monitored=False), 'replica'),
+                         ['java'])
+
+    def test_results_columns(self) -> None:
+        input = Input(jvm_heap_size='1g',
+                      leader_jvm_heap_size='2g',
+                      monitored=False)
+        fields = util.flatten_tuple_fields(input)
+        values = util.flatten_tuple(input)
+        self.assertEqual(len(fields), len(values))
+        self.assertIn('acceptor_jvm_options.gc', fields)
+        self.assertIn('acceptor_jvm_options.young_gen_size', fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+from . import benchmark
+from . import host
+from . import perf_util
+from . import proc
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Sequence,
+                    Union)
+import concurrent.futures
+import threading
+
+
+# A _LaunchedProc is a proc that is still being launched by a Launcher. It
+# masquerades as the proc being launched and blocks until the launch finishes
+# whenever the proc is used. This lets benchmarks hold on to procs without
+# waiting for every one of them to launch.
+class _LaunchedProc(proc.Proc):
+    def __init__(self, host: host.Host,
+                 future: concurrent.futures.Future) -> None:
+        self.host = host
+        self._future = future
+
+    def launched(self) -> proc.Proc:
+        return self._future.result()
+
+    def cmd(self) -> str:
+        return self.launched().cmd()
+
+    def pid(self) -> Optional[int]:
+        return self.launched().pid()
+
+    def wait(self) -> Optional[int]:
+        return self.launched().wait()
+
+    def kill(self) -> None:
+        self.launched().kill()
+
+    def poll(self) -> Optional[int]:
+        # A process that is still being launched hasn't finished.
+        if not self._future.done():
+            return None
+        return self.launched().poll()
+
+
+# Launching a process on a remote host takes a couple of SSH round trips, and
+# so does killing one. A benchmark with dozens of processes that launches and
+# kills them one at a time can spend minutes doing so. A Launcher launches and
+# kills processes concurrently on a thread pool. At most `max_per_host`
+# operations run at once on any one host, so we don't open too many SSH
+# channels on a single connection.
+#
+# Roles often have to be started in order (e.g., leaders after acceptors), so
+# a benchmark calls `barrier` between roles. For example:
+#
+#     launcher = launch_util.Launcher(bench)
+#     acceptor_procs = [launcher.popen(...) for a in acceptors]
+#     launcher.barrier()
+#     leader_procs = [launcher.popen(...) for l in leaders]
+#     launcher.barrier()
+#     ...
+#     launcher.kill(acceptor_procs + leader_procs)
+#
+# A Launcher waits for its pending launches when `bench` exits, so a process
+# launched concurrently with a failure is still reaped.
+class Launcher(object):
+    def __init__(self,
+                 bench: benchmark.BenchmarkDirectory,
+                 max_workers: int = 32,
+                 max_per_host: int = 4) -> None:
+        self._bench = bench
+        self._max_per_host = max_per_host
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self._lock = threading.Lock()
+        self._host_semaphores: Dict[str, threading.Semaphore] = dict()
+        self._pending: List[concurrent.futures.Future] = []
+        bench.process_stack.callback(self.shutdown)
+
+    def _host_semaphore(self, host: Optional[host.Host]) -> threading.Semaphore:
+        address = host.ip() if host is not None else ''
+        with self._lock:
+            if address not in self._host_semaphores:
+                self._host_semaphores[address] = threading.Semaphore(
+                    self._max_per_host)
+            return self._host_semaphores[address]
+
+    def _submit(self, host: Optional[host.Host],
+                f: Callable[[], Any]) -> concurrent.futures.Future:
+        semaphore = self._host_semaphore(host)
+
+        def run() -> Any:
+            with semaphore:
+                return f()
+
+        future = self._executor.submit(run)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def popen(self,
+              host: host.Host,
+              label: str,
+              cmd: Union[str, Sequence[str]],
+              profiled: bool = False,
+              cpus: Optional[host.CpuSet] = None) -> proc.Proc:
+        """
+        popen is a concurrent bench.popen. It returns immediately with a proc
+        that blocks until the process has been launched whenever it's used. If
+        `profiled` is true, the process is profiled (see perf_util.profile).
+        """
+        def launch() -> proc.Proc:
+            p = self._bench.popen(host=host, label=label, cmd=cmd, cpus=cpus)
+            if profiled:
+                p = perf_util.profile(self._bench, host, p, label)
+            return p
+
+        return _LaunchedProc(host, self._submit(host, launch))
+
+    def barrier(self) -> None:
+        """
+        barrier waits for every process launched so far to be launched. If any
+        launch failed, the exception is raised.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+        for future in pending:
+            future.result()
+
+    def kill(self, procs: Iterable[proc.Proc]) -> None:
+        """kill kills `procs` concurrently and waits for them to be killed."""
+        # Every proc has to be launched before it can be killed.
+        self.barrier()
+        for p in procs:
+            host = p.host if isinstance(p, _LaunchedProc) else None
+            self._submit(host, p.kill)
+        self.barrier()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,42 @@
+from . import benchmark
+from . import host
+from . import launch_util
+import os
+import tempfile
+import time
+import unittest
+
+
+class LauncherTest(unittest.TestCase):
+    def test_launch_and_kill(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                launcher = launch_util.Launcher(bench, max_per_host=2)
+                local = host.LocalHost()
+                procs = [
+                    launcher.popen(local, f'sleep_{i}', ['sleep', '60'])
+                    for i in range(4)
+                ]
+                launcher.barrier()
+                self.assertEqual(len(bench.pids), 4)
+
+                start = time.time()
+                launcher.kill(procs)
+                self.assertLess(time.time() - start, 30)
+                for p in procs:
+                    self.assertIsNotNone(p.wait())
+
+    def test_barrier_raises(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                launcher = launch_util.Launcher(bench)
+                launcher.popen(host.LocalHost(), 'missing',
+                               ['/nonexistent/binary'])
+                with self.assertRaises(FileNotFoundError):
+                    launcher.barrier()
+
+
+if __name__ == '__main__':
+    unittest.main()
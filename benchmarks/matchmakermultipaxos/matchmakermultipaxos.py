@@ -2,12 +2,14 @@ from . import driver_workload
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
+from .. import recovery_util
 from .. import util
 from .. import workload
 from ..workload import Workload
@@ -21,9 +23,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -119,6 +119,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -154,14 +156,30 @@ class Input(NamedTuple):
     # Driver options. ##########################################################
     driver_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    matchmaker_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    reconfigurer_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    driver_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
 
-Output = benchmark.RecorderOutput
+
+# The driver perturbs the protocol (e.g., kills a leader) in the middle of the
+# benchmark, so along with the usual latency and throughput, we record how the
+# protocol recovered from every event the driver triggered.
+class Output(NamedTuple):
+    latency: benchmark.LatencyOutput
+    start_throughput_1s: benchmark.ThroughputOutput
+    recovery: recovery_util.RecoveryOutput
 
 
 # Networks #####################################################################
 class MatchmakerMultiPaxosNet:
     def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
         self._cluster = cluster.f(input.f)
+        self._port_base = cluster.port_base
         self._input = input
 
     class Placement(NamedTuple):
@@ -175,7 +193,7 @@ class MatchmakerMultiPaxosNet:
         driver: host.Endpoint
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -247,44 +265,33 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
         self._cluster = cluster.Cluster.from_json_file(self.args()['cluster'],
                                                        self._connect)
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
         # Write config file.
-        net = MatchmakerMultiPaxosNet(self._cluster, input)
+        net = MatchmakerMultiPaxosNet(self._cluster.pool(args), input)
         config = net.config()
         config_filename = bench.abspath('config.pbtxt')
         bench.write_string(config_filename,
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
 
         # Launch acceptors.
         acceptor_procs: List[proc.Proc] = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            p = bench.popen(
+            p = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=java(input.acceptor_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.AcceptorMain',
@@ -302,20 +309,19 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.acceptor_options
                                       .phase1a_delay.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                           f'acceptor_{i}')
             acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch matchmakers.
         matchmaker_procs: List[proc.Proc] = []
         for (i, matchmaker) in enumerate(net.placement().matchmakers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=matchmaker.host,
                 label=f'matchmaker_{i}',
-                cmd=java(input.matchmaker_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'matchmaker') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.MatchmakerMain',
@@ -333,20 +339,19 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.matchmaker_options
                                       .match_request_delay.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, matchmaker.host, p,
-                                           f'matchmaker_{i}')
             matchmaker_procs.append(p)
+        launcher.barrier()
         bench.log('Matchmakers started.')
 
         # Launch reconfigurers.
         reconfigurer_procs: List[proc.Proc] = []
         for (i, reconfigurer) in enumerate(net.placement().reconfigurers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=reconfigurer.host,
                 label=f'reconfigurer_{i}',
-                cmd=java(input.reconfigurer_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'reconfigurer') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.ReconfigurerMain',
@@ -373,20 +378,19 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.reconfigurer_options.
                                  resend_match_phase2as_period.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, reconfigurer.host, p,
-                                           f'reconfigurer_{i}')
             reconfigurer_procs.append(p)
+        launcher.barrier()
         bench.log('Reconfigurers started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java(input.replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.ReplicaMain',
@@ -415,20 +419,19 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeDontRecover',
                     str(input.replica_options.unsafe_dont_recover),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java(input.leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.LeaderMain',
@@ -487,10 +490,10 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.leader_options.election_options.
                                  no_ping_timeout_max.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p, f'leader_{i}')
             leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -534,9 +537,9 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -546,13 +549,13 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.matchmakermultipaxos.ClientMain',
@@ -586,15 +589,17 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
                     '--options.stutter',
                     str(input.client_options.stutter),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Launch driver.
@@ -603,10 +608,11 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
             driver_workload_filename,
             proto_util.message_to_pbtext(input.driver_workload.to_proto()))
 
+        events_filename = bench.abspath('driver_events.csv')
         driver_proc: proc.Proc = bench.popen(
             host=net.placement().driver.host,
             label=f'driver',
-            cmd=java(input.driver_jvm_heap_size) + [
+            cmd=jvm_util.java(input, 'driver') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.matchmakermultipaxos.DriverMain',
@@ -620,27 +626,41 @@ class MatchmakerMultiPaxosSuite(benchmark.Suite[Input, Output]):
                 input.driver_log_level,
                 '--driver_workload',
                 f'{driver_workload_filename}',
+                '--events_file',
+                events_filename,
             ])
         bench.log('Driver started')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (leader_procs + matchmaker_procs + reconfigurer_procs +
-                  acceptor_procs + replica_procs + [driver_proc]):
-            p.kill()
+        # The driver kills roles on purpose, so we only watch for stalls.
+        bench.wait_for_clients(client_procs,
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(leader_procs + matchmaker_procs + reconfigurer_procs +
+                      acceptor_procs + replica_procs + [driver_proc])
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
-        return benchmark.parse_recorder_data(
+        columnar = args.get('columnar', False)
+        recorder_output = benchmark.parse_recorder_data(
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
-            save_data=True)
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
+            save_data=True,
+            columnar=columnar)
+        recovery = benchmark.parse_recovery_data(bench,
+                                                 events_filename,
+                                                 columnar=columnar)
+        return Output(latency=recorder_output.latency,
+                      start_throughput_1s=recorder_output.start_throughput_1s,
+                      recovery=recovery)
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -19,9 +20,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -107,6 +106,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -142,29 +143,39 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    batcher_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
 
 # Networks #####################################################################
 class MenciusNet:
-    def __init__(self, cluster_file: str, key_filename: Optional[str],
-                 input: Input) -> None:
+    def __init__(self,
+                 cluster_file: str,
+                 key_filename: Optional[str],
+                 input: Input,
+                 args: Optional[Dict[Any, Any]] = None) -> None:
         self._key_filename = key_filename
+        self._local = (args or {}).get('local', False)
         # It's important that we initialize the cluster after we set
-        # _key_filename since _connect reads _key_filename.
-        self._cluster = (cluster.Cluster.from_json_file(
-            cluster_file, self._connect).f(input.f))
+        # _key_filename and _local since _connect reads them. If the suite is
+        # run on multiple pools, `args` tells us which pool we were assigned.
+        pool = cluster.Cluster.from_json_file(cluster_file,
+                                              self._connect).pool(args or {})
+        self._cluster = pool.f(input.f)
+        self._port_base = pool.port_base
         self._input = input
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self._key_filename:
-            client.connect(address, key_filename=self._key_filename)
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address, self._key_filename, self._local)
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
@@ -177,7 +188,7 @@ class MenciusNet:
         proxy_replicas: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -293,7 +304,7 @@ class MenciusNet:
 class MenciusSuite(benchmark.Suite[Input, Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = MenciusNet(args['cluster'], args['identity_file'], input)
+        net = MenciusNet(args['cluster'], args['identity_file'], input, args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -306,27 +317,19 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        # If we're monitoring the code, run garbage collection verbosely.
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
 
         # Launch batchers.
         batcher_procs: List[proc.Proc] = []
         for (i, batcher) in enumerate(net.placement().batchers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=batcher.host,
                 label=f'batcher_{i}',
-                cmd=java(input.batcher_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'batcher') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.BatcherMain',
@@ -343,20 +346,19 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                     '--options.batchSize',
                     str(input.batcher_options.batch_size),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, batcher.host, p,
-                                           f'batcher_{i}')
             batcher_procs.append(p)
+        launcher.barrier()
         bench.log('Batchers started.')
 
         # Launch proxy_leaders.
         proxy_leader_procs: List[proc.Proc] = []
         for (i, proxy_leader) in enumerate(net.placement().proxy_leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_leader.host,
                 label=f'proxy_leader_{i}',
-                cmd=java(input.proxy_leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.ProxyLeaderMain',
@@ -373,11 +375,10 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                     '--options.flushPhase2asEveryN',
                     str(input.proxy_leader_options.flush_phase2as_every_n),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_leader.host, p,
-                                           f'proxy_leader_{i}')
             proxy_leader_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyLeaders started.')
 
         # Launch acceptors.
@@ -389,10 +390,10 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                 for (i, acceptor) in enumerate(acceptor_group):
                     label = (f'acceptor_{leader_group_index}_'
                              f'{acceptor_group_index}_{i}')
-                    p = bench.popen(
+                    p = launcher.popen(
                         host=acceptor.host,
                         label=label,
-                        cmd=java(input.acceptor_jvm_heap_size) + [
+                        cmd=jvm_util.java(input, 'acceptor') + [
                             '-cp',
                             os.path.abspath(args['jar']),
                             'frankenpaxos.mencius.AcceptorMain',
@@ -411,20 +412,19 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                             '--prometheus_port',
                             str(acceptor.port + 1) if input.monitored else '-1',
                         ],
+                        profiled=input.profiled,
                     )
-                    if input.profiled:
-                        p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                                   label)
                     acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java(input.replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.ReplicaMain',
@@ -456,20 +456,19 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeDontRecover',
                     str(input.replica_options.unsafe_dont_recover),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch proxy_replicas.
         proxy_replica_procs: List[proc.Proc] = []
         for (i, proxy_replica) in enumerate(net.placement().proxy_replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_replica.host,
                 label=f'proxy_replica_{i}',
-                cmd=java(input.proxy_replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.ProxyReplicaMain',
@@ -486,21 +485,20 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                     '--options.flushEveryN',
                     str(input.proxy_replica_options.flush_every_n),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_replica.host, p,
-                                           f'proxy_replica_{i}')
             proxy_replica_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyReplicas started.')
 
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (group_index, group) in enumerate(net.placement().leaders):
             for (i, leader) in enumerate(group):
-                p = bench.popen(
+                p = launcher.popen(
                     host=leader.host,
                     label=f'leader_{group_index}_{i}',
-                    cmd=java(input.leader_jvm_heap_size) + [
+                    cmd=jvm_util.java(input, 'leader') + [
                         '-cp',
                         os.path.abspath(args['jar']),
                         'frankenpaxos.mencius.LeaderMain',
@@ -535,11 +533,10 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                         '{}s'.format(input.leader_options.election_options.
                                      no_ping_timeout_max.total_seconds()),
                     ],
+                    profiled=input.profiled,
                 )
-                if input.profiled:
-                    p = perf_util.JavaPerfProc(bench, leader.host, p,
-                                               f'leader_{group_index}_{i}')
                 leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -590,9 +587,9 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -602,13 +599,13 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.ClientMain',
@@ -642,32 +639,45 @@ class MenciusSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (batcher_procs + leader_procs + proxy_leader_procs +
-                  acceptor_procs + replica_procs + proxy_replica_procs):
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'batchers': batcher_procs,
+                                   'leaders': leader_procs,
+                                   'proxy_leaders': proxy_leader_procs,
+                                   'acceptors': acceptor_procs,
+                                   'replicas': replica_procs,
+                                   'proxy_replicas': proxy_replica_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(batcher_procs + leader_procs + proxy_leader_procs +
+                      acceptor_procs + replica_procs + proxy_replica_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)
 
 
@@ -34,7 +34,7 @@ def main(args) -> None:
                     warmup_sleep = datetime.timedelta(seconds=5),
                     duration = datetime.timedelta(seconds=10),
                     timeout = datetime.timedelta(seconds=15),
-                    client_lag = datetime.timedelta(seconds=5),
+                    client_lag = datetime.timedelta(seconds=0),
                     state_machine = 'KeyValueStore',
                     predetermined_read_fraction = predetermined_read_fraction,
                     workload =
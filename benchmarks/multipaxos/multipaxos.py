@@ -1,9 +1,11 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
+from .. import placement_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -18,9 +20,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -127,6 +127,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     predetermined_read_fraction: int
@@ -171,6 +173,16 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    batcher_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    read_batcher_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 class MultiPaxosOutput(NamedTuple):
     read_output: benchmark.RecorderOutput
@@ -182,9 +194,15 @@ Output = MultiPaxosOutput
 
 # Networks #####################################################################
 class MultiPaxosNet:
-    def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
+    def __init__(self,
+                 cluster: cluster.Cluster,
+                 input: Input,
+                 optimize_placement: bool = False) -> None:
         self._cluster = cluster.f(input.f)
+        self._port_base = cluster.port_base
         self._input = input
+        self._optimize_placement = optimize_placement
+        self._optimized_hosts: Optional[Dict[str, List[host.Host]]] = None
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
@@ -198,7 +216,7 @@ class MultiPaxosNet:
         proxy_replicas: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -206,6 +224,16 @@ class MultiPaxosNet:
         def cycle_take_n(n: int, hosts: List[host.Host]) -> List[host.Host]:
             return list(itertools.islice(itertools.cycle(hosts), n))
 
+        def take_n(n: int, role: str) -> List[host.Host]:
+            if not self._optimize_placement:
+                return cycle_take_n(n, self._cluster[role])
+            if self._optimized_hosts is None:
+                self._optimized_hosts = placement_util.place(
+                    self.role_loads(),
+                    self._cluster,
+                    capacity=lambda h: len(h.cpus()))
+            return self._optimized_hosts[role]
+
         def chunks(xs, n):
             # https://stackoverflow.com/a/312464/3187068
             result = []
@@ -215,37 +243,111 @@ class MultiPaxosNet:
 
         n = 2 * self._input.f + 1
         return self.Placement(
-            clients=portify(
-                cycle_take_n(self._input.num_client_procs,
-                             self._cluster['clients'])),
-            batchers=portify(
-                cycle_take_n(self._input.num_batchers,
-                             self._cluster['batchers'])),
+            clients=portify(take_n(self._input.num_client_procs, 'clients')),
+            batchers=portify(take_n(self._input.num_batchers, 'batchers')),
             read_batchers=portify(
-                cycle_take_n(self._input.num_read_batchers,
-                             self._cluster['read_batchers'])),
-            leaders=portify(
-                cycle_take_n(self._input.num_leaders,
-                             self._cluster['leaders'])),
-            leader_elections=portify(
-                cycle_take_n(self._input.num_leaders,
-                             self._cluster['leaders'])),
+                take_n(self._input.num_read_batchers, 'read_batchers')),
+            leaders=portify(take_n(self._input.num_leaders, 'leaders')),
+            leader_elections=portify(take_n(self._input.num_leaders,
+                                            'leaders')),
             proxy_leaders=portify(
-                cycle_take_n(self._input.num_proxy_leaders,
-                             self._cluster['proxy_leaders'])),
+                take_n(self._input.num_proxy_leaders, 'proxy_leaders')),
             acceptors=chunks(
-                portify(cycle_take_n(self._input.num_acceptor_groups *
-                                     self._input.num_acceptors_per_group,
-                                     self._cluster['acceptors'])),
+                portify(
+                    take_n(
+                        self._input.num_acceptor_groups *
+                        self._input.num_acceptors_per_group, 'acceptors')),
                 self._input.num_acceptors_per_group),
-            replicas=portify(
-                cycle_take_n(self._input.num_replicas,
-                             self._cluster['replicas'])),
+            replicas=portify(take_n(self._input.num_replicas, 'replicas')),
             proxy_replicas=portify(
-                cycle_take_n(self._input.num_proxy_replicas,
-                             self._cluster['proxy_replicas'])),
+                take_n(self._input.num_proxy_replicas, 'proxy_replicas')),
         )
 
+    def role_loads(self) -> Dict[str, placement_util.Role]:
+        """
+        role_loads returns the expected load of every process, in messages sent
+        and received per command, for placement_util.place. The loads follow
+        the path of a command through the protocol, assuming that every role
+        spreads its work evenly over its processes. Only the first leader is
+        active, and the other leaders are idle.
+        """
+        input = self._input
+        quorum = input.f + 1
+        if input.predetermined_read_fraction >= 0:
+            reads = input.predetermined_read_fraction / 100
+        else:
+            reads = getattr(input.workload, 'read_fraction', 0.0)
+        writes = 1 - reads
+        linearizable = input.read_consistency == 'linearizable'
+
+        # Batchers batch writes, and every batch is chosen in a single slot.
+        # A proxy leader sends a slot's Phase2a to a quorum of one acceptor
+        # group, collects their Phase2bs, and sends a Chosen to every replica.
+        # One replica replies to the clients, through a proxy replica if there
+        # are any.
+        write_batch_size = 1
+        if input.num_batchers > 0:
+            write_batch_size = input.batcher_options.batch_size
+        slots = writes / write_batch_size
+        replies = 1 if input.num_proxy_replicas > 0 else write_batch_size
+        clients = 2 * writes + 2 * reads
+        batchers = writes + slots if input.num_batchers > 0 else 0
+        leader = 2 * slots
+        proxy_leaders = slots * (1 + 2 * quorum + input.num_replicas)
+        acceptors = slots * 2 * quorum
+        replicas = slots * (input.num_replicas + replies)
+        proxy_replicas = slots * (1 + write_batch_size)
+
+        # A linearizable read first asks a quorum of one acceptor group for
+        # its largest slot. Read batchers do so once per batch, and clients
+        # once per read.
+        if input.num_read_batchers > 0:
+            scheme = input.read_batcher_options.read_batching_scheme.split(',')
+            read_batch_size = int(scheme[1]) if scheme[0] == 'size' else 1
+            batches = reads / read_batch_size
+            read_replies = 1 if input.num_proxy_replicas > 0 else read_batch_size
+            read_batchers = reads + batches
+            if linearizable:
+                read_batchers += batches * 2 * quorum
+                acceptors += batches * 2 * quorum
+            replicas += batches * (1 + read_replies)
+            if input.num_proxy_replicas > 0:
+                proxy_replicas += batches * (1 + read_batch_size)
+        else:
+            read_batchers = 0
+            if linearizable:
+                clients += reads * 2 * quorum
+                acceptors += reads * 2 * quorum
+            replicas += reads * 2
+
+        def spread(total: float, n: int) -> List[float]:
+            return [total / n] * n
+
+        num_acceptors = (input.num_acceptor_groups *
+                         input.num_acceptors_per_group)
+        return {
+            'clients':
+                placement_util.Role(spread(clients, input.num_client_procs)),
+            'batchers':
+                placement_util.Role(spread(batchers, input.num_batchers)),
+            'read_batchers':
+                placement_util.Role(
+                    spread(read_batchers, input.num_read_batchers)),
+            'leaders':
+                placement_util.Role([leader] + [0.0] * (input.num_leaders - 1)),
+            'proxy_leaders':
+                placement_util.Role(
+                    spread(proxy_leaders, input.num_proxy_leaders)),
+            'acceptors':
+                placement_util.Role(spread(acceptors, num_acceptors),
+                                    group_size=input.num_acceptors_per_group),
+            'replicas':
+                placement_util.Role(spread(replicas, input.num_replicas)),
+            'proxy_replicas':
+                placement_util.Role(
+                    spread(proxy_replicas, input.num_proxy_replicas)),
+        }
+
     def config(self) -> proto_util.Message:
         return {
             'f': self._input.f,
@@ -296,47 +398,45 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                                                        self._connect)
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self,
                       bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: Input) -> Output:
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
 
         # Write config file.
-        net = MultiPaxosNet(self._cluster, input)
+        net = MultiPaxosNet(self._cluster.pool(args),
+                            input,
+                            optimize_placement=args.get('optimize_placement',
+                                                        False))
         config = net.config()
         config_filename = bench.abspath('config.pbtxt')
         bench.write_string(config_filename,
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch acceptors.
         acceptor_procs: List[proc.Proc] = []
         for (group_index, group) in enumerate(net.placement().acceptors):
             for (i, acceptor) in enumerate(group):
-                p = bench.popen(
+                p = launcher.popen(
                     host=acceptor.host,
                     label=f'acceptor_{group_index}_{i}',
-                    cmd=java(input.acceptor_jvm_heap_size) + [
+                    cmd=jvm_util.java(input, 'acceptor') + [
                         '-cp',
                         os.path.abspath(args['jar']),
                         'frankenpaxos.multipaxos.AcceptorMain',
@@ -353,20 +453,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                         '--prometheus_port',
                         str(acceptor.port + 1) if input.monitored else '-1',
                     ],
+                    profiled=input.profiled,
                 )
-                if input.profiled:
-                    p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                               f'acceptor_{group_index}_{i}')
                 acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch batchers.
         batcher_procs: List[proc.Proc] = []
         for (i, batcher) in enumerate(net.placement().batchers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=batcher.host,
                 label=f'batcher_{i}',
-                cmd=java(input.batcher_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'batcher') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.BatcherMain',
@@ -383,20 +482,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.batchSize',
                     str(input.batcher_options.batch_size),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, batcher.host, p,
-                                           f'batcher_{i}')
             batcher_procs.append(p)
+        launcher.barrier()
         bench.log('Batchers started.')
 
         # Launch read_batchers.
         read_batcher_procs: List[proc.Proc] = []
         for (i, read_batcher) in enumerate(net.placement().read_batchers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=read_batcher.host,
                 label=f'read_batcher_{i}',
-                cmd=java(input.read_batcher_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'read_batcher') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ReadBatcherMain',
@@ -417,20 +515,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeReadAtI',
                     f'{input.read_batcher_options.unsafe_read_at_i}',
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, read_batcher.host, p,
-                                           f'read_batcher_{i}')
             read_batcher_procs.append(p)
+        launcher.barrier()
         bench.log('ReadBatchers started.')
 
         # Launch proxy_leaders.
         proxy_leader_procs: List[proc.Proc] = []
         for (i, proxy_leader) in enumerate(net.placement().proxy_leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_leader.host,
                 label=f'proxy_leader_{i}',
-                cmd=java(input.proxy_leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ProxyLeaderMain',
@@ -447,20 +544,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.flushPhase2asEveryN',
                     str(input.proxy_leader_options.flush_phase2as_every_n),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_leader.host, p,
-                                           f'proxy_leader_{i}')
             proxy_leader_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyLeaders started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java(input.replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ReplicaMain',
@@ -492,20 +588,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeDontRecover',
                     str(input.replica_options.unsafe_dont_recover),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch proxy_replicas.
         proxy_replica_procs: List[proc.Proc] = []
         for (i, proxy_replica) in enumerate(net.placement().proxy_replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_replica.host,
                 label=f'proxy_replica_{i}',
-                cmd=java(input.proxy_replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ProxyReplicaMain',
@@ -524,20 +619,19 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.batchFlush',
                     str(input.proxy_replica_options.batch_flush),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_replica.host, p,
-                                           f'proxy_replica_{i}')
             proxy_replica_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyReplicas started.')
 
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java(input.leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.LeaderMain',
@@ -569,10 +663,10 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.leader_options.election_options.
                                  no_ping_timeout_max.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p, f'leader_{i}')
             leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -625,9 +719,9 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -645,13 +739,13 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ClientMain',
@@ -685,6 +779,8 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{input.num_clients_per_proc}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--read_consistency',
                     f'{input.read_consistency}',
                     '--predetermined_read_fraction',
@@ -720,26 +816,36 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{input.client_options.flush_writes_every_n}',
                     '--options.flushReadsEveryN',
                     f'{input.client_options.flush_reads_every_n}',
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (batcher_procs + read_batcher_procs + leader_procs +
-                  proxy_leader_procs + acceptor_procs + replica_procs +
-                  proxy_replica_procs):
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'batchers': batcher_procs,
+                                   'read_batchers': read_batcher_procs,
+                                   'leaders': leader_procs,
+                                   'proxy_leaders': proxy_leader_procs,
+                                   'acceptors': acceptor_procs,
+                                   'replicas': replica_procs,
+                                   'proxy_replicas': proxy_replica_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(batcher_procs + read_batcher_procs + leader_procs +
+                      proxy_leader_procs + acceptor_procs + replica_procs +
+                      proxy_replica_procs)
         if input.monitored:
             prometheus_server.kill()
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
 
@@ -770,6 +876,8 @@ class MultiPaxosSuite(benchmark.Suite[Input, Output]):
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)
         read_output = (labeled_data['read']
                        if 'read' in labeled_data
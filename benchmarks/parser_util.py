@@ -1,6 +1,7 @@
 from . import pd_util
 from typing import Tuple
 import argparse
+import datetime
 import os
 import pandas as pd
 
@@ -33,7 +34,18 @@ def get_benchmark_parser() -> argparse.ArgumentParser:
     parser.add_argument('-p',
                         '--profile',
                         action='store_true',
-                        help='Profile code using perf')
+                        help='Profile code (see --profiler), rendering a '
+                        'flame graph of every role')
+    parser.add_argument('--profiler',
+                        choices=['async_profiler', 'jfr', 'perf'],
+                        default='async_profiler',
+                        help='The profiler --profile profiles with')
+    parser.add_argument('--profile_mode',
+                        choices=['cpu', 'alloc', 'lock'],
+                        action='append',
+                        help='What async_profiler and jfr profile: CPU time, '
+                        'allocated bytes, or time blocked on locks. Can be '
+                        'repeated (default: cpu)')
     parser.add_argument('-m',
                         '--monitor',
                         action='store_true',
@@ -49,6 +61,79 @@ def get_benchmark_parser() -> argparse.ArgumentParser:
     parser.add_argument('-i',
                         '--identity_file',
                         help='SSH identity file for remote benchmarks')
+    parser.add_argument('--local',
+                        action='store_true',
+                        help='Run every process on this machine without SSH, '
+                        'whatever the addresses in the cluster file are '
+                        '(loopback addresses always run without SSH)')
+    parser.add_argument('--num_pools',
+                        type=int,
+                        default=1,
+                        help='Split the cluster into this many disjoint pools '
+                        'of machines and run benchmarks on them concurrently')
+    parser.add_argument('--resume',
+                        type=str,
+                        default=None,
+                        help='Resume the suite in this existing suite '
+                        'directory, skipping inputs that already completed')
+    parser.add_argument('--columnar',
+                        action='store_true',
+                        help='Store recorder data and suite results as '
+                        'uncompressed Arrow files')
+    parser.add_argument('--streaming',
+                        action='store_true',
+                        help='Summarize recorder data in bounded memory '
+                        'rather than loading it all at once, estimating '
+                        'latency and throughput percentiles to within 0.1%%')
+    parser.add_argument('--ci_metric',
+                        type=str,
+                        default=None,
+                        help='Repeat every input until the bootstrap '
+                        'confidence interval on the mean of this results.csv '
+                        'column (e.g., start_throughput_1s.p90) is narrow '
+                        'enough')
+    parser.add_argument('--ci_width',
+                        type=float,
+                        default=0.05,
+                        help='The widest acceptable confidence interval, as a '
+                        'fraction of the mean (see --ci_metric)')
+    parser.add_argument('--max_repeats',
+                        type=int,
+                        default=10,
+                        help='Run every input at most this many times (see '
+                        '--ci_metric)')
+    parser.add_argument('--binary_recorder',
+                        action='store_true',
+                        help='Have clients record measurements in binary '
+                        'rather than CSV (every protocol but epaxos supports '
+                        'this, but only with a measurement_group_size of 1)')
+    parser.add_argument('--stall_timeout',
+                        type=lambda s: datetime.timedelta(seconds=float(s)),
+                        default=datetime.timedelta(seconds=60),
+                        help='Abort a benchmark if its clients record no '
+                        'data for this many seconds (0 to never abort)')
+    parser.add_argument('--sample_resources',
+                        action='store_true',
+                        help='Sample the CPU, memory, context switches, and '
+                        'network usage of every process every second, and '
+                        'record the peak CPU usage of every role')
+    parser.add_argument('--pin_cpus',
+                        action='store_true',
+                        help='Pin every process to its own range of cores on '
+                        'its machine, so that colocated processes do not '
+                        'compete for cores (requires taskset, or numactl on '
+                        'NUMA machines)')
+    parser.add_argument('--optimize_placement',
+                        action='store_true',
+                        help='Place processes to balance their expected load '
+                        'across machines rather than round robin, keeping '
+                        'the acceptors of a group on different machines '
+                        '(only some protocols support this)')
+    parser.add_argument('--keep_transients',
+                        action='store_true',
+                        help="Summarize all recorder data rather than only "
+                        "the detected steady state, i.e. don't drop the JVM "
+                        "warm-up and client drain")
     return parser
 
 
@@ -1,4 +1,4 @@
-from typing import Iterable, List
+from typing import Any, IO, Iterable, List, Optional, Tuple, Union
 import numpy as np
 import pandas as pd
 
@@ -15,6 +15,210 @@ def read_csvs(filenames: Iterable[str], **kwargs) -> pd.DataFrame:
     return pd.concat(dfs, ignore_index=True)
 
 
+# The Arrow schema metadata key under which write_columnar records the names of
+# the columns that it encoded from timestamps to int64 nanoseconds.
+_DATETIME_COLUMNS_KEY = b'frankenpaxos.datetime_columns'
+
+
+def import_pyarrow() -> Any:
+    # pyarrow is only needed to read and write columnar data, so we don't
+    # require it to be installed unless it's used.
+    try:
+        import pyarrow
+        import pyarrow.feather
+        return pyarrow
+    except ImportError as e:
+        raise ImportError('Reading or writing columnar data requires pyarrow. '
+                          'Run `pip install pyarrow`.') from e
+
+
+def arrow_schema(df: pd.DataFrame) -> Any:
+    """
+    arrow_schema(df) is the Arrow schema that write_columnar uses for df.
+    Timestamps are stored as int64 nanoseconds since the epoch (in UTC),
+    integers as int64, and strings (e.g., labels) are dictionary encoded. The
+    names of the timestamp columns are recorded in the schema's metadata so
+    that read_columnar can convert them back.
+    """
+    pa = import_pyarrow()
+    fields = []
+    datetime_columns = []
+    for name in df.columns:
+        dtype = df[name].dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            fields.append(pa.field(name, pa.int64()))
+            datetime_columns.append(name)
+        elif pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(name, pa.int64()))
+        elif (pd.api.types.is_object_dtype(dtype) or
+              pd.api.types.is_categorical_dtype(dtype)):
+            fields.append(pa.field(name, pa.dictionary(pa.int32(),
+                                                       pa.string())))
+        else:
+            fields.append(pa.field(name, pa.from_numpy_dtype(dtype)))
+    metadata = {_DATETIME_COLUMNS_KEY: ','.join(datetime_columns).encode()}
+    return pa.schema(fields, metadata=metadata)
+
+
+def to_record_batch(df: pd.DataFrame, schema: Any) -> Any:
+    """
+    to_record_batch(df, schema) encodes df as an Arrow record batch with the
+    given schema (see arrow_schema). The index of df is ignored.
+    """
+    pa = import_pyarrow()
+    arrays = []
+    for field in schema:
+        s = df[field.name]
+        if pa.types.is_dictionary(field.type):
+            categorical = pd.Categorical(s)
+            codes = categorical.codes
+            arrays.append(
+                pa.DictionaryArray.from_arrays(
+                    pa.array(codes, type=pa.int32(), mask=codes < 0),
+                    pa.array(categorical.categories.astype(str),
+                             type=pa.string())))
+        elif pd.api.types.is_datetime64_any_dtype(s.dtype):
+            if getattr(s.dtype, 'tz', None) is not None:
+                s = s.dt.tz_convert('UTC').dt.tz_localize(None)
+            arrays.append(
+                pa.array(s.values.astype('datetime64[ns]').view(np.int64),
+                         type=pa.int64()))
+        else:
+            arrays.append(pa.array(s.values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_columnar(df: pd.DataFrame, filename: str) -> None:
+    """
+    write_columnar(df, filename) writes df (including its index, if it's
+    named) to filename as an uncompressed Arrow IPC (i.e. Feather V2) file.
+    Unlike a CSV, the file can be memory-mapped, and readers can read only the
+    columns they need. See read_columnar.
+    """
+    pa = import_pyarrow()
+    if df.index.name is not None:
+        df = df.reset_index()
+    schema = arrow_schema(df)
+    with pa.OSFile(filename, 'wb') as f:
+        with pa.ipc.new_file(f, schema) as writer:
+            writer.write_batch(to_record_batch(df, schema))
+
+
+def read_columnar(filename: str,
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    read_columnar(filename, columns) memory-maps an Arrow file written by
+    write_columnar and reads the given columns (or every column if `columns`
+    is None) into a dataframe. Timestamps are converted back to UTC
+    timestamps, and dictionary encoded strings become categoricals.
+    """
+    pa = import_pyarrow()
+    table = pa.feather.read_table(filename, columns=columns, memory_map=True)
+    metadata = table.schema.metadata or dict()
+    datetime_columns = set(
+        metadata.get(_DATETIME_COLUMNS_KEY, b'').decode().split(','))
+    df = table.to_pandas()
+    for name in df.columns:
+        if name in datetime_columns:
+            df[name] = pd.to_datetime(df[name], unit='ns', utc=True)
+    return df
+
+
+# The fixed-width records written by a frankenpaxos.BenchmarkUtil.BinaryRecorder.
+# Records are packed, so fields are not aligned. BINARY_RECORDER_MAGIC and the
+# record layout must match BenchmarkUtil.BinaryRecorder.
+BINARY_RECORDER_MAGIC = b'FPREC001'
+BINARY_RECORDER_DTYPE = np.dtype([
+    ('start', '<i8'),
+    ('stop', '<i8'),
+    ('count', '<i4'),
+    ('latency_nanos', '<i8'),
+    ('label', 'u1'),
+])
+
+
+def read_binary_recorder_data(filename: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    read_binary_recorder_data(filename) memory-maps a file written by a
+    BinaryRecorder. It returns the records as a structured array with fields
+    start, stop, count, latency_nanos, and label (see BINARY_RECORDER_DTYPE)
+    and the label dictionary, where records['label'][i] indexes the
+    dictionary. Nothing is copied; a column is only read from disk when it's
+    used. A trailing partial record (e.g., from a client that crashed) is
+    ignored.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(len(BINARY_RECORDER_MAGIC) + 8)
+        if header[:len(BINARY_RECORDER_MAGIC)] != BINARY_RECORDER_MAGIC:
+            raise ValueError(f'{filename} is not a BinaryRecorder file.')
+        (header_size,
+         num_labels) = np.frombuffer(header[len(BINARY_RECORDER_MAGIC):],
+                                     dtype='<i4')
+        labels: List[str] = []
+        for _ in range(num_labels):
+            (length,) = np.frombuffer(f.read(2), dtype='<i2')
+            labels.append(f.read(int(length)).decode('utf-8'))
+        f.seek(0, 2)
+        num_records = (f.tell() - header_size) // BINARY_RECORDER_DTYPE.itemsize
+
+    if num_records <= 0:
+        return (np.zeros(0, dtype=BINARY_RECORDER_DTYPE), labels)
+    records = np.memmap(filename,
+                        dtype=BINARY_RECORDER_DTYPE,
+                        mode='r',
+                        offset=int(header_size),
+                        shape=(int(num_records),))
+    return (records, labels)
+
+
+def binary_recorder_dataframe(
+        records: np.ndarray,
+        labels: List[str],
+        columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    binary_recorder_dataframe converts records read by
+    read_binary_recorder_data into the same dataframe that reading the
+    equivalent CSV would produce: start and stop are UTC timestamps and label
+    is a categorical. Measurements recorded in place of a Recorder's have a
+    "host:port" label and a count of 1 rather than host and port columns.
+    """
+    names = BINARY_RECORDER_DTYPE.names
+    assert names is not None
+    df = pd.DataFrame()
+    for name in columns or list(names):
+        if name in ['start', 'stop']:
+            df[name] = pd.to_datetime(records[name], unit='ns', utc=True)
+        elif name == 'label':
+            df[name] = pd.Categorical.from_codes(records[name].astype(np.int32),
+                                                 categories=labels)
+        else:
+            df[name] = records[name]
+    return df
+
+
+def read_recorder_data(file: Union[str, IO],
+                       columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    read_recorder_data(file, columns) reads aggregate recorder data written by
+    a benchmark. If the file ends in .arrow or .bin, only `columns` are read,
+    straight from a memory-mapped file (see read_columnar and
+    read_binary_recorder_data). Otherwise, the file is read as a (possibly
+    compressed) CSV. Either way, `start` and `stop` are parsed as timestamps.
+    `file` can be a filename or an open file.
+    """
+    filename = file if isinstance(file, str) else file.name
+    if filename.endswith('.arrow'):
+        return read_columnar(filename, columns)
+    if filename.endswith('.bin'):
+        (records, labels) = read_binary_recorder_data(filename)
+        return binary_recorder_dataframe(records, labels, columns)
+
+    parse_dates = [
+        name for name in ['start', 'stop'] if columns is None or name in columns
+    ]
+    return pd.read_csv(file, usecols=columns, parse_dates=parse_dates)
+
+
 def outliers(s: pd.Series, n: float) -> pd.Series:
     """
     `outliers(s, n)` is a boolean vector of the values in s that are n or more
@@ -53,7 +257,7 @@ def throughput(s: pd.Series, window_size_ms: float,
       10:59:03 am - 11:00:03 am | [0, 1]    |
       10:59:54 am - 11:00:54 am | [0, 1, 2] |
       11:00:34 am - 11:01:34 am | [2, 3]    |
-      11:01:16 am - 11:02:16 am | [2, 3, 4] |
+      11:01:16 am - 11:02:16 am | [3, 4]    |
 
     If we count the number of entries in each window and divide by the window
     size, we get the throughput of each window measured in events per second.
@@ -63,44 +267,69 @@ def throughput(s: pd.Series, window_size_ms: float,
       10:59:03 am - 11:00:03 am | 2 / 60     |
       10:59:54 am - 11:00:54 am | 3 / 60     |
       11:00:34 am - 11:01:34 am | 2 / 60     |
-      11:01:16 am - 11:02:16 am | 3 / 60     |
+      11:01:16 am - 11:02:16 am | 2 / 60     |
 
     This is what `throughput` computes. If `trim` is true, the first
-    window_size_ms of throughput data is trimmed.
+    window_size_ms of throughput data is trimmed. Otherwise, the first 100
+    entries are dropped, and every remaining entry within the first
+    window_size_ms reports the average throughput since the first entry
+    instead (the rolling windows are not yet full at that point).
+
+    The computation is a single vectorized pass over the int64 nanosecond
+    timestamps. See `rolling_sums`.
     """
-    s = pd.Series(0, index=s.sort_values())
-    throughput = (s.rolling(f'{window_size_ms}ms').count() /
+    index = pd.DatetimeIndex(s).sort_values()
+    if len(index) == 0:
+        return pd.Series([], index=index, dtype=float)
+
+    times = index.asi8
+    window_size_ns = int(window_size_ms * 1e6)
+    window_end = times[0] + window_size_ns
+    throughput = (rolling_sums(times, np.ones(len(times)), window_size_ns) /
                   (window_size_ms / 1000))
     if trim:
-        t = (throughput.index[0] +
-             pd.DateOffset(microseconds=window_size_ms * 1000))
-        return throughput[throughput.index >= t]
-    else:
-        # TODO(mwhittaker): Fix up. It's a little jank.
-        start_time = throughput.index[0]
-        offset = pd.DateOffset(microseconds=window_size_ms*1000)
-        for i, (index, row) in enumerate(s.iteritems(), start=1):
-            if i < 100:
-                continue
-            if index > start_time + offset:
-                return throughput[100:]
-            throughput[index] = i / (index - start_time).total_seconds()
-        return throughput[100:]
+        mask = times >= window_end
+        return pd.Series(throughput[mask], index=index[mask])
+
+    # Entries with the same timestamp all report the throughput up to and
+    # including the last of them.
+    ramp = (times > times[0]) & (times <= window_end)
+    num_entries = np.searchsorted(times, times[ramp], side='right')
+    throughput[ramp] = num_entries / ((times[ramp] - times[0]) / 1e9)
+    return pd.Series(throughput, index=index)[100:]
 
 
 def weighted_throughput(s: pd.Series, window_size_ms: float) -> pd.Series:
     """
-    weighted_throughput is the same as throughput, except that every
-    measurement in `s` is weighted with some count. A measurement with count
-    `x` is counted `x` times.
+    weighted_throughput is the same as throughput (with `trim` set), except
+    that every measurement in `s` is weighted with some count. A measurement
+    with count `x` is counted `x` times. `s` is indexed by timestamp, and its
+    values are the counts (e.g., the `count` column of LabeledRecorder data).
     """
-    window_size_s = window_size_ms / 1000
-    window_size_us = window_size_ms * 1000
+    s = s.sort_index(kind='mergesort')
+    if len(s) == 0:
+        return s.astype(float)
+
+    times = pd.DatetimeIndex(s.index).asi8
+    window_size_ns = int(window_size_ms * 1e6)
+    throughput = pd.Series(
+        rolling_sums(times, s.values, window_size_ns) / (window_size_ms / 1000),
+        index=s.index)
+    return throughput[times >= times[0] + window_size_ns]
+
 
-    s = s.sort_index()
-    throughput = s.rolling(f'{window_size_ms}ms').sum() / window_size_s
-    t = throughput.index[0] + pd.DateOffset(microseconds=window_size_us)
-    return throughput[throughput.index >= t]
+def rolling_sums(times_ns: np.ndarray, weights: np.ndarray,
+                 window_size_ns: int) -> np.ndarray:
+    """
+    rolling_sums(times_ns, weights, window_size_ns)[i] is the sum of
+    weights[j] for every j <= i with times_ns[j] in the window
+    (times_ns[i] - window_size_ns, times_ns[i]]. times_ns must be sorted. This
+    is what pandas computes for `s.rolling(f'{window_size_ms}ms').sum()`, but
+    with one np.searchsorted instead of a window per entry.
+    """
+    cumulative = np.concatenate([[0], np.cumsum(weights)])
+    left = np.searchsorted(times_ns, times_ns - window_size_ns, side='right')
+    return cumulative[1:] - cumulative[left]
 
 
 def rate(s: pd.Series, window_size_ms: float) -> pd.Series:
@@ -0,0 +1,175 @@
+from . import pd_util
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# The row-by-row pandas implementations that pd_util.throughput and
+# pd_util.weighted_throughput replaced. We keep them around to check that the
+# vectorized implementations compute the same thing.
+def _reference_throughput(s: pd.Series, window_size_ms: float,
+                          trim: bool = False) -> pd.Series:
+    s = pd.Series(0, index=s.sort_values())
+    throughput = (s.rolling(f'{window_size_ms}ms').count() /
+                  (window_size_ms / 1000))
+    if trim:
+        t = (throughput.index[0] +
+             pd.DateOffset(microseconds=window_size_ms * 1000))
+        return throughput[throughput.index >= t]
+    else:
+        start_time = throughput.index[0]
+        offset = pd.DateOffset(microseconds=window_size_ms * 1000)
+        for i, (index, row) in enumerate(s.items(), start=1):
+            if i < 100:
+                continue
+            if index > start_time + offset:
+                return throughput[100:]
+            throughput[index] = i / (index - start_time).total_seconds()
+        return throughput[100:]
+
+
+def _reference_weighted_throughput(s: pd.Series,
+                                   window_size_ms: float) -> pd.Series:
+    s = s.sort_index()
+    throughput = s.rolling(f'{window_size_ms}ms').sum() / (window_size_ms /
+                                                           1000)
+    t = throughput.index[0] + pd.DateOffset(microseconds=window_size_ms * 1000)
+    return throughput[throughput.index >= t]
+
+
+class ThroughputTest(unittest.TestCase):
+    def _timestamps(self, n: int, unique: bool) -> pd.Series:
+        rng = np.random.default_rng(0)
+        if unique:
+            # Recorders write microsecond timestamps.
+            nanos = rng.choice(5 * 10**6, n, replace=False) * 10**3
+        else:
+            # Millisecond timestamps, so that many of them collide.
+            nanos = rng.integers(0, 5000, n) * 10**6
+        return pd.Series(
+            pd.Timestamp('2020-01-01T00:00:00Z') +
+            pd.to_timedelta(nanos, unit='ns'))
+
+    def test_example(self):
+        s = pd.Series(
+            pd.to_datetime([
+                '2020-01-01 11:00:01',
+                '2020-01-01 11:00:03',
+                '2020-01-01 11:00:54',
+                '2020-01-01 11:01:34',
+                '2020-01-01 11:02:16',
+            ]))
+        throughput = pd_util.throughput(s, 60 * 1000, trim=True)
+        self.assertEqual(list(throughput * 60), [2, 2])
+
+    def test_throughput_matches_reference(self):
+        for unique in [True, False]:
+            s = self._timestamps(5000, unique)
+            for trim in [True, False]:
+                for window_size_ms in [100, 1000]:
+                    pd.testing.assert_series_equal(
+                        pd_util.throughput(s, window_size_ms, trim),
+                        _reference_throughput(s, window_size_ms, trim))
+
+    def test_weighted_throughput_matches_reference(self):
+        index = pd.DatetimeIndex(self._timestamps(5000, unique=True))
+        counts = np.random.default_rng(1).integers(1, 100, len(index))
+        s = pd.Series(counts, index=index)
+        for window_size_ms in [100, 1000]:
+            pd.testing.assert_series_equal(
+                pd_util.weighted_throughput(s, window_size_ms),
+                _reference_weighted_throughput(s, window_size_ms))
+
+
+# Writes records the way a frankenpaxos.BenchmarkUtil.BinaryRecorder does.
+def _write_binary_recorder_data(filename: str, records: np.ndarray,
+                                labels: list) -> None:
+    header = bytearray(pd_util.BINARY_RECORDER_MAGIC)
+    header += np.array([4096, len(labels)], dtype='<i4').tobytes()
+    for label in labels:
+        header += np.array([len(label)], dtype='<i2').tobytes()
+        header += label.encode('utf-8')
+    header += bytes(4096 - len(header))
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(records.tobytes())
+        # A partial record from a crashed client.
+        f.write(bytes(7))
+
+
+class BinaryRecorderTest(unittest.TestCase):
+    def test_read(self):
+        records = np.zeros(3, dtype=pd_util.BINARY_RECORDER_DTYPE)
+        records['start'] = [10**18, 10**18 + 1000, 10**18 + 2000]
+        records['stop'] = records['start'] + 500
+        records['count'] = 1
+        records['latency_nanos'] = 500
+        records['label'] = [0, 1, 0]
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'client_0_data.bin')
+            _write_binary_recorder_data(filename, records, ['write', 'read'])
+
+            (read, labels) = pd_util.read_binary_recorder_data(filename)
+            self.assertEqual(labels, ['write', 'read'])
+            self.assertIsInstance(read, np.memmap)
+            np.testing.assert_array_equal(read, records)
+
+            df = pd_util.read_recorder_data(filename,
+                                            columns=['start', 'label'])
+            self.assertEqual(list(df.columns), ['start', 'label'])
+            self.assertEqual(df['start'].iloc[1],
+                             pd.Timestamp(10**18 + 1000, unit='ns', tz='UTC'))
+            self.assertEqual(list(df['label']), ['write', 'read', 'write'])
+
+
+@unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+class ColumnarTest(unittest.TestCase):
+    def test_round_trip(self):
+        start = pd.Series(
+            pd.to_datetime(['2020-01-01T00:00:01.000001Z',
+                            '2020-01-01T00:00:02.000002Z',
+                            '2020-01-01T00:00:03.000003Z']))
+        df = pd.DataFrame({
+            'start': start,
+            'stop': start + pd.to_timedelta([1, 2, 3], unit='ms'),
+            'count': [1, 2, 3],
+            'latency_nanos': [10**6, 2 * 10**6, 3 * 10**6],
+            'label': ['read', 'write', 'read'],
+        }).set_index('start')
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'data.arrow')
+            pd_util.write_columnar(df, filename)
+
+            schema = pyarrow.feather.read_table(filename).schema
+            self.assertEqual(schema.field('start').type, pyarrow.int64())
+            self.assertEqual(schema.field('latency_nanos').type,
+                             pyarrow.int64())
+            self.assertTrue(pyarrow.types.is_dictionary(
+                schema.field('label').type))
+
+            read = pd_util.read_recorder_data(filename)
+            pd.testing.assert_series_equal(read['start'],
+                                           df.index.to_series(index=read.index))
+            pd.testing.assert_series_equal(read['stop'],
+                                           df['stop'].reset_index(drop=True))
+            self.assertEqual(list(read['label']), list(df['label']))
+
+            read = pd_util.read_recorder_data(filename,
+                                              columns=['latency_nanos'])
+            self.assertEqual(list(read.columns), ['latency_nanos'])
+            self.assertEqual(list(read['latency_nanos']),
+                             list(df['latency_nanos']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 from . import benchmark
 from . import host
 from . import proc
-from typing import Optional
+from typing import List, Optional, Sequence
 
 
 # Profiling a Java program using perf is a little bit involved [1]. Roughly,
@@ -67,6 +67,9 @@ class JavaPerfProc(proc.Proc):
     def wait(self) -> Optional[int]:
         return self._proc.wait()
 
+    def poll(self) -> Optional[int]:
+        return self._proc.poll()
+
     def kill(self) -> None:
         # If we've already killed everything, don't do it again.
         if self._killed:
@@ -94,3 +97,156 @@ class JavaPerfProc(proc.Proc):
             ]).wait()
         self._proc.kill()
         self._killed = True
+
+
+# perf has a couple of drawbacks. It needs sudo and perf-map-agent on every
+# host, the flame graphs have to be made by hand afterwards, and frames inlined
+# by the JIT are missing from the stacks. async-profiler [4] and Java Flight
+# Recorder (JFR) [5] profile from within the JVM instead, so they don't have
+# these problems, and they can profile allocations and lock contention as well
+# as CPU.
+#
+# An AsyncProfilerProc or JfrProc, like a JavaPerfProc, masquerades as the
+# proc it profiles and starts profiling it immediately. When it is killed, it
+# stops profiling, kills the proc, and converts the recording into one
+# collapsed stack file (see flamegraph_util) per profiling mode, named
+# `<label>_profile_<mode>.collapsed`. When the benchmark finishes, the
+# BenchmarkDirectory merges these by role and renders a flame graph for every
+# role and mode.
+#
+# Both profilers write a JFR recording, which we convert with async-profiler's
+# jfrconv. So, jfrconv has to be installed on every host, along with asprof if
+# you use an AsyncProfilerProc. A JfrProc only needs jcmd, which comes with the
+# JDK, to profile.
+#
+# [4]: https://github.com/async-profiler/async-profiler
+# [5]: https://docs.oracle.com/javacomponents/jmc-5-4/jfr-runtime-guide/
+
+# The things a JVM profiler can profile: CPU time, allocated bytes, and time
+# spent blocked on locks.
+PROFILE_MODES = ['cpu', 'alloc', 'lock']
+
+
+class _JvmProfilerProc(proc.Proc):
+    def __init__(self, bench: benchmark.BenchmarkDirectory, host: host.Host,
+                 proc: proc.Proc, label: str, modes: Sequence[str]) -> None:
+        for mode in modes:
+            assert mode in PROFILE_MODES, mode
+        self._bench = bench
+        self._host = host
+        self._proc = proc
+        self._label = label
+        self._modes = modes
+        self._recording = bench.abspath(f'{label}_profile.jfr')
+        self._killed: bool = False
+
+        # If the process has finished, we have no hope of profiling it.
+        pid = proc.pid()
+        self._profiling = False
+        if pid is not None:
+            start = bench.popen(host=host,
+                                label=f'{label}_profile_start',
+                                cmd=self._start_cmd(pid))
+            self._profiling = start.wait() == 0
+            if not self._profiling:
+                bench.log(f'Could not profile {label}. See '
+                          f'{label}_profile_start_err.txt.')
+
+    def _start_cmd(self, pid: int) -> List[str]:
+        raise NotImplementedError()
+
+    def _stop_cmd(self, pid: int) -> List[str]:
+        raise NotImplementedError()
+
+    def cmd(self) -> str:
+        return self._proc.cmd()
+
+    def pid(self) -> Optional[int]:
+        return self._proc.pid()
+
+    def wait(self) -> Optional[int]:
+        return self._proc.wait()
+
+    def poll(self) -> Optional[int]:
+        return self._proc.poll()
+
+    def kill(self) -> None:
+        # If we've already killed everything, don't do it again.
+        if self._killed:
+            return
+
+        pid = self._proc.pid()
+        if self._profiling and pid is not None:
+            self._bench.popen(host=self._host,
+                              label=f'{self._label}_profile_stop',
+                              cmd=self._stop_cmd(pid)).wait()
+        self._proc.kill()
+        self._killed = True
+
+        # The recording is complete once profiling stops, so we convert it
+        # after killing the process, to not hold up the rest of the benchmark.
+        # Allocations are counted in bytes and lock contention in nanoseconds
+        # rather than in samples.
+        if self._profiling:
+            for mode in self._modes:
+                label = f'{self._label}_profile_{mode}'
+                total = [] if mode == 'cpu' else ['--total']
+                cmd = (['jfrconv', f'--{mode}'] + total + [
+                    self._recording,
+                    self._bench.abspath(f'{label}.collapsed')
+                ])
+                self._bench.popen(host=self._host,
+                                  label=f'{label}_jfrconv',
+                                  cmd=cmd).wait()
+
+
+class AsyncProfilerProc(_JvmProfilerProc):
+    def _start_cmd(self, pid: int) -> List[str]:
+        cmd = ['asprof', 'start']
+        if 'cpu' in self._modes:
+            cmd += ['-e', 'cpu']
+        if 'alloc' in self._modes:
+            cmd += ['--alloc', '512k']
+        if 'lock' in self._modes:
+            cmd += ['--lock', '10ms']
+        return cmd + ['-o', 'jfr', '-f', self._recording, str(pid)]
+
+    def _stop_cmd(self, pid: int) -> List[str]:
+        return ['asprof', 'stop', '-o', 'jfr', '-f', self._recording, str(pid)]
+
+
+class JfrProc(_JvmProfilerProc):
+    # The profile settings record CPU samples, allocation samples, and lock
+    # contention, so every mode is always recorded.
+    def _start_cmd(self, pid: int) -> List[str]:
+        return [
+            'jcmd',
+            str(pid), 'JFR.start', 'name=frankenpaxos', 'settings=profile'
+        ]
+
+    def _stop_cmd(self, pid: int) -> List[str]:
+        return [
+            'jcmd',
+            str(pid), 'JFR.stop', 'name=frankenpaxos',
+            f'filename={self._recording}'
+        ]
+
+
+# The profilers `profile` can profile with.
+PROFILERS = ['async_profiler', 'jfr', 'perf']
+
+
+def profile(bench: benchmark.BenchmarkDirectory, host: host.Host,
+            proc: proc.Proc, label: str) -> proc.Proc:
+    """
+    profile profiles `proc` with `bench.profiler`, profiling
+    `bench.profile_modes` if it's a JVM profiler.
+    """
+    if bench.profiler == 'async_profiler':
+        return AsyncProfilerProc(bench, host, proc, label, bench.profile_modes)
+    elif bench.profiler == 'jfr':
+        return JfrProc(bench, host, proc, label, bench.profile_modes)
+    elif bench.profiler == 'perf':
+        return JavaPerfProc(bench, host, proc, label)
+    else:
+        raise ValueError(f'Unknown profiler {bench.profiler}.')
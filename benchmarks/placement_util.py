@@ -0,0 +1,141 @@
+from . import host
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# A Net places the processes of every role on the hosts that the cluster file
+# lists for the role. Placing them round robin (e.g., with cycle_take_n) is
+# simple, but it ignores how much work every process does, so two busy
+# processes can land on the same host while another host idles. `place`
+# instead balances the expected load of the processes across hosts.
+#
+# Every process has an expected load, in whatever unit is convenient (e.g.,
+# messages sent and received per command), and every host has a capacity
+# (e.g., its number of cores). `place` minimizes the highest load of any host
+# relative to its capacity. Like scheduling jobs on machines, this is NP-hard,
+# so we use the longest processing time (LPT) heuristic: we place processes
+# from most to least loaded, each on the least loaded host it can run on, and
+# then move processes off of the most loaded host while that helps.
+#
+# Some processes should never share a host. If the acceptors of a group share
+# a host, one failure takes out more than one of them, and the processes
+# compete for the same resources in the same round. Processes in the same
+# anti-affinity group are placed on different hosts whenever the role has
+# enough hosts.
+
+
+# A Role is the set of processes of one role. `loads` is the expected load of
+# every process. If `group_size` is set, every `group_size` consecutive
+# processes form an anti-affinity group (e.g., the acceptors of an acceptor
+# group).
+class Role(NamedTuple):
+    loads: List[float]
+    group_size: Optional[int] = None
+
+
+# An _Item is one process to place.
+class _Item(NamedTuple):
+    role: str
+    process_index: int
+    load: float
+    group: Optional[Tuple[str, int]]
+
+
+def place(
+    roles: Dict[str, Role],
+    hosts: Dict[str, List[host.Host]],
+    capacity: Callable[[host.Host], float] = lambda h: 1.0
+) -> Dict[str, List[host.Host]]:
+    """
+    place assigns every process of every role in `roles` to one of the hosts
+    listed for the role in `hosts` (e.g., the output of cluster.Cluster.f),
+    returning the hosts of every role's processes, in order. Hosts are
+    identified by ip address. See above for details.
+    """
+    candidates: Dict[str, List[str]] = dict()
+    by_ip: Dict[str, host.Host] = dict()
+    for (role_name, role) in roles.items():
+        if len(role.loads) == 0:
+            continue
+        if len(hosts.get(role_name, [])) == 0:
+            raise ValueError(f'Role {role_name} has {len(role.loads)} '
+                             f'processes but no hosts.')
+        candidates[role_name] = []
+        for h in hosts[role_name]:
+            ip = h.ip()
+            by_ip.setdefault(ip, h)
+            if ip not in candidates[role_name]:
+                candidates[role_name].append(ip)
+    capacities = {ip: capacity(h) for (ip, h) in by_ip.items()}
+    host_loads = {ip: 0.0 for ip in by_ip}
+    num_processes = {ip: 0 for ip in by_ip}
+    groups: Dict[str, Dict[Tuple[str, int], int]] = {ip: {} for ip in by_ip}
+
+    def utilization(ip: str, extra: float = 0.0) -> float:
+        return (host_loads[ip] + extra) / capacities[ip]
+
+    def add(item: _Item, ip: str, sign: int) -> None:
+        host_loads[ip] += sign * item.load
+        num_processes[ip] += sign
+        if item.group is not None:
+            groups[ip][item.group] = groups[ip].get(item.group, 0) + sign
+
+    def conflicts(item: _Item, ip: str) -> int:
+        if item.group is None:
+            return 0
+        return groups[ip].get(item.group, 0)
+
+    def cost(item: _Item, ip: str) -> Tuple[int, float, int]:
+        # Anti-affinity comes first. Processes without load (e.g., idle
+        # leaders) are spread out by count.
+        u = utilization(ip, item.load)
+        return (conflicts(item, ip), u, num_processes[ip])
+
+    items: List[_Item] = []
+    for (role_name, role) in roles.items():
+        for (i, load) in enumerate(role.loads):
+            group = None
+            if role.group_size:
+                group = (role_name, i // role.group_size)
+            items.append(_Item(role_name, i, load, group))
+
+    # Place processes from most to least loaded. Sorting is stable, so ties
+    # are placed in order.
+    assignment: Dict[_Item, str] = dict()
+    for item in sorted(items, key=lambda item: -item.load):
+        ip = min(candidates[item.role], key=lambda ip: cost(item, ip))
+        assignment[item] = ip
+        add(item, ip, 1)
+
+    # Move processes off of the most utilized host while that lowers its
+    # utilization without making another host as utilized. A process in an
+    # anti-affinity group only moves to a host with fewer of its group.
+    def movable(item: _Item, source: str, target: str) -> bool:
+        return target != source and (item.group is None or conflicts(
+            item, target) < conflicts(item, source))
+
+    for _ in range(len(items) * len(by_ip)):
+        busiest = max(host_loads, key=utilization)
+        peak = utilization(busiest)
+        move: Optional[Tuple[_Item, str]] = None
+        for item in sorted(assignment, key=lambda item: -item.load):
+            if assignment[item] != busiest or item.load <= 0:
+                continue
+            for ip in candidates[item.role]:
+                if (movable(item, busiest, ip) and
+                        utilization(ip, item.load) < peak - 1e-9):
+                    move = (item, ip)
+                    break
+            if move is not None:
+                break
+        if move is None:
+            break
+        (item, ip) = move
+        add(item, busiest, -1)
+        add(item, ip, 1)
+        assignment[item] = ip
+
+    placement: Dict[str, List[host.Host]] = dict()
+    for role_name in roles:
+        placement[role_name] = []
+    for item in items:
+        placement[item.role].append(by_ip[assignment[item]])
+    return placement
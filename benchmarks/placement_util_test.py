@@ -0,0 +1,83 @@
+from . import host
+from . import placement_util
+from typing import Dict, List
+import unittest
+
+
+def _ips(placement: Dict[str, List[host.Host]]) -> Dict[str, List[str]]:
+    return {
+        role: [h.ip() for h in hosts] for (role, hosts) in placement.items()
+    }
+
+
+class PlaceTest(unittest.TestCase):
+    def test_balances_load(self):
+        hosts = [host.FakeHost(a) for a in ['a', 'b', 'c']]
+        placement = placement_util.place(
+            {
+                'leaders': placement_util.Role([4.0]),
+                'proxy_leaders': placement_util.Role([3.0, 3.0]),
+                'replicas': placement_util.Role([1.0, 1.0]),
+            }, {
+                'leaders': hosts,
+                'proxy_leaders': hosts,
+                'replicas': hosts,
+            })
+        # Round robin would put the leader and a proxy leader on `a`. Instead,
+        # every host ends up with a load of 4.
+        self.assertEqual(_ips(placement), {
+            'leaders': ['a'],
+            'proxy_leaders': ['b', 'c'],
+            'replicas': ['b', 'c'],
+        })
+
+    def test_capacity(self):
+        hosts = [host.FakeHost('small'), host.FakeHost('big')]
+        capacity = {'small': 1.0, 'big': 3.0}
+        placement = placement_util.place(
+            {'servers': placement_util.Role([1.0] * 4)}, {'servers': hosts},
+            capacity=lambda h: capacity[h.ip()])
+        self.assertEqual(sorted(_ips(placement)['servers']),
+                         ['big', 'big', 'big', 'small'])
+
+    def test_anti_affinity(self):
+        hosts = [host.FakeHost(a) for a in ['a', 'b', 'c', 'd']]
+        # Without anti-affinity, the heavy acceptors would pair up with the
+        # light ones of their own group.
+        loads = [4.0, 1.0, 4.0, 1.0]
+        placement = placement_util.place(
+            {
+                'acceptors': placement_util.Role(loads, group_size=2),
+                'clients': placement_util.Role([5.0, 5.0]),
+            }, {
+                'acceptors': hosts[:2],
+                'clients': hosts,
+            })
+        acceptors = _ips(placement)['acceptors']
+        self.assertNotEqual(acceptors[0], acceptors[1])
+        self.assertNotEqual(acceptors[2], acceptors[3])
+
+    def test_restricted_to_role_hosts(self):
+        a = host.FakeHost('a')
+        b = host.FakeHost('b')
+        placement = placement_util.place(
+            {
+                'leaders': placement_util.Role([1.0, 1.0]),
+                'clients': placement_util.Role([10.0]),
+            }, {
+                'leaders': [a],
+                'clients': [a, b],
+            })
+        self.assertEqual(_ips(placement), {
+            'leaders': ['a', 'a'],
+            'clients': ['b'],
+        })
+
+    def test_no_hosts(self):
+        with self.assertRaises(ValueError):
+            placement_util.place({'leaders': placement_util.Role([1.0])},
+                                 {'leaders': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,7 +45,8 @@ def plot_throughput(ax: plt.Axes, start: pd.Series, stop: pd.Series) -> None:
 
 
 def main(args) -> None:
-    df = pd.read_csv(args.data_csv, parse_dates=['start', 'stop'])
+    df = pd_util.read_recorder_data(args.data_csv,
+                                    columns=['start', 'stop', 'latency_nanos'])
     df.index = df['start']
 
     # Drop first bit of data.
@@ -73,7 +74,7 @@ def main(args) -> None:
 
 def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
-    parser.add_argument('data_csv', type=str, help='data.csv file')
+    parser.add_argument('data_csv', type=str, help='data.csv or data.arrow file')
     parser.add_argument(
         '-d',
         '--drop',
@@ -1,9 +1,13 @@
-from typing import Optional, Sequence, Union
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 import abc
+import os
 import paramiko
 import random
+import signal
+import socket
 import string
 import subprocess
+import threading
 import time
 
 
@@ -18,6 +22,39 @@ def _canonicalize_args(args: Union[str, Sequence[str]]) -> str:
         return subprocess.list2cmdline(args)
 
 
+# The shell command that a ParamikoProc runs. See ParamikoProc for details.
+def _wrapper_cmd(nonce: str, args: Union[str, Sequence[str]], stdout: str,
+                 stderr: str) -> str:
+    return (f'({_canonicalize_args(args)}) 2> "{stderr}" > "{stdout}" & ' +
+            f'echo {nonce} $$ $!; wait $!')
+
+
+# Given the output of `ps -ww -eo pid=,ppid=,args=`, _pids_from_ps returns the
+# pid of the wrapper shell with nonce `nonce` and the pid of its child, or None if
+# either can't be found.
+def _pids_from_ps(ps: str, nonce: str) -> Optional[Tuple[int, int]]:
+    processes: List[Tuple[int, int, str]] = []
+    for line in ps.splitlines():
+        fields = line.split(None, 2)
+        if len(fields) == 3:
+            processes.append((int(fields[0]), int(fields[1]), fields[2]))
+
+    # Until it execs the command, the child of the wrapper shell has the same
+    # args as the shell, so we pick the matching process whose parent doesn't
+    # match.
+    matches = {pid for (pid, _, args) in processes if nonce in args}
+    shells = [
+        pid for (pid, ppid, args) in processes
+        if pid in matches and ppid not in matches
+    ]
+    if len(shells) != 1:
+        return None
+    children = [pid for (pid, ppid, _) in processes if ppid == shells[0]]
+    if len(children) != 1:
+        return None
+    return (shells[0], children[0])
+
+
 # A Proc represents a process running on some machine. A Proc is like a
 # subprocess.Popen (with fewer methods) that is able to run either locally or
 # on a remote machine.
@@ -60,15 +97,27 @@ class Proc(abc.ABC):
     def kill(self) -> None:
         raise NotImplementedError()
 
+    def poll(self) -> Optional[int]:
+        """
+        poll returns the return code of the process if it has finished, and
+        None otherwise. Unlike wait, poll never blocks. A proc that can't tell
+        whether its process has finished without blocking returns None.
+        """
+        return None
+
 
-# A PopenProc is just a wrapper around a locally run subprocess.Popen.
+# A PopenProc is just a wrapper around a locally run subprocess.Popen. Like a
+# ParamikoProc, the process leads its own process group, and we kill the
+# process by killing the group, so that any processes it started (e.g., the
+# JVM started by a shell script) are killed with it.
 class PopenProc(Proc):
     def __init__(self, args: Union[str, Sequence[str]], stdout: str,
                  stderr: str) -> None:
         self._cmd = _canonicalize_args(args)
         self._popen = subprocess.Popen(args,
                                        stdout=open(stdout, 'w'),
-                                       stderr=open(stderr, 'w'))
+                                       stderr=open(stderr, 'w'),
+                                       start_new_session=True)
 
     def cmd(self) -> str:
         return self._cmd
@@ -80,8 +129,18 @@ class PopenProc(Proc):
         self._popen.wait()
         return self._popen.returncode
 
+    def pgid(self) -> Optional[int]:
+        return self._popen.pid
+
     def kill(self) -> None:
-        self._popen.kill()
+        try:
+            os.killpg(self._popen.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Every process in the group has already exited.
+            pass
+
+    def poll(self) -> Optional[int]:
+        return self._popen.poll()
 
 
 # A ParamikoProc is a process run on a remote machine over SSH via paramiko.
@@ -98,98 +157,201 @@ class PopenProc(Proc):
 # suggests not calling `get_pty` before issuing `exec_command` [2].
 #
 # We implement the following solution. It's not great, but it seems to work ok.
-# First, every ParamikoProc generates a unique nonce. When we call
-# `channel.exec_command`, we echo the nonce before the command, like this:
-# `echo <nonce>; <cmd>`. When we do this, calling `pgrep -f <nonce>` returns
-# the pid of a command that looks like this: `bash -c echo <nonce>; <cmd>`.
-# This command is the parent of `<cmd>`. We then use `pgrep -P` to get the pid
-# of the subprocess `<cmd>`. We then kill the process using this pid.
+# First, every ParamikoProc generates a unique nonce. We run `<cmd>` in the
+# background of a shell that then echoes the nonce, its own pid, and the pid of
+# `<cmd>` before waiting for `<cmd>` to finish:
+#
+#     (<cmd>) 2> <stderr> > <stdout> & echo <nonce> $$ $!; wait $!
+#
+# The shell's stdout is the channel, so reading a single line from the channel
+# gives us both pids without any extra round trips. The shell is the leader of
+# its process group, so we kill the process by killing the group.
+#
+# If the pids don't show up on the channel in time, we fall back to finding
+# the shell by its nonce in `ps` (see PidResolver).
 #
 # [1]: https://stackoverflow.com/q/7734679/3187068
 # [2]: http://docs.paramiko.org/en/latest/api/channel.html#paramiko.channel.Channel.get_pty
 class ParamikoProc(Proc):
-    def __init__(self, client: paramiko.SSHClient,
-                 args: Union[str, Sequence[str]], stdout: str,
-                 stderr: str) -> None:
+    # How long we wait for the pids to show up on the channel before falling
+    # back to `ps`.
+    MARKER_TIMEOUT_S = 10.0
+
+    def __init__(self,
+                 client: paramiko.SSHClient,
+                 args: Union[str, Sequence[str]],
+                 stdout: str,
+                 stderr: str,
+                 on_close: Optional[Callable[[], None]] = None,
+                 pid_resolver: Optional['PidResolver'] = None) -> None:
         self._nonce = _random_string(80)
-        self._cmd = (f'echo {self._nonce}; ' +
-                     f'({_canonicalize_args(args)}) 2> "{stderr}" > "{stdout}"')
+        self._cmd = _wrapper_cmd(self._nonce, args, stdout, stderr)
         self._client = client
         self._channel = client.get_transport().open_session()
         self._channel.exec_command(self._cmd)
+        self._channel_stdout = self._channel.makefile('rb')
+        self._pids_resolved: bool = False
         self._pgid: Optional[int] = None
         self._pid: Optional[int] = None
         self._killed: bool = False
+        # on_close is called once the channel is closed. RemoteHost uses it to
+        # count the channels open on a connection.
+        self._on_close = on_close
+        # RemoteHost shares one PidResolver between all of its procs.
+        self._pid_resolver = pid_resolver or PidResolver()
 
-    def _get_pgid(self) -> Optional[int]:
-        while True:
-            # If the channel is already finished, then it's too late for us to
-            # get a pid.
-            if self._channel.exit_status_ready():
-                return None
-            try:
-                _, out, _ = self._client.exec_command(f'pgrep -f {self._nonce}')
-                out.channel.recv_exit_status()
-                return int(out.read().decode("utf-8").strip())
-            except ValueError:
-                pass
+    def _connection_active(self) -> bool:
+        transport = self._client.get_transport()
+        return transport is not None and transport.is_active()
 
-    def _get_pid(self) -> Optional[int]:
-        while True:
-            # If the channel is already finished, then it's too late for us to
-            # get a pid.
-            if self._channel.exit_status_ready():
-                return None
+    def _close(self) -> None:
+        if not self._killed and self._on_close is not None:
+            self._on_close()
+        self._channel.close()
+        self._killed = True
 
-            # If the pgid is None, we can't get the pid.
-            if self.pgid() is None:
-                return None
+    def _read_marker(self, timeout: Optional[float]) -> bool:
+        """
+        _read_marker reads the pids echoed by the wrapper shell, returning
+        false if they don't arrive within `timeout` seconds.
+        """
+        self._channel.settimeout(timeout)
+        try:
+            line = self._channel_stdout.readline()
+        except socket.timeout:
+            return False
+        finally:
+            self._channel.settimeout(None)
 
-            try:
-                _, out, _ = self._client.exec_command(f'pgrep -P {self.pgid()}')
-                out.channel.recv_exit_status()
-                return int(out.read().decode("utf-8").strip())
-            except ValueError:
-                pass
+        # If the channel closed before the pids were echoed, it's too late for
+        # us to get them.
+        fields = line.decode('utf-8').split()
+        if len(fields) == 3 and fields[0] == self._nonce:
+            self._pgid = int(fields[1])
+            self._pid = int(fields[2])
+        self._pids_resolved = True
+        return True
+
+    def _resolve_pids(self) -> None:
+        if self._pids_resolved:
+            return
+        if not self._read_marker(self.MARKER_TIMEOUT_S):
+            self._pid_resolver.resolve([self])
 
     def cmd(self) -> str:
         return self._cmd
 
     def pgid(self) -> Optional[int]:
-        if self._pgid is not None:
-            return self._pgid
-        else:
-            self._pgid = self._get_pgid()
-            return self._pgid
+        self._resolve_pids()
+        return self._pgid
 
     def pid(self) -> Optional[int]:
-        if self._pid is not None:
-            return self._pid
-        else:
-            self._pid = self._get_pid()
-            return self._pid
+        self._resolve_pids()
+        return self._pid
 
     def wait(self) -> Optional[int]:
+        # If the connection died, paramiko has closed the channel, and the exit
+        # status is -1.
         self.returncode = self._channel.recv_exit_status()
         # Once the process is over, we can close the connection.
-        self._channel.close()
-        self._killed = True
+        self._close()
         return self.returncode
 
+    def poll(self) -> Optional[int]:
+        if self._channel.exit_status_ready():
+            return self._channel.recv_exit_status()
+        return None
+
     def kill(self) -> None:
         # If we've already killed the process, we don't have to kill it again.
         if self._killed:
             return
 
-        # If the process is already dead, we don't have to kill it. Otherwise,
-        # we do.
-        if self._channel.exit_status_ready():
+        # If the process is already dead, we don't have to kill it. If the
+        # connection died (e.g., because its transport was reset), we can't.
+        # Otherwise, we do. The connection can also die while we're killing
+        # the process, in which case paramiko raises an SSHException or an
+        # EOFError.
+        if self._channel.exit_status_ready() or not self._connection_active():
             pass
         else:
-            pgid = self.pgid()
-            if pgid:
-                _, out, _ = self._client.exec_command(f'sudo kill -- -{pgid}')
-                out.channel.recv_exit_status()
+            try:
+                pgid = self.pgid()
+                if pgid:
+                    _, out, _ = self._client.exec_command(
+                        f'sudo kill -- -{pgid}')
+                    out.channel.recv_exit_status()
+            except (paramiko.SSHException, EOFError):
+                if self._connection_active():
+                    raise
 
-        self._channel.close()
-        self._killed = True
+        self._close()
+
+
+# A PidResolver finds the pids of ParamikoProcs whose pids didn't show up on
+# their channels in time, by their nonces in `ps`. The procs of a host share a
+# PidResolver (see host.RemoteHost), so however many of them are waiting, the
+# host runs one `ps` per round for all of them, rather than one per proc.
+#
+# The first proc to wait runs a round for every waiting proc, while the others
+# wait for the round to finish. Rounds are at least `interval_s` seconds apart.
+class PidResolver:
+    def __init__(self, interval_s: float = 0.1) -> None:
+        self.interval_s = interval_s
+        self._condition = threading.Condition()
+        self._pending: List[ParamikoProc] = []
+        self._running = False
+
+    def resolve(self, procs: Sequence[ParamikoProc]) -> None:
+        """
+        resolve returns once the pids of every proc in `procs` are found, or
+        their channels have finished, in which case it's too late to find
+        them.
+        """
+        with self._condition:
+            self._pending.extend(procs)
+
+        while True:
+            with self._condition:
+                while (self._running and
+                       not all(p._pids_resolved for p in procs)):
+                    self._condition.wait()
+                if all(p._pids_resolved for p in procs):
+                    return
+                self._running = True
+                pending = list(self._pending)
+
+            try:
+                self._round(pending)
+            finally:
+                with self._condition:
+                    self._running = False
+                    self._pending = [
+                        p for p in self._pending if not p._pids_resolved
+                    ]
+                    self._condition.notify_all()
+
+    def _round(self, procs: List[ParamikoProc]) -> None:
+        # The pids may have arrived on the channels in the meantime.
+        for p in procs:
+            if p._channel.recv_ready():
+                p._read_marker(timeout=1)
+        procs = [p for p in procs if not p._pids_resolved]
+        if len(procs) == 0:
+            return
+
+        _, out, _ = procs[0]._client.exec_command('ps -ww -eo pid=,ppid=,args=')
+        out.channel.recv_exit_status()
+        ps = out.read().decode('utf-8')
+        for p in procs:
+            pids = _pids_from_ps(ps, p._nonce)
+            if pids is not None:
+                (p._pgid, p._pid) = pids
+                p._pids_resolved = True
+            elif p._channel.exit_status_ready():
+                # If the channel is already finished, then it's too late for
+                # us to get a pid.
+                p._pids_resolved = True
+
+        if not all(p._pids_resolved for p in procs):
+            time.sleep(self.interval_s)
@@ -1,9 +1,251 @@
 from . import proc
+from typing import List, Optional, Tuple
+import io
 import os
 import paramiko
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
 
 
+class WrapperCmdTest(unittest.TestCase):
+    # Runs the ParamikoProc wrapper shell locally, the way sshd runs it.
+    def test_pids(self):
+        nonce = proc._random_string(80)
+        cmd = proc._wrapper_cmd(nonce, ['sleep', '1000'], '/dev/null',
+                                '/dev/null')
+        shell = subprocess.Popen(['bash', '-c', cmd],
+                                 stdout=subprocess.PIPE,
+                                 start_new_session=True)
+        try:
+            marker = shell.stdout.readline().decode('utf-8').split()
+            self.assertEqual(marker[0], nonce)
+            self.assertEqual(int(marker[1]), shell.pid)
+
+            ps = subprocess.run(['ps', '-ww', '-eo', 'pid=,ppid=,args='],
+                                stdout=subprocess.PIPE,
+                                check=True).stdout.decode('utf-8')
+            self.assertEqual(proc._pids_from_ps(ps, nonce),
+                             (int(marker[1]), int(marker[2])))
+            self.assertIsNone(proc._pids_from_ps(ps, 'not a nonce'))
+        finally:
+            os.killpg(shell.pid, 9)
+            shell.wait()
+
+    def test_exit_status(self):
+        cmd = proc._wrapper_cmd('nonce', 'exit 3', '/dev/null', '/dev/null')
+        self.assertEqual(subprocess.run(['bash', '-c', cmd]).returncode, 3)
+
+    def test_pids_from_ps_before_exec(self):
+        # The wrapper shell's child hasn't exec'd yet, so it has the same args.
+        ps = '\n'.join([
+            '    1     0 init',
+            '  100     1 bash -c (sleep 1000) & echo NONCE $$ $!; wait $!',
+            '  101   100 bash -c (sleep 1000) & echo NONCE $$ $!; wait $!',
+            '  102     1 ps -eo pid=,ppid=,args=',
+        ])
+        self.assertEqual(proc._pids_from_ps(ps, 'NONCE'), (100, 101))
+
+
+# A FakeChannel runs no command. Its wrapper shell echoes pids 100 and 101.
+class FakeChannel:
+    def __init__(self) -> None:
+        self.closed = False
+        self.stdout = io.BytesIO()
+
+    def exec_command(self, command: str) -> None:
+        match = re.search(r'echo (\w+) ', command)
+        assert match is not None
+        self.stdout = io.BytesIO(f'{match.group(1)} 100 101\n'.encode())
+
+    def makefile(self, mode: str) -> io.BytesIO:
+        return self.stdout
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        pass
+
+    def exit_status_ready(self) -> bool:
+        return self.closed
+
+    def recv_exit_status(self) -> int:
+        return -1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeTransport:
+    def __init__(self) -> None:
+        self.active = True
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def open_session(self) -> FakeChannel:
+        return FakeChannel()
+
+
+# A FakeClient's connection dies when it runs a command (e.g., a kill).
+class FakeClient:
+    def __init__(self) -> None:
+        self.transport = FakeTransport()
+        self.commands: List[str] = []
+
+    def get_transport(self) -> FakeTransport:
+        return self.transport
+
+    def exec_command(self, command: str):
+        if not self.transport.active:
+            raise paramiko.SSHException('SSH session not active')
+        self.commands.append(command)
+        self.transport.active = False
+        raise EOFError()
+
+
+class DeadConnectionTest(unittest.TestCase):
+    def _proc(self, client: FakeClient) -> proc.ParamikoProc:
+        return proc.ParamikoProc(client=client,
+                                 args=['sleep', '1000'],
+                                 stdout='/dev/null',
+                                 stderr='/dev/null')
+
+    def test_closed_transport(self):
+        client = FakeClient()
+        p = self._proc(client)
+        self.assertEqual(p.pid(), 101)
+        client.transport.active = False
+        p.kill()
+        self.assertEqual(client.commands, [])
+        self.assertEqual(p.wait(), -1)
+
+    def test_transport_closes_during_kill(self):
+        client = FakeClient()
+        p = self._proc(client)
+        p.kill()
+        self.assertEqual(client.commands, ['sudo kill -- -100'])
+        self.assertEqual(p.wait(), -1)
+
+    def test_kill_error(self):
+        client = FakeClient()
+        p = self._proc(client)
+        # The connection is still alive, so the error is real.
+        client.transport.is_active = lambda: True
+        with self.assertRaises(EOFError):
+            p.kill()
+
+
+# A SilentChannel runs no command, and its wrapper shell never echoes its pids,
+# so they have to be found with `ps`.
+class SilentChannel:
+    def exec_command(self, command: str) -> None:
+        match = re.search(r'echo (\w+) ', command)
+        assert match is not None
+        self.nonce = match.group(1)
+
+    def makefile(self, mode: str) -> 'SilentChannel':
+        return self
+
+    def readline(self) -> bytes:
+        raise socket.timeout()
+
+    def recv_ready(self) -> bool:
+        return False
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        pass
+
+    def exit_status_ready(self) -> bool:
+        return False
+
+
+# The output of a `ps` run by a PsClient.
+class PsOutput:
+    def __init__(self, ps: str) -> None:
+        self.channel = self
+        self.ps = ps
+
+    def recv_exit_status(self) -> int:
+        return 0
+
+    def read(self) -> bytes:
+        return self.ps.encode()
+
+
+# A PsClient runs commands on SilentChannels. Its `ps` lists the wrapper shell
+# of the ith channel with pid 100 * (i + 1) and the shell's child with the next
+# pid.
+class PsClient:
+    def __init__(self) -> None:
+        self.channels: List[SilentChannel] = []
+        self.num_ps = 0
+
+    def get_transport(self) -> 'PsClient':
+        return self
+
+    def is_active(self) -> bool:
+        return True
+
+    def open_session(self) -> SilentChannel:
+        channel = SilentChannel()
+        self.channels.append(channel)
+        return channel
+
+    def exec_command(self, command: str) -> Tuple[None, PsOutput, None]:
+        self.num_ps += 1
+        lines: List[str] = []
+        for (i, channel) in enumerate(self.channels):
+            pid = 100 * (i + 1)
+            lines.append(f'{pid} 1 bash -c echo {channel.nonce} $$')
+            lines.append(f'{pid + 1} {pid} sleep 1000')
+        return (None, PsOutput('\n'.join(lines)), None)
+
+
+class PidResolverTest(unittest.TestCase):
+    def _procs(self, client: PsClient, resolver: proc.PidResolver,
+               n: int) -> List[proc.ParamikoProc]:
+        return [
+            proc.ParamikoProc(client=client,
+                              args=['sleep', '1000'],
+                              stdout='/dev/null',
+                              stderr='/dev/null',
+                              pid_resolver=resolver) for _ in range(n)
+        ]
+
+    def test_one_ps_for_all_pending_procs(self):
+        client = PsClient()
+        resolver = proc.PidResolver()
+        procs = self._procs(client, resolver, 3)
+        resolver.resolve(procs)
+        self.assertEqual(client.num_ps, 1)
+        self.assertEqual([p.pgid() for p in procs], [100, 200, 300])
+        self.assertEqual([p.pid() for p in procs], [101, 201, 301])
+        self.assertEqual(client.num_ps, 1)
+
+    def test_concurrent_procs(self):
+        client = PsClient()
+        resolver = proc.PidResolver()
+        procs = self._procs(client, resolver, 8)
+        pids = [None] * len(procs)
+
+        def resolve(i: int) -> None:
+            pids[i] = procs[i].pid()
+
+        threads = [
+            threading.Thread(target=resolve, args=(i,))
+            for i in range(len(procs))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pids, [100 * (i + 1) + 1 for i in range(len(procs))])
+        self.assertLessEqual(client.num_ps, len(procs))
+
+
 class ParamikoProcTest(unittest.TestCase):
     def _client(self) -> paramiko.SSHClient:
         client = paramiko.SSHClient()
@@ -46,5 +288,46 @@ class ParamikoProcTest(unittest.TestCase):
         p.kill()
 
 
+class PopenProcTest(unittest.TestCase):
+    def _running(self, pid: int) -> bool:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+        except FileNotFoundError:
+            return False
+
+    def test_wait(self):
+        p = proc.PopenProc(['bash', '-c', 'exit 3'], '/dev/null', '/dev/null')
+        self.assertEqual(p.wait(), 3)
+        self.assertEqual(p.poll(), 3)
+
+    def test_kill_process_group(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # The shell starts a sleep in the background and writes its pid.
+            pid_file = os.path.join(directory, 'pid.txt')
+            p = proc.PopenProc(
+                ['bash', '-c', f'sleep 1000 & echo $! > {pid_file}; wait'],
+                '/dev/null', '/dev/null')
+            self.assertIsNone(p.poll())
+            self.assertEqual(p.pgid(), p.pid())
+            while not os.path.exists(pid_file) or os.path.getsize(
+                    pid_file) == 0:
+                time.sleep(0.01)
+            with open(pid_file) as f:
+                child = int(f.read())
+
+            p.kill()
+            self.assertIsNotNone(p.wait())
+            # The sleep was killed along with the shell. It's not our child,
+            # so we can't wait for it, and it may linger as a zombie.
+            deadline = time.time() + 10
+            while self._running(child) and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertFalse(self._running(child))
+
+            # Killing a dead process is a noop.
+            p.kill()
+
+
 if __name__ == '__main__':
     unittest.main()
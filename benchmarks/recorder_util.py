@@ -0,0 +1,525 @@
+from . import pd_util
+from . import steady_state_util
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import datetime
+import math
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+
+
+class QuantileSketch:
+    """
+    A QuantileSketch summarizes a stream of non-negative numbers in a bounded
+    amount of memory. It records the exact count, sum, min, and max of the
+    stream, but only approximates quantiles. Every value x is assigned to the
+    logarithmic bucket ceil(log_gamma(x)) where gamma = (1 + a) / (1 - a) for a
+    relative accuracy a. A quantile is estimated by the midpoint of the bucket
+    in which it lands, so every estimated quantile is within a relative error
+    of a of a value in the stream [1].
+
+    A QuantileSketch has the same mean/median/min/max/quantile methods as a
+    pd.Series, so it can be summarized the same way a series can.
+
+        >>> sketch = QuantileSketch()
+        >>> sketch.add(np.array([1.0, 2.0, 3.0, 4.0]))
+        >>> sketch.mean()
+        2.5
+        >>> sketch.max()
+        4.0
+
+    [1]: https://arxiv.org/abs/1908.10693
+    """
+    def __init__(self, relative_accuracy: float = 0.001) -> None:
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = dict()
+        self._zeros = 0
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, xs: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        """
+        Adds every value in xs to the sketch. If `weights` is given, xs[i] is
+        added weights[i] times.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        if weights is None:
+            weights = np.ones(len(xs), dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.int64)
+        xs = xs[weights > 0]
+        weights = weights[weights > 0]
+        if len(xs) == 0:
+            return
+
+        self._count += int(weights.sum())
+        self._sum += float((xs * weights).sum())
+        self._min = min(self._min, float(xs.min()))
+        self._max = max(self._max, float(xs.max()))
+
+        positive = xs > 0
+        self._zeros += int(weights[~positive].sum())
+        keys = np.ceil(np.log(xs[positive]) / self._log_gamma).astype(np.int64)
+        (unique_keys, inverse) = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=weights[positive])
+        for (key, count) in zip(unique_keys, counts):
+            self._buckets[int(key)] = self._buckets.get(int(key), 0) + int(count)
+
+    def mean(self) -> float:
+        return self._sum / self._count if self._count > 0 else math.nan
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def min(self) -> float:
+        return self._min if self._count > 0 else math.nan
+
+    def max(self) -> float:
+        return self._max if self._count > 0 else math.nan
+
+    def quantile(self, q: float) -> float:
+        if self._count == 0:
+            return math.nan
+
+        # Like pd.Series.quantile, we treat the values as if they were sorted
+        # and find the value at rank q * (n - 1).
+        rank = q * (self._count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                estimate = 2 * self._gamma**key / (self._gamma + 1)
+                return min(max(estimate, self._min), self._max)
+        return self._max
+
+
+# LabeledRecorders that group measurements also write a histogram of the
+# latencies in every group (see BenchmarkUtil.LatencyHistogram). A latency of x
+# nanoseconds is counted in bucket ceil(log_gamma(x)) where gamma = (1 + a) /
+# (1 - a) for this relative accuracy a.
+HISTOGRAM_RELATIVE_ACCURACY = 0.01
+
+
+def add_latency_histograms(sketch: QuantileSketch, latency_nanos: np.ndarray,
+                           count: np.ndarray, histograms: np.ndarray) -> None:
+    """
+    add_latency_histograms adds the latencies (in milliseconds) of a set of
+    LabeledRecorder measurements to `sketch`. histograms[i] is the latency
+    histogram of measurement i, formatted as "bucket:count;bucket:count;...".
+    Every bucket is added as the midpoint of its range, so quantiles are
+    accurate to within HISTOGRAM_RELATIVE_ACCURACY plus the relative accuracy
+    of the sketch. A measurement without a histogram (e.g., because it wasn't
+    grouped) is added as `count` measurements of its mean latency.
+    """
+    has_histogram = np.array(
+        [isinstance(h, str) and len(h) > 0 for h in histograms], dtype=bool)
+    sketch.add(latency_nanos[~has_histogram] / 1e6, count[~has_histogram])
+
+    if not has_histogram.any():
+        return
+    joined = ';'.join(histograms[has_histogram]).replace(':', ';')
+    buckets = np.array(joined.split(';'), dtype=np.int64).reshape(-1, 2)
+    a = HISTOGRAM_RELATIVE_ACCURACY
+    gamma = (1 + a) / (1 - a)
+    midpoints = 2 * gamma**buckets[:, 0].astype(np.float64) / (gamma + 1)
+    sketch.add(midpoints / 1e6, buckets[:, 1])
+
+
+# A _Run is a sorted chunk of recorder data that has been spilled to disk.
+# Every column is stored in its own .npy file and memory mapped when read, so
+# reading a slice of a run only pages in that slice.
+class _Run:
+    def __init__(self, directory: str, index: int, columns: List[str]) -> None:
+        self.columns = {
+            column: np.load(os.path.join(directory, f'{index}_{column}.npy'),
+                            mmap_mode='r') for column in columns
+        }
+        self.start = self.columns['start']
+        self.position = 0
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def done(self) -> bool:
+        return self.position >= len(self)
+
+
+class _Column:
+    """
+    _Column records how to encode a recorder data column into a fixed-width
+    NumPy array and how to decode it again. Timestamps are stored as int64
+    nanoseconds since the epoch, and strings (e.g., labels) are dictionary
+    encoded as int32 codes. Latency histograms (see add_latency_histograms)
+    are nearly unique per row, so dictionary encoding them would keep every
+    one of them in memory. They're stored as fixed-width byte strings instead,
+    with an empty string for a row without a histogram.
+    """
+    def __init__(self, name: str, dtype: Any) -> None:
+        self.name = name
+        self.is_datetime = pd.api.types.is_datetime64_any_dtype(dtype)
+        self.tz = getattr(dtype, 'tz', None)
+        self.is_histogram = name == 'latency_histogram'
+        self.is_string = (not self.is_histogram and
+                          pd.api.types.is_object_dtype(dtype))
+        self.codes: Dict[str, int] = dict()
+        self.values: List[str] = []
+
+    def encode(self, s: pd.Series) -> np.ndarray:
+        if self.is_datetime:
+            if self.tz is not None:
+                s = s.dt.tz_convert('UTC').dt.tz_localize(None)
+            return s.values.astype('datetime64[ns]').view(np.int64)
+        elif self.is_histogram:
+            # A chunk of ungrouped measurements has no histograms at all, so
+            # pandas reads the column as floats.
+            return s.fillna('').astype(str).values.astype(np.bytes_)
+        elif self.is_string:
+            for value in s.unique():
+                if value not in self.codes:
+                    self.codes[value] = len(self.values)
+                    self.values.append(value)
+            return s.map(self.codes).values.astype(np.int32)
+        else:
+            return s.values
+
+    def decode(self, xs: np.ndarray) -> Any:
+        if self.is_datetime:
+            timestamps = pd.to_datetime(xs, unit='ns')
+            if self.tz is not None:
+                timestamps = timestamps.tz_localize('UTC').tz_convert(self.tz)
+            return timestamps
+        elif self.is_histogram:
+            return xs.astype(str).astype(object)
+        elif self.is_string:
+            return np.array(self.values, dtype=object)[xs]
+        else:
+            return xs
+
+
+class RecorderDataStream:
+    """
+    A RecorderDataStream merges the CSVs written by a set of
+    frankenpaxos.BenchmarkUtil.Recorders or LabeledRecorders (or the binary
+    files written by BinaryRecorders) into a single
+    stream of DataFrames sorted by start time, without ever loading all the
+    data into memory at once.
+
+    It is a two phase external merge sort. First, every CSV is read in chunks
+    of `chunk_size` rows. Every chunk is sorted by start time and spilled to a
+    temporary directory as a run. Second, the runs are k-way merged. We read
+    `block_size` rows from the front of every run, emit every row whose start
+    time is at most the smallest last start time of any block, and repeat.
+    Peak memory is proportional to `chunk_size` in the first phase and to the
+    number of runs times `block_size` in the second, no matter how many rows
+    there are.
+
+        with RecorderDataStream(filenames) as stream:
+            for block in stream.blocks():
+                ...
+    """
+    def __init__(self,
+                 filenames: Iterable[str],
+                 chunk_size: int = 1000000,
+                 block_size: int = 65536) -> None:
+        self.filenames = list(filenames)
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.min_start: Optional[int] = None
+        self._directory = tempfile.mkdtemp(prefix='recorder_data_')
+        self._columns: Dict[str, _Column] = dict()
+        self._column_names: List[str] = []
+        self._runs: List[_Run] = []
+
+    def __enter__(self) -> 'RecorderDataStream':
+        self._spill()
+        return self
+
+    def __exit__(self, cls, exn, traceback) -> None:
+        self._runs = []
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _read_chunks(self, filename: str) -> Iterator[pd.DataFrame]:
+        if filename.endswith('.bin'):
+            # See pd_util.read_binary_recorder_data.
+            (records, labels) = pd_util.read_binary_recorder_data(filename)
+            for i in range(0, len(records), self.chunk_size):
+                chunk = pd_util.binary_recorder_dataframe(
+                    records[i:i + self.chunk_size], labels)
+                chunk['label'] = chunk['label'].astype(object)
+                yield chunk
+        else:
+            yield from pd.read_csv(filename,
+                                   header=0,
+                                   parse_dates=['start', 'stop'],
+                                   chunksize=self.chunk_size)
+
+    def _spill(self) -> None:
+        num_runs = 0
+        for filename in self.filenames:
+            for chunk in self._read_chunks(filename):
+                if len(chunk) == 0:
+                    continue
+
+                if not self._column_names:
+                    self._column_names = list(chunk.columns)
+                    for name in self._column_names:
+                        self._columns[name] = _Column(name, chunk[name].dtype)
+
+                chunk = chunk.sort_values('start', kind='mergesort')
+                for name in self._column_names:
+                    np.save(os.path.join(self._directory,
+                                         f'{num_runs}_{name}.npy'),
+                            self._columns[name].encode(chunk[name]))
+                num_runs += 1
+
+        self._runs = [
+            _Run(self._directory, i, self._column_names)
+            for i in range(num_runs)
+        ]
+        if self._runs:
+            self.min_start = int(min(run.start[0] for run in self._runs))
+
+    def columns(self) -> List[str]:
+        return list(self._column_names)
+
+    def blocks(self) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        blocks yields the merged data as a sequence of dicts mapping column
+        names to encoded NumPy arrays (see _Column). The blocks are sorted by
+        start time, and so is their concatenation.
+        """
+        while True:
+            runs = [run for run in self._runs if not run.done()]
+            if len(runs) == 0:
+                return
+
+            frontier = min(
+                run.start[min(run.position + self.block_size, len(run)) - 1]
+                for run in runs)
+            parts: Dict[str, List[np.ndarray]] = {
+                name: [] for name in self._column_names
+            }
+            for run in runs:
+                end = min(run.position + self.block_size, len(run))
+                n = np.searchsorted(run.start[run.position:end],
+                                    frontier,
+                                    side='right')
+                for name in self._column_names:
+                    parts[name].append(
+                        np.asarray(run.columns[name][run.position:run.position +
+                                                     n]))
+                run.position += n
+
+            block = {
+                name: np.concatenate(arrays)
+                for (name, arrays) in parts.items()
+            }
+            order = np.argsort(block['start'], kind='mergesort')
+            yield {name: xs[order] for (name, xs) in block.items()}
+
+    def to_dataframe(self, block: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Decodes a block into a DataFrame indexed by start time."""
+        df = pd.DataFrame({
+            name: self._columns[name].decode(block[name])
+            for name in self._column_names
+        })
+        return df.set_index('start')
+
+    def arrow_schema(self) -> Any:
+        """
+        The Arrow schema of the merged data (see pd_util.arrow_schema). Labels
+        are dictionary encoded with the dictionary of every label in the data,
+        so every block can be written with the same dictionary. Latency
+        histograms are plain strings.
+        """
+        pa = pd_util.import_pyarrow()
+        empty = {
+            name: np.zeros(0, dtype=self._runs[0].columns[name].dtype)
+            for name in self._column_names
+        }
+        schema = pd_util.arrow_schema(self.to_dataframe(empty).reset_index())
+        for (name, column) in self._columns.items():
+            if column.is_histogram:
+                schema = schema.set(schema.get_field_index(name),
+                                    pa.field(name, pa.string()))
+        return schema
+
+    def to_record_batch(self, block: Dict[str, np.ndarray], schema: Any) -> Any:
+        """
+        Encodes a block as an Arrow record batch with the given schema (see
+        arrow_schema). The encoded columns are used as is, so nothing is
+        decoded and re-encoded.
+        """
+        pa = pd_util.import_pyarrow()
+        arrays = []
+        for field in schema:
+            xs = block[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(
+                        pa.array(xs, type=pa.int32()),
+                        pa.array(self._columns[field.name].values,
+                                 type=pa.string())))
+            elif self._columns[field.name].is_histogram:
+                arrays.append(
+                    pa.array(self.decode(field.name, xs), type=pa.string()))
+            else:
+                arrays.append(pa.array(xs, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def decode(self, name: str, xs: np.ndarray) -> Any:
+        """Decodes the encoded values of column `name` (see _Column)."""
+        return self._columns[name].decode(xs)
+
+    def bins(self) -> steady_state_util.Bins:
+        """
+        bins returns the per-second throughput and latency of the stream (see
+        steady_state_util). It reads the runs directly, so it doesn't consume
+        the stream.
+        """
+        assert self.min_start is not None
+        bins = steady_state_util.Bins(self.min_start)
+        for run in self._runs:
+            bins.add(run.start, run.columns['latency_nanos'],
+                     run.columns.get('count'))
+        return bins
+
+    def decode_label(self, code: int) -> str:
+        return self._columns['label'].values[code]
+
+
+class _RollingThroughput:
+    """
+    _RollingThroughput computes the same rolling window throughput as
+    pd_util.throughput (or pd_util.weighted_throughput), but over a stream of
+    sorted blocks of timestamps. Only the tail of the stream that lies within
+    one window of the latest timestamp is retained between blocks.
+
+    If `weighted` is false, the untrimmed pd_util.throughput semantics are
+    used: the first 100 measurements are dropped and the measurements in the
+    first window report their cumulative rate. If `weighted` is true, the
+    trimmed pd_util.weighted_throughput semantics are used: the measurements
+    in the first window are dropped.
+    """
+    def __init__(self, window_size_ms: float, weighted: bool) -> None:
+        self.window_size_ns = int(window_size_ms * 1e6)
+        self.window_size_s = window_size_ms / 1000
+        self.weighted = weighted
+        self.sketch = QuantileSketch()
+        self._first: Optional[int] = None
+        self._num_seen = 0
+        self._tail_times = np.zeros(0, dtype=np.int64)
+        self._tail_weights = np.zeros(0, dtype=np.int64)
+
+    def add(self, times: np.ndarray, weights: np.ndarray) -> None:
+        if len(times) == 0:
+            return
+        if self._first is None:
+            self._first = int(times[0])
+
+        all_times = np.concatenate([self._tail_times, times])
+        all_weights = np.concatenate([self._tail_weights, weights])
+        throughput = (pd_util.rolling_sums(all_times, all_weights,
+                                           self.window_size_ns)
+                      [len(self._tail_times):] / self.window_size_s)
+
+        window_end = self._first + self.window_size_ns
+        if self.weighted:
+            throughput = throughput[times >= window_end]
+        else:
+            positions = np.arange(self._num_seen, self._num_seen + len(times))
+            ramp = (times <= window_end) & (times > self._first)
+            num_entries = self._num_seen + np.searchsorted(
+                times, times[ramp], side='right')
+            elapsed_s = (times[ramp] - self._first) / 1e9
+            throughput[ramp] = num_entries / elapsed_s
+            throughput = throughput[positions >= 100]
+        self.sketch.add(throughput)
+        self._num_seen += len(times)
+
+        keep = all_times > all_times[-1] - self.window_size_ns
+        self._tail_times = all_times[keep]
+        self._tail_weights = all_weights[keep]
+
+
+class RecorderSummary:
+    """
+    A RecorderSummary accumulates the latency and 1 second start throughput of
+    a stream of recorder data in bounded memory. See QuantileSketch.
+    """
+    def __init__(self, weighted: bool) -> None:
+        self.latency_ms = QuantileSketch()
+        self.start_throughput_1s = _RollingThroughput(1000, weighted)
+
+    def add(self,
+            start: np.ndarray,
+            latency_nanos: np.ndarray,
+            count: np.ndarray,
+            histograms: Optional[np.ndarray] = None) -> None:
+        if histograms is None:
+            self.latency_ms.add(latency_nanos / 1e6)
+        else:
+            add_latency_histograms(self.latency_ms, latency_nanos, count,
+                                   histograms)
+        self.start_throughput_1s.add(start, count)
+
+
+def summarize(stream: RecorderDataStream,
+              drop_prefix: datetime.timedelta,
+              labeled: bool,
+              on_block: Callable[[Dict[str, np.ndarray]], None] = lambda _: None,
+              window: Optional[steady_state_util.Window] = None
+              ) -> Dict[Optional[str], RecorderSummary]:
+    """
+    summarize reduces a RecorderDataStream into one RecorderSummary per label
+    (or a single summary keyed by None if the data is unlabeled). Measurements
+    that start within `drop_prefix` of the first measurement are ignored, as
+    are measurements that start outside of `window`, if it's given.
+    `on_block` is invoked on every merged block, before the prefix is dropped,
+    which is useful for writing out the merged data. If the data has latency
+    histograms, they are merged into the latency sketches (see
+    add_latency_histograms).
+    """
+    summaries: Dict[Optional[str], RecorderSummary] = dict()
+    if stream.min_start is None:
+        return summaries
+
+    threshold = stream.min_start + int(drop_prefix.total_seconds() * 1e9)
+    for block in stream.blocks():
+        on_block(block)
+
+        keep = block['start'] >= threshold
+        if window is not None:
+            keep &= ((block['start'] >= window.start_ns) &
+                     (block['start'] < window.stop_ns))
+        start = block['start'][keep]
+        latency_nanos = block['latency_nanos'][keep]
+        if not labeled:
+            summary = summaries.setdefault(None, RecorderSummary(False))
+            summary.add(start, latency_nanos,
+                        np.ones(len(start), dtype=np.int64))
+            continue
+
+        labels = block['label'][keep]
+        count = block['count'][keep]
+        histograms = None
+        if 'latency_histogram' in block:
+            histograms = stream.decode('latency_histogram',
+                                       block['latency_histogram'][keep])
+        for code in np.unique(labels):
+            mask = labels == code
+            label = stream.decode_label(int(code))
+            summary = summaries.setdefault(label, RecorderSummary(True))
+            summary.add(start[mask], latency_nanos[mask], count[mask],
+                        None if histograms is None else histograms[mask])
+
+    return summaries
@@ -0,0 +1,213 @@
+from . import pd_util
+from . import recorder_util
+import datetime
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+try:
+    import pyarrow
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class QuantileSketchTest(unittest.TestCase):
+    def test_empty(self):
+        sketch = recorder_util.QuantileSketch()
+        self.assertTrue(np.isnan(sketch.mean()))
+        self.assertTrue(np.isnan(sketch.quantile(0.5)))
+
+    def test_quantiles(self):
+        xs = np.random.default_rng(0).exponential(10, 10000)
+        sketch = recorder_util.QuantileSketch(relative_accuracy=0.01)
+        sketch.add(xs[:5000])
+        sketch.add(xs[5000:])
+        s = pd.Series(xs)
+        self.assertAlmostEqual(sketch.mean(), s.mean())
+        self.assertEqual(sketch.min(), s.min())
+        self.assertEqual(sketch.max(), s.max())
+        for q in [0.5, 0.9, 0.95, 0.99]:
+            self.assertAlmostEqual(sketch.quantile(q),
+                                   s.quantile(q),
+                                   delta=0.02 * s.quantile(q))
+
+    def test_weights(self):
+        xs = np.array([1.0, 2.0, 3.0])
+        weighted = recorder_util.QuantileSketch()
+        weighted.add(xs, np.array([1, 0, 3]))
+        unweighted = recorder_util.QuantileSketch()
+        unweighted.add(np.array([1.0, 3.0, 3.0, 3.0]))
+        self.assertEqual(len(weighted), 4)
+        self.assertEqual(weighted.mean(), unweighted.mean())
+        self.assertEqual(weighted.min(), 1.0)
+        for q in [0.25, 0.5, 0.99]:
+            self.assertEqual(weighted.quantile(q), unweighted.quantile(q))
+
+
+# The histogram that a grouping BenchmarkUtil.LabeledRecorder writes for a
+# group with the given latencies.
+def _latency_histogram(latency_nanos: np.ndarray) -> str:
+    a = recorder_util.HISTOGRAM_RELATIVE_ACCURACY
+    keys = np.ceil(np.log(latency_nanos) / np.log((1 + a) / (1 - a)))
+    (buckets, counts) = np.unique(keys.astype(np.int64), return_counts=True)
+    return ';'.join(f'{b}:{c}' for (b, c) in zip(buckets, counts))
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_grouped_tail_latency(self):
+        rng = np.random.default_rng(0)
+        latency_nanos = rng.lognormal(np.log(1e6), 1, 100 * 100).astype(int)
+        groups = latency_nanos.reshape(100, 100)
+        mean_latency_nanos = groups.mean(axis=1).astype(int)
+        histograms = np.array([_latency_histogram(g) for g in groups],
+                              dtype=object)
+
+        sketch = recorder_util.QuantileSketch()
+        recorder_util.add_latency_histograms(sketch, mean_latency_nanos,
+                                             np.full(100, 100), histograms)
+        self.assertEqual(len(sketch), len(latency_nanos))
+        p99 = np.quantile(latency_nanos / 1e6, 0.99)
+        self.assertAlmostEqual(sketch.quantile(0.99), p99, delta=0.02 * p99)
+        # The group means alone get the tail badly wrong.
+        self.assertLess(np.quantile(mean_latency_nanos / 1e6, 0.99), p99 / 2)
+
+    def test_ungrouped(self):
+        sketch = recorder_util.QuantileSketch()
+        recorder_util.add_latency_histograms(
+            sketch, np.array([1e6, 2e6]), np.array([1, 1]),
+            np.array([np.nan, ''], dtype=object))
+        self.assertEqual(len(sketch), 2)
+        self.assertEqual(sketch.mean(), 1.5)
+
+
+class RecorderDataStreamTest(unittest.TestCase):
+    def _write_csvs(self, directory: str) -> pd.DataFrame:
+        rng = np.random.default_rng(0)
+        dfs = []
+        for i in range(3):
+            n = 2000
+            start = (pd.Timestamp('2020-01-01T00:00:00Z') +
+                     pd.to_timedelta(rng.integers(0, int(3e9), n), unit='ns'))
+            latency_nanos = rng.integers(int(1e5), int(1e7), n)
+            stop = start + pd.to_timedelta(latency_nanos, unit='ns')
+            df = pd.DataFrame({
+                'start': start,
+                'stop': stop,
+                'count': rng.integers(1, 4, n),
+                'latency_nanos': latency_nanos,
+                'label': rng.choice(['read', 'write'], n),
+            })
+            # Clients write measurements in the order they finish.
+            df.sort_values('stop').to_csv(
+                os.path.join(directory, f'client_{i}_data.csv'), index=False)
+            dfs.append(df)
+        return pd.concat(dfs, ignore_index=True)
+
+    def test_labeled_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            df = self._write_csvs(directory)
+            filenames = [
+                os.path.join(directory, f'client_{i}_data.csv')
+                for i in range(3)
+            ]
+            with recorder_util.RecorderDataStream(filenames,
+                                                  chunk_size=500,
+                                                  block_size=100) as stream:
+                starts = []
+                summaries = recorder_util.summarize(
+                    stream,
+                    datetime.timedelta(seconds=0),
+                    labeled=True,
+                    on_block=lambda block: starts.append(block['start']))
+
+        # The merged stream is sorted and contains every row.
+        starts = np.concatenate(starts)
+        self.assertEqual(len(starts), len(df))
+        self.assertTrue(np.all(np.diff(starts) >= 0))
+
+        df = df.set_index('start').sort_index()
+        for label in ['read', 'write']:
+            ldf = df[df['label'] == label]
+            summary = summaries[label]
+            self.assertAlmostEqual(summary.latency_ms.mean(),
+                                   (ldf['latency_nanos'] / 1e6).mean())
+            throughput = pd_util.weighted_throughput(ldf['count'], 1000)
+            sketch = summary.start_throughput_1s.sketch
+            self.assertEqual(len(sketch), len(throughput))
+            self.assertAlmostEqual(sketch.mean(), throughput.mean())
+            self.assertEqual(sketch.max(), throughput.max())
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_record_batches(self):
+        with tempfile.TemporaryDirectory() as directory:
+            df = self._write_csvs(directory)
+            filenames = [
+                os.path.join(directory, f'client_{i}_data.csv')
+                for i in range(3)
+            ]
+            arrow_filename = os.path.join(directory, 'data.arrow')
+            with recorder_util.RecorderDataStream(filenames,
+                                                  chunk_size=500,
+                                                  block_size=100) as stream:
+                schema = stream.arrow_schema()
+                with pyarrow.ipc.new_file(arrow_filename, schema) as writer:
+                    for block in stream.blocks():
+                        writer.write_batch(
+                            stream.to_record_batch(block, schema))
+            read = pd_util.read_recorder_data(arrow_filename)
+
+        df = df.sort_values('start', kind='mergesort')
+        self.assertEqual(len(read), len(df))
+        self.assertTrue(read['start'].is_monotonic_increasing)
+        self.assertEqual(sorted(read['latency_nanos']),
+                         sorted(df['latency_nanos']))
+        self.assertEqual(sorted(zip(read['start'], read['label'])),
+                         sorted(zip(df['start'], df['label'])))
+
+    def test_latency_histograms(self):
+        # The first client doesn't group its measurements, and the others
+        # group every 10 measurements.
+        rng = np.random.default_rng(0)
+        latency_nanos = rng.lognormal(np.log(1e6), 1, 3000).astype(int)
+        filenames = []
+        with tempfile.TemporaryDirectory() as directory:
+            for i in range(3):
+                xs = latency_nanos[1000 * i:1000 * (i + 1)]
+                if i == 0:
+                    groups = xs.reshape(-1, 1)
+                    histograms = [np.nan] * len(groups)
+                else:
+                    groups = xs.reshape(-1, 10)
+                    histograms = [_latency_histogram(g) for g in groups]
+                start = (pd.Timestamp('2020-01-01T00:00:00Z') +
+                         pd.to_timedelta(np.arange(len(groups)), unit='ms'))
+                filenames.append(os.path.join(directory, f'client_{i}.csv'))
+                pd.DataFrame({
+                    'start': start,
+                    'stop': start,
+                    'count': groups.shape[1],
+                    'latency_nanos': groups.mean(axis=1).astype(int),
+                    'label': 'write',
+                    'latency_histogram': histograms,
+                }).to_csv(filenames[-1], index=False)
+
+            with recorder_util.RecorderDataStream(filenames,
+                                                  chunk_size=50,
+                                                  block_size=20) as stream:
+                summaries = recorder_util.summarize(
+                    stream, datetime.timedelta(seconds=0), labeled=True)
+                # The histograms aren't dictionary encoded.
+                self.assertEqual(stream._columns['latency_histogram'].values,
+                                 [])
+
+        sketch = summaries['write'].latency_ms
+        self.assertEqual(len(sketch), len(latency_nanos))
+        p99 = np.quantile(latency_nanos / 1e6, 0.99)
+        self.assertAlmostEqual(sketch.quantile(0.99), p99, delta=0.02 * p99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+from typing import List, NamedTuple, Optional
+import csv
+import numpy as np
+import pandas as pd
+
+# Some benchmarks run a driver that perturbs the protocol in the middle of the
+# benchmark: it kills a leader, reconfigures the acceptors, and so on. The
+# summary statistics of such a benchmark mostly reflect the steady state, not
+# how the protocol copes with the perturbation. The driver records every event
+# it triggers (see frankenpaxos.BenchmarkUtil.EventRecorder), and recovery_util
+# measures, for every event,
+#
+#   - the dip depth: how far throughput falls, as a fraction of the throughput
+#     before the event;
+#   - the recovery time: how long it takes throughput to get back to (and
+#     stay at) 95% of the throughput before the event; and
+#   - the p99 latency spike: how much higher the p99 latency gets than it was
+#     before the event.
+#
+# The throughput before an event is the median throughput of the `baseline`
+# before it, and the p99 latency before an event is the p99 latency of the
+# commands that finished in that time. After an event, we look at throughput
+# and p99 latency in bins of `bin` until the next event (at most `horizon`
+# later). Commands are binned by when they finish, so that a command stuck
+# behind a failure counts towards the latency after the failure rather than
+# before it.
+#
+# When a stalled protocol recovers, the commands that piled up during the stall
+# all finish at once, so throughput spikes for a moment even if the protocol
+# only recovers partially. Throughput has only recovered once it has gotten
+# back to 95% of the baseline after its lowest point and the median throughput
+# of the following `sustain` is there too.
+
+BIN = pd.Timedelta(milliseconds=100)
+BASELINE = pd.Timedelta(seconds=5)
+HORIZON = pd.Timedelta(seconds=30)
+SUSTAIN = pd.Timedelta(seconds=1)
+
+# An event recovers once throughput is back to this fraction of its baseline.
+RECOVERED_FRACTION = 0.95
+
+
+# An Event is one row of the file written by an EventRecorder: at `time`, the
+# driver triggered an event of kind `kind` (e.g., failure) targeting the
+# `process_index`th process of role `role` (written to the index column).
+class Event(NamedTuple):
+    time: pd.Timestamp
+    kind: str
+    role: str
+    process_index: int
+
+
+def read_events(filename: str) -> List[Event]:
+    """read_events reads the events written by an EventRecorder."""
+    with open(filename) as f:
+        return [
+            Event(time=pd.Timestamp(row['time']),
+                  kind=row['kind'],
+                  role=row['role'],
+                  process_index=int(row['index'])) for row in csv.DictReader(f)
+        ]
+
+
+# An EventRecovery is how the throughput and latency of a benchmark react to
+# one event. See above for details. The fields are NaN if there isn't enough
+# data around the event. recovery_s is 0 if throughput never drops below 95%
+# of the baseline, and infinite if it doesn't get back there before the next
+# event (or the end of the benchmark).
+class EventRecovery(NamedTuple):
+    baseline_throughput: float
+    dip_depth: float
+    recovery_s: float
+    baseline_p99_ms: float
+    p99_spike_ms: float
+
+
+# A RecoveryOutput summarizes the recovery of a benchmark from all of the
+# events it measures (i.e., all events but warmups). Every field is the worst
+# case over all events.
+class RecoveryOutput(NamedTuple):
+    num_events: int
+    max_dip_depth: float
+    max_recovery_s: float
+    max_p99_spike_ms: float
+
+
+def _nan_recovery() -> EventRecovery:
+    return EventRecovery(baseline_throughput=np.nan,
+                         dip_depth=np.nan,
+                         recovery_s=np.nan,
+                         baseline_p99_ms=np.nan,
+                         p99_spike_ms=np.nan)
+
+
+def event_recovery(df: pd.DataFrame,
+                   start: pd.Timestamp,
+                   stop: pd.Timestamp,
+                   bin: pd.Timedelta = BIN,
+                   baseline: pd.Timedelta = BASELINE,
+                   sustain: pd.Timedelta = SUSTAIN) -> EventRecovery:
+    """
+    event_recovery measures the recovery from an event at time `start`,
+    looking at the data up to time `stop`. `df` is aggregate recorder data,
+    indexed by the time every command finished and sorted, with a
+    latency_nanos column (and a count column if measurements are grouped).
+    """
+    times = df.index.asi8
+    latencies = df['latency_nanos'].values
+    counts = (df['count'].values
+              if 'count' in df.columns else np.ones(len(df), dtype=np.int64))
+    start_ns = start.value
+    bin_ns = bin.value
+    num_bins = int((stop.value - start_ns) // bin_ns)
+    if len(times) == 0:
+        return _nan_recovery()
+    # The baseline can't start before the data does, or empty bins would drag
+    # down the baseline throughput.
+    baseline_start_ns = max((start - baseline).value, times[0])
+    num_baseline_bins = int((start_ns - baseline_start_ns) // bin_ns)
+    baseline_ns = start_ns - num_baseline_bins * bin_ns
+
+    (lo, mid, hi) = np.searchsorted(
+        times, [baseline_ns, start_ns, start_ns + num_bins * bin_ns])
+    if mid - lo == 0 or hi - mid == 0:
+        return _nan_recovery()
+
+    def tput(lo: int, hi: int, origin_ns: int, n: int) -> np.ndarray:
+        bins = (times[lo:hi] - origin_ns) // bin_ns
+        return np.bincount(bins, weights=counts[lo:hi],
+                           minlength=n) / bin.total_seconds()
+
+    baseline_throughput = float(
+        np.median(tput(lo, mid, baseline_ns, num_baseline_bins)))
+    baseline_p99_ms = float(np.percentile(latencies[lo:mid], 99)) / 1e6
+    if baseline_throughput == 0:
+        return _nan_recovery()
+
+    throughput = tput(mid, hi, start_ns, num_bins)
+    lowest = int(np.argmin(throughput))
+    dip_depth = max(0.0, 1 - throughput[lowest] / baseline_throughput)
+    recovered = RECOVERED_FRACTION * baseline_throughput
+    num_sustain_bins = max(1, int(sustain.value // bin_ns))
+    recovery_s = 0.0 if throughput[lowest] >= recovered else np.inf
+    if recovery_s > 0:
+        for i in range(lowest, num_bins):
+            if (throughput[i] >= recovered and
+                    np.median(throughput[i:i + num_sustain_bins]) >= recovered):
+                recovery_s = i * bin.total_seconds()
+                break
+
+    bins = (times[mid:hi] - start_ns) // bin_ns
+    p99s = pd.Series(latencies[mid:hi]).groupby(bins).quantile(.99) / 1e6
+    p99_spike_ms = max(0.0, float(p99s.max()) - baseline_p99_ms)
+
+    return EventRecovery(baseline_throughput=baseline_throughput,
+                         dip_depth=dip_depth,
+                         recovery_s=recovery_s,
+                         baseline_p99_ms=baseline_p99_ms,
+                         p99_spike_ms=p99_spike_ms)
+
+
+def recoveries(df: pd.DataFrame,
+               events: List[Event],
+               bin: pd.Timedelta = BIN,
+               baseline: pd.Timedelta = BASELINE,
+               horizon: pd.Timedelta = HORIZON,
+               sustain: pd.Timedelta = SUSTAIN) -> pd.DataFrame:
+    """
+    recoveries measures the recovery from every event in `events`, returning
+    one row per event with the columns of Event and EventRecovery. `df` is
+    aggregate recorder data with start and stop columns (e.g., as read by
+    pd_util.read_recorder_data).
+    """
+    df = df.set_index('stop').sort_index()
+    events = sorted(events, key=lambda event: event.time)
+    end: Optional[pd.Timestamp] = df.index[-1] if len(df) > 0 else None
+    rows = []
+    for (i, event) in enumerate(events):
+        stop = event.time + horizon
+        if i + 1 < len(events):
+            stop = min(stop, events[i + 1].time)
+        if end is not None:
+            stop = min(stop, end)
+        if end is None or stop <= event.time:
+            recovery = _nan_recovery()
+        else:
+            recovery = event_recovery(df, event.time, stop, bin, baseline,
+                                      sustain)
+        rows.append({**event._asdict(), **recovery._asdict()})
+    return pd.DataFrame(rows,
+                        columns=list(Event._fields) +
+                        list(EventRecovery._fields))
+
+
+def summarize(recoveries: pd.DataFrame) -> RecoveryOutput:
+    """
+    summarize summarizes the output of `recoveries`. Warmup events (e.g.,
+    leader_change_warmup) only warm up the JVMs for the events that follow, so
+    they are ignored.
+    """
+    measured = recoveries[~recoveries['kind'].str.endswith('_warmup')]
+    return RecoveryOutput(
+        num_events=len(measured),
+        max_dip_depth=measured['dip_depth'].max(),
+        max_recovery_s=measured['recovery_s'].max(),
+        max_p99_spike_ms=measured['p99_spike_ms'].max(),
+    )
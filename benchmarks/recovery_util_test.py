@@ -0,0 +1,129 @@
+from . import benchmark
+from . import recovery_util
+import datetime
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+def _timestamp(s: float) -> pd.Timestamp:
+    return pd.Timestamp(int(s * 1e9), unit='ns', tz='UTC')
+
+
+# A benchmark that finishes a 1 ms command every 10 ms for `duration` seconds,
+# except that no command finishes in [outage_start, outage_stop). The commands
+# started during the outage finish when it ends.
+def _data(duration: float, outage_start: float,
+          outage_stop: float) -> pd.DataFrame:
+    starts = np.arange(0, duration, 0.01)
+    stops = starts + 0.001
+    in_outage = (stops >= outage_start) & (stops < outage_stop)
+    stops[in_outage] = outage_stop
+    return pd.DataFrame({
+        'start': [_timestamp(s) for s in starts],
+        'stop': [_timestamp(s) for s in stops],
+        'latency_nanos': ((stops - starts) * 1e9).astype(np.int64),
+    })
+
+
+class RecoveryTest(unittest.TestCase):
+    def test_read_events(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'driver_events.csv')
+            with open(filename, 'w') as f:
+                f.write('time,kind,role,index\n')
+                f.write('2020-01-01T00:00:01.500Z,failure,leader,0\n')
+            self.assertEqual(recovery_util.read_events(filename), [
+                recovery_util.Event(
+                    time=pd.Timestamp('2020-01-01T00:00:01.500Z'),
+                    kind='failure',
+                    role='leader',
+                    process_index=0)
+            ])
+
+    def test_outage(self) -> None:
+        df = _data(duration=20, outage_start=10, outage_stop=11)
+        events = [recovery_util.Event(_timestamp(10), 'failure', 'leader', 0)]
+        recoveries = recovery_util.recoveries(df, events)
+        self.assertEqual(len(recoveries), 1)
+        recovery = recoveries.iloc[0]
+        self.assertAlmostEqual(recovery['baseline_throughput'], 100)
+        self.assertAlmostEqual(recovery['dip_depth'], 1)
+        self.assertAlmostEqual(recovery['recovery_s'], 1)
+        self.assertAlmostEqual(recovery['baseline_p99_ms'], 1)
+        # The command started right after the failure waits out the outage.
+        self.assertAlmostEqual(recovery['p99_spike_ms'], 989, delta=10)
+
+    def test_no_dip(self) -> None:
+        df = _data(duration=20, outage_start=30, outage_stop=30)
+        events = [recovery_util.Event(_timestamp(10), 'failure', 'leader', 0)]
+        recovery = recovery_util.recoveries(df, events).iloc[0]
+        self.assertAlmostEqual(recovery['dip_depth'], 0)
+        self.assertEqual(recovery['recovery_s'], 0)
+        self.assertAlmostEqual(recovery['p99_spike_ms'], 0)
+
+    def test_no_recovery(self) -> None:
+        # After the outage, the commands that piled up finish at once, but then
+        # only half as many commands finish as before.
+        df = _data(duration=20, outage_start=10, outage_stop=11)
+        df = df[(df['stop'] < _timestamp(11)) | (df.index % 2 == 0)]
+        events = [recovery_util.Event(_timestamp(10), 'failure', 'leader', 0)]
+        recovery = recovery_util.recoveries(df, events).iloc[0]
+        self.assertAlmostEqual(recovery['dip_depth'], 1)
+        self.assertEqual(recovery['recovery_s'], np.inf)
+
+    def test_not_enough_data(self) -> None:
+        df = _data(duration=20, outage_start=30, outage_stop=30)
+        events = [recovery_util.Event(_timestamp(30), 'failure', 'leader', 0)]
+        recovery = recovery_util.recoveries(df, events).iloc[0]
+        self.assertTrue(np.isnan(recovery['dip_depth']))
+
+    def test_summarize(self) -> None:
+        df = _data(duration=30, outage_start=20, outage_stop=22)
+        events = [
+            recovery_util.Event(_timestamp(5), 'leader_change_warmup', 'leader',
+                                1),
+            recovery_util.Event(_timestamp(10), 'reconfiguration', 'leader', 0),
+            recovery_util.Event(_timestamp(20), 'failure', 'acceptor', 0),
+        ]
+        output = recovery_util.summarize(recovery_util.recoveries(df, events))
+        self.assertEqual(output.num_events, 2)
+        self.assertAlmostEqual(output.max_dip_depth, 1)
+        self.assertAlmostEqual(output.max_recovery_s, 2)
+
+    def test_summarize_no_events(self) -> None:
+        df = _data(duration=20, outage_start=30, outage_stop=30)
+        output = recovery_util.summarize(recovery_util.recoveries(df, []))
+        self.assertEqual(output.num_events, 0)
+        self.assertTrue(np.isnan(output.max_dip_depth))
+
+
+class ParseRecoveryDataTest(unittest.TestCase):
+    def test_parse_recovery_data(self) -> None:
+        df = _data(duration=20, outage_start=10, outage_stop=11)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                client_csv = bench.abspath('client_0_data.csv')
+                df.to_csv(client_csv, index=False)
+                events_filename = bench.abspath('driver_events.csv')
+                with open(events_filename, 'w') as f:
+                    f.write('time,kind,role,index\n')
+                    f.write(f'{_timestamp(10).isoformat()},failure,leader,0\n')
+                benchmark.parse_recorder_data(
+                    bench, [client_csv],
+                    drop_prefix=datetime.timedelta(seconds=0),
+                    steady_state=True)
+                output = benchmark.parse_recovery_data(bench, events_filename)
+            recoveries = pd.read_csv(os.path.join(path, 'event_recoveries.csv'))
+
+        self.assertEqual(output.num_events, 1)
+        self.assertAlmostEqual(output.max_dip_depth, 1)
+        self.assertAlmostEqual(output.max_recovery_s, 1)
+        self.assertEqual(list(recoveries['kind']), ['failure'])
+
+
+if __name__ == '__main__':
+    unittest.main()
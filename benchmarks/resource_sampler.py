@@ -0,0 +1,104 @@
+# resource_sampler.py samples the resource usage of a set of processes and of
+# the host they run on, writing the raw counters to a file for resource_util
+# to make sense of later. BenchmarkDirectory runs one sampler on every host
+# that it launches processes on. The sampler runs on remote hosts with
+# whatever Python they have, so it only uses the standard library, and it does
+# as little as possible.
+#
+# Every `interval` seconds, the sampler reads the pids in `pids_file` (one per
+# line; the file grows as processes are launched) and writes one line per pid
+# and two lines for the host:
+#
+#     p,<time_ns>,<pid>,<utime + stime ticks>,<rss kB>,<voluntary ctx
+#        switches>,<involuntary ctx switches>
+#     c,<time_ns>,<total cpu ticks>,<idle cpu ticks>
+#     n,<time_ns>,<received bytes>,<transmitted bytes>
+#
+# The first line of the output is `h,<ticks per second>,<number of cpus>`.
+# Context switches are summed over all of a process' threads, and network
+# bytes are summed over all interfaces but the loopback.
+import argparse
+import glob
+import os
+import time
+
+
+def _process(pid: str):
+    with open(f'/proc/{pid}/stat') as f:
+        stat = f.read()
+    # The command name is in parentheses and may contain spaces.
+    fields = stat[stat.rfind(')') + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])
+
+    rss_kb = 0
+    voluntary = 0
+    involuntary = 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+    for filename in glob.glob(f'/proc/{pid}/task/*/status'):
+        try:
+            with open(filename) as f:
+                for line in f:
+                    if line.startswith('voluntary_ctxt_switches:'):
+                        voluntary += int(line.split()[1])
+                    elif line.startswith('nonvoluntary_ctxt_switches:'):
+                        involuntary += int(line.split()[1])
+        except OSError:
+            # The thread exited.
+            pass
+    return (ticks, rss_kb, voluntary, involuntary)
+
+
+def _cpu():
+    with open('/proc/stat') as f:
+        fields = [int(x) for x in f.readline().split()[1:]]
+    # idle and iowait.
+    return (sum(fields), fields[3] + fields[4])
+
+
+def _net():
+    rx = 0
+    tx = 0
+    with open('/proc/net/dev') as f:
+        for line in f.readlines()[2:]:
+            (interface, counters) = line.split(':', 1)
+            if interface.strip() == 'lo':
+                continue
+            counters = counters.split()
+            rx += int(counters[0])
+            tx += int(counters[8])
+    return (rx, tx)
+
+
+def main(args) -> None:
+    out = open(args.output, 'w')
+    out.write(f'h,{os.sysconf("SC_CLK_TCK")},{os.cpu_count()}\n')
+    while True:
+        now = time.time_ns()
+        try:
+            with open(args.pids_file) as f:
+                pids = [line.strip() for line in f if line.strip()]
+        except OSError:
+            pids = []
+        for pid in pids:
+            try:
+                (ticks, rss_kb, voluntary, involuntary) = _process(pid)
+            except (OSError, IndexError, ValueError):
+                # The process hasn't started yet or has already exited.
+                continue
+            out.write(f'p,{now},{pid},{ticks},{rss_kb},{voluntary},'
+                      f'{involuntary}\n')
+        out.write('c,{},{},{}\n'.format(now, *_cpu()))
+        out.write('n,{},{},{}\n'.format(now, *_net()))
+        out.flush()
+        time.sleep(max(0, args.interval - (time.time_ns() - now) / 1e9))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pids_file', type=str, required=True)
+    parser.add_argument('--output', type=str, required=True)
+    parser.add_argument('--interval', type=float, default=1.0)
+    main(parser.parse_args())
@@ -0,0 +1,159 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import csv
+import os
+import pandas as pd
+import re
+
+# When throughput levels off, some role is the bottleneck. To find out which,
+# BenchmarkDirectory can run a resource sampler (resource_sampler.py) on every
+# host, which records the raw CPU, memory, context switch, and network counters
+# of every process and host every second. resource_util turns those counters
+# into time series of rates and summarizes them by role.
+
+# The path of the sampler script. Like the JAR, it has to be at the same path
+# on every host.
+SAMPLER = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                       'resource_sampler.py')
+
+
+# Samples are the resource usage time series read from one sampler's output.
+# `processes` has columns time, pid, cpu_percent (where 100 is one core),
+# rss_mb, voluntary_ctxt_switches_per_s, and involuntary_ctxt_switches_per_s.
+# `host` has columns time, cpu_percent (where 100 is every core),
+# rx_bytes_per_s, and tx_bytes_per_s. A rate at time t is the rate since the
+# previous sample.
+class Samples(NamedTuple):
+    processes: pd.DataFrame
+    host: pd.DataFrame
+
+
+def _rates(df: pd.DataFrame, by: str, counters: Dict[str, str]) -> pd.DataFrame:
+    df = df.sort_values([by, 'time'])
+    grouped = df.groupby(by)
+    seconds = grouped['time'].diff() / 1e9
+    rates = pd.DataFrame({'time': df['time'], by: df[by]})
+    for (counter, rate) in counters.items():
+        rates[rate] = grouped[counter].diff() / seconds
+    return rates[seconds > 0]
+
+
+def read_samples(filename: str) -> Samples:
+    """read_samples reads the output of a resource sampler."""
+    clk_tck = 100
+    processes = []
+    cpu = []
+    net = []
+    with open(filename) as f:
+        for row in csv.reader(f):
+            if len(row) == 0:
+                continue
+            if row[0] == 'h':
+                clk_tck = int(row[1])
+            elif row[0] == 'p' and len(row) == 7:
+                processes.append([int(x) for x in row[1:]])
+            elif row[0] == 'c' and len(row) == 4:
+                cpu.append([int(x) for x in row[1:]])
+            elif row[0] == 'n' and len(row) == 4:
+                net.append([int(x) for x in row[1:]])
+
+    p = pd.DataFrame(
+        processes,
+        columns=['time', 'pid', 'ticks', 'rss_kb', 'voluntary', 'involuntary'])
+    process_rates = _rates(
+        p, 'pid', {
+            'ticks': 'cpu_percent',
+            'voluntary': 'voluntary_ctxt_switches_per_s',
+            'involuntary': 'involuntary_ctxt_switches_per_s',
+        })
+    process_rates['cpu_percent'] *= 100 / clk_tck
+    process_rates.insert(3, 'rss_mb', p['rss_kb'] / 1024)
+
+    c = pd.DataFrame(cpu, columns=['time', 'total', 'idle'])
+    n = pd.DataFrame(net, columns=['time', 'rx_bytes', 'tx_bytes'])
+    c['host'] = 0
+    n['host'] = 0
+    cpu_rates = _rates(c, 'host', {'total': 'total', 'idle': 'idle'})
+    host = pd.DataFrame({
+        'time': cpu_rates['time'],
+        'cpu_percent': 100 * (1 - cpu_rates['idle'] / cpu_rates['total']),
+    })
+    net_rates = _rates(n, 'host', {
+        'rx_bytes': 'rx_bytes_per_s',
+        'tx_bytes': 'tx_bytes_per_s'
+    })
+    host = host.merge(net_rates.drop(columns=['host']), on='time', how='outer')
+
+    for df in [process_rates, host]:
+        df['time'] = pd.to_datetime(df['time'], unit='ns', utc=True)
+    return Samples(processes=process_rates.reset_index(drop=True),
+                   host=host.reset_index(drop=True))
+
+
+def role(label: str) -> str:
+    """
+    role returns the role of the process launched with label `label`, e.g.
+    `acceptor` for `acceptor_1_2`.
+    """
+    return re.sub(r'(_\d+)+$', '', label)
+
+
+def peak_cpu(processes: pd.DataFrame) -> Dict[str, float]:
+    """
+    peak_cpu returns the highest CPU usage of any process of every role.
+    `processes` is like Samples.processes, with an extra label column.
+    """
+    if len(processes) == 0:
+        return dict()
+    roles = processes['label'].map(role)
+    peaks = processes.groupby(roles)['cpu_percent'].max()
+    return {r: float(peak) for (r, peak) in peaks.items()}
+
+
+# Processes that measure a benchmark rather than take part in it.
+def _is_instrumentation(label: str) -> bool:
+    return (label == 'prometheus' or label.endswith('_perf_record') or
+            '_profile_' in label)
+
+
+def group(label: str) -> str:
+    """
+    group returns the group of the process launched with label `label`. Most
+    processes are grouped by role (e.g., `leader` for `leader_2`), but
+    processes that belong to a numbered group of a role are grouped by that
+    group (e.g., `acceptor_1` for `acceptor_1_2`).
+    """
+    return re.sub(r'_\d+$', '', label)
+
+
+def rank_bottlenecks(
+    processes: pd.DataFrame,
+    window: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None
+) -> List[Tuple[str, float]]:
+    """
+    rank_bottlenecks ranks the groups of processes (see `group`) by how
+    saturated they were within `window` (or throughout, if no window is
+    given), from most to least saturated. `processes` is like
+    Samples.processes, with an extra label column.
+
+    The saturation of a process is its median CPU usage as a fraction of one
+    core. Every protocol role does its work on a single thread, so a process
+    using one core's worth of CPU can't go any faster. Other threads (e.g.,
+    the garbage collector) can push the saturation of a process above 1. The
+    saturation of a group is the saturation of its most saturated process,
+    since that process limits the group.
+    """
+    if window is not None:
+        (start, stop) = window
+        in_window = (processes['time'] >= start) & (processes['time'] < stop)
+        # If the sampler didn't run in the steady state, a ranking of the
+        # whole benchmark is better than no ranking.
+        if in_window.any():
+            processes = processes[in_window]
+    processes = processes[~processes['label'].map(_is_instrumentation)]
+    if len(processes) == 0:
+        return []
+
+    saturation = processes.groupby('label')['cpu_percent'].median() / 100
+    saturation = saturation.groupby(saturation.index.map(group)).max()
+    saturation = saturation.sort_values(ascending=False, kind='stable')
+    return [(g, float(s)) for (g, s) in saturation.items()]
@@ -0,0 +1,124 @@
+from . import benchmark
+from . import host
+from . import resource_util
+import datetime
+import json
+import os
+import pandas as pd
+import tempfile
+import time
+import unittest
+
+
+class ReadSamplesTest(unittest.TestCase):
+    def test_rates(self):
+        s = 10**9
+        lines = [
+            'h,100,4',
+            f'p,{0*s},7,100,2048,10,1',
+            f'c,{0*s},1000,800',
+            f'n,{0*s},0,0',
+            f'p,{1*s},7,150,4096,30,1',
+            f'p,{1*s},8,0,1024,0,0',
+            f'c,{1*s},1400,1000',
+            f'n,{1*s},1000,2000',
+            # A partial line from a killed sampler.
+            f'p,{2*s},7',
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'resources.txt')
+            with open(filename, 'w') as f:
+                f.write('\n'.join(lines))
+            samples = resource_util.read_samples(filename)
+
+        # Process 8 has only one sample, so it has no rates yet.
+        processes = samples.processes
+        self.assertEqual(list(processes['pid']), [7])
+        self.assertEqual(processes['time'][0],
+                         pd.Timestamp(s, unit='ns', tz='UTC'))
+        self.assertEqual(processes['cpu_percent'][0], 50)
+        self.assertEqual(processes['rss_mb'][0], 4)
+        self.assertEqual(processes['voluntary_ctxt_switches_per_s'][0], 20)
+        self.assertEqual(processes['involuntary_ctxt_switches_per_s'][0], 0)
+
+        self.assertEqual(len(samples.host), 1)
+        self.assertEqual(samples.host['cpu_percent'][0], 50)
+        self.assertEqual(samples.host['rx_bytes_per_s'][0], 1000)
+        self.assertEqual(samples.host['tx_bytes_per_s'][0], 2000)
+
+    def test_peak_cpu(self):
+        self.assertEqual(resource_util.role('acceptor_1_2'), 'acceptor')
+        self.assertEqual(resource_util.role('leader_0_perf_record'),
+                         'leader_0_perf_record')
+        processes = pd.DataFrame({
+            'label': ['leader_0', 'leader_0', 'leader_1', 'acceptor_0_0'],
+            'cpu_percent': [50.0, 90.0, 70.0, 10.0],
+        })
+        self.assertEqual(resource_util.peak_cpu(processes), {
+            'leader': 90.0,
+            'acceptor': 10.0
+        })
+
+    def test_rank_bottlenecks(self):
+        self.assertEqual(resource_util.group('acceptor_1_2'), 'acceptor_1')
+        self.assertEqual(resource_util.group('leader_2'), 'leader')
+
+        t = [pd.Timestamp(i * 10**9, unit='ns', tz='UTC') for i in range(4)]
+        processes = pd.DataFrame({
+            'time':
+                t * 5,
+            'label': (['leader_0'] * 4 + ['acceptor_0_0'] * 4 +
+                      ['acceptor_1_0'] * 4 + ['acceptor_1_1'] * 4 +
+                      ['prometheus'] * 4),
+            'cpu_percent':
+                ([90, 20, 20, 20] + [50, 50, 50, 50] + [30, 30, 30, 30] +
+                 [60, 70, 70, 70] + [400, 400, 400, 400]),
+        })
+        self.assertEqual(resource_util.rank_bottlenecks(processes), [
+            ('acceptor_1', 0.7),
+            ('acceptor_0', 0.5),
+            ('leader', 0.2),
+        ])
+
+        # The leader only spiked before the window.
+        ranked = resource_util.rank_bottlenecks(processes, (t[0], t[1]))
+        self.assertEqual(ranked[0], ('leader', 0.9))
+
+
+@unittest.skipUnless(os.path.exists('/proc/stat'), 'requires /proc')
+class SamplerTest(unittest.TestCase):
+    def test_sample_local_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench')
+            with benchmark.BenchmarkDirectory(path) as bench:
+                bench.resource_sample_interval = datetime.timedelta(
+                    milliseconds=100)
+                local = host.LocalHost()
+                bench.popen(local, 'spinner_0',
+                            ['python3', '-c', 'while True: pass'])
+                bench.popen(local, 'sleeper_0', ['sleep', '60'])
+                time.sleep(1)
+
+            peak_cpu = bench.peak_cpu()
+            self.assertEqual(set(peak_cpu.keys()), {'spinner', 'sleeper'})
+            self.assertGreater(peak_cpu['spinner'], 50)
+            self.assertLess(peak_cpu['sleeper'], 50)
+            self.assertEqual(bench.bottleneck_role(), 'spinner')
+            self.assertEqual(
+                list(bench.resource_columns().keys()),
+                ['bottleneck_role', 'peak_cpu.sleeper', 'peak_cpu.spinner'])
+
+            resources = pd.read_csv(bench.abspath('resources.csv'))
+            self.assertEqual(list(resources.columns), [
+                'time', 'host', 'pid', 'label', 'cpu_percent', 'rss_mb',
+                'voluntary_ctxt_switches_per_s',
+                'involuntary_ctxt_switches_per_s'
+            ])
+            self.assertEqual(set(resources['label']),
+                             {'spinner_0', 'sleeper_0'})
+            host_resources = pd.read_csv(bench.abspath('host_resources.csv'))
+            self.assertGreater(len(host_resources), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
 from .. import perf_util
@@ -16,8 +18,6 @@ import datetime
 import itertools
 import os
 import pandas as pd
-import paramiko
-import time
 import tqdm
 import yaml
 
@@ -106,6 +106,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload_label: str
@@ -142,6 +144,15 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    server_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    aggregator_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proxy_replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 class ScalogOutput(NamedTuple):
     output: benchmark.RecorderOutput
@@ -154,6 +165,7 @@ Output = ScalogOutput
 class ScalogNet:
     def __init__(self, cluster: cluster.Cluster, input: Input) -> None:
         self._cluster = cluster.f(input.f)
+        self._port_base = cluster.port_base
         self._input = input
 
     class Placement(NamedTuple):
@@ -167,7 +179,7 @@ class ScalogNet:
         proxy_replicas: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(h: host.Host) -> host.Endpoint:
             return host.Endpoint(h, next(ports))
@@ -258,33 +270,22 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                                                        self._connect)
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self.args()['identity_file']:
-            client.connect(address, key_filename=self.args()['identity_file'])
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
 
     def run_benchmark(self,
                       bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: Input) -> Output:
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
 
         # Write config file.
-        net = ScalogNet(self._cluster, input)
+        net = ScalogNet(self._cluster.pool(args), input)
         config = net.config()
         config_filename = bench.abspath('config.pbtxt')
         bench.write_string(config_filename,
@@ -297,13 +298,19 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
         # before `x`, so that the message is sent properly. This is not
         # absolutely necessary, but helps make sure things run smoothly.
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch acceptors.
         acceptor_procs: List[proc.Proc] = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            p = bench.popen(
+            p = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=java(input.acceptor_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.scalog.AcceptorMain',
@@ -318,20 +325,19 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                     '--prometheus_port',
                     str(acceptor.port + 1) if input.monitored else '-1',
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                           f'acceptor_{i}')
             acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch proxy_replicas.
         proxy_replica_procs: List[proc.Proc] = []
         for (i, proxy_replica) in enumerate(net.placement().proxy_replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proxy_replica.host,
                 label=f'proxy_replica_{i}',
-                cmd=java(input.proxy_replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'proxy_replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.scalog.ProxyReplicaMain',
@@ -350,20 +356,19 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                     '--options.batchFlush',
                     str(input.proxy_replica_options.batch_flush),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proxy_replica.host, p,
-                                           f'proxy_replica_{i}')
             proxy_replica_procs.append(p)
+        launcher.barrier()
         bench.log('ProxyReplicas started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java(input.replica_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.scalog.ReplicaMain',
@@ -396,18 +401,17 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                     '--options.unsafeRoundRobinByChunk',
                     str(input.replica_options.unsafe_round_robin_by_chunk),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch aggregator.
         aggregator_proc: proc.Proc = bench.popen(
             host=net.placement().aggregator.host,
             label=f'aggregator',
-            cmd=java(input.aggregator_jvm_heap_size) + [
+            cmd=jvm_util.java(input, 'aggregator') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.scalog.AggregatorMain',
@@ -437,7 +441,7 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
             ],
         )
         if input.profiled:
-            aggregator_proc = perf_util.JavaPerfProc(
+            aggregator_proc = perf_util.profile(
                 bench, net.placement().aggregator.host, aggregator_proc,
                 f'aggregator')
         bench.log('Aggregator started.')
@@ -445,10 +449,10 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java(input.leader_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.scalog.LeaderMain',
@@ -479,20 +483,20 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.leader_options.election_options.
                                  no_ping_timeout_max.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p, f'leader_{i}')
             leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch servers.
         server_procs: List[proc.Proc] = []
         for (shard_index, shard) in enumerate(net.placement().servers):
             for (i, server) in enumerate(shard):
-                p = bench.popen(
+                p = launcher.popen(
                     host=server.host,
                     label=f'server_{shard_index}_{i}',
-                    cmd=java(input.server_jvm_heap_size) + [
+                    cmd=jvm_util.java(input, 'server') + [
                         '-cp',
                         os.path.abspath(args['jar']),
                         'frankenpaxos.scalog.ServerMain',
@@ -523,11 +527,10 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                         '--options.unsafeDontRecover',
                         str(input.server_options.unsafe_dont_recover),
                     ],
+                    profiled=input.profiled,
                 )
-                if input.profiled:
-                    p = perf_util.JavaPerfProc(bench, server.host, p,
-                                               f'server_{shard_index}_{i}')
                 server_procs.append(p)
+        launcher.barrier()
         bench.log('Servers started.')
 
         # Launch Prometheus.
@@ -576,9 +579,9 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -588,10 +591,10 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.scalog.ClientMain',
@@ -625,30 +628,41 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
                     f'{input.num_clients_per_proc}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--workload',
                     f'{workload_filename}',
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (server_procs + [aggregator_proc] + leader_procs +
-                  acceptor_procs + replica_procs + proxy_replica_procs):
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'servers': server_procs,
+                                   'aggregator': [aggregator_proc],
+                                   'leaders': leader_procs,
+                                   'acceptors': acceptor_procs,
+                                   'replicas': replica_procs,
+                                   'proxy_replicas': proxy_replica_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(server_procs + [aggregator_proc] + leader_procs +
+                      acceptor_procs + replica_procs + proxy_replica_procs)
         if input.monitored:
             prometheus_server.kill()
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
 
@@ -656,6 +670,8 @@ class ScalogSuite(benchmark.Suite[Input, Output]):
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)['write']
         return ScalogOutput(output = output)
 
@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -18,9 +19,7 @@ import enum
 import itertools
 import os
 import pandas as pd
-import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -97,6 +96,8 @@ class Input(NamedTuple):
     warmup_sleep: datetime.timedelta
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -133,29 +134,39 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    dep_service_node_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    replica_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    garbage_collector_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    proposer_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
 
 # Networks #####################################################################
 class SimpleGcBPaxosNet:
-    def __init__(self, cluster_file: str, key_filename: Optional[str],
-                 input: Input) -> None:
+    def __init__(self,
+                 cluster_file: str,
+                 key_filename: Optional[str],
+                 input: Input,
+                 args: Optional[Dict[Any, Any]] = None) -> None:
         self._key_filename = key_filename
+        self._local = (args or {}).get('local', False)
         # It's important that we initialize the cluster after we set
-        # _key_filename since _connect reads _key_filename.
-        self._cluster = (cluster.Cluster.from_json_file(
-            cluster_file, self._connect).f(input.f))
+        # _key_filename and _local since _connect reads them. If the suite is
+        # run on multiple pools, `args` tells us which pool we were assigned.
+        pool = cluster.Cluster.from_json_file(cluster_file,
+                                              self._connect).pool(args or {})
+        self._cluster = pool.f(input.f)
+        self._port_base = pool.port_base
         self._input = input
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        if self._key_filename:
-            client.connect(address, key_filename=self._key_filename)
-        else:
-            client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address, self._key_filename, self._local)
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
@@ -167,7 +178,7 @@ class SimpleGcBPaxosNet:
         garbage_collectors: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -231,7 +242,8 @@ class SimpleGcBPaxosNet:
 class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = SimpleGcBPaxosNet(args['cluster'], args['identity_file'], input)
+        net = SimpleGcBPaxosNet(args['cluster'], args['identity_file'], input,
+                                args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -244,30 +256,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        # If we're monitoring the code, run garbage collection verbosely.
-        java = ['java']
-        if input.monitored:
-            java += [
-                '-verbose:gc',
-                '-XX:-PrintGC',
-                '-XX:+PrintHeapAtGC',
-                '-XX:+PrintGCDetails',
-                '-XX:+PrintGCTimeStamps',
-                '-XX:+PrintGCDateStamps',
-            ]
-        # Increase the heap size.
-        # TODO(mwhittaker): Right now, not much thought has been put into the
-        # heap size. Think more carefully about this. We may want, for example,
-        # to increase the size of the young generation.
-        java += [f'-Xms{input.jvm_heap_size}', f'-Xmx{input.jvm_heap_size}']
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
 
         # Launch dep service nodes.
         dep_service_node_procs: List[proc.Proc] = []
         for (i, dep) in enumerate(net.placement().dep_service_nodes):
-            p = bench.popen(
+            p = launcher.popen(
                 host=dep.host,
                 label=f'dep_service_node_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'dep_service_node') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.DepServiceNodeMain',
@@ -294,20 +295,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.measureLatencies',
                     str(input.dep_service_node_options.measure_latencies),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, dep.host, p,
-                                           f'dep_service_node_{i}')
             dep_service_node_procs.append(p)
+        launcher.barrier()
         bench.log('DepServiceNodes started.')
 
         # Launch acceptors.
         acceptor_procs: List[proc.Proc] = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            p = bench.popen(
+            p = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.AcceptorMain',
@@ -326,20 +326,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     '--options.measureLatencies',
                     str(input.acceptor_options.measure_latencies),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, acceptor.host, p,
-                                           f'acceptor_{i}')
             acceptor_procs.append(p)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch replicas.
         replica_procs: List[proc.Proc] = []
         for (i, replica) in enumerate(net.placement().replicas):
-            p = bench.popen(
+            p = launcher.popen(
                 host=replica.host,
                 label=f'replica_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'replica') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.ReplicaMain',
@@ -389,20 +388,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     str(input.replica_zigzag_options.
                         garbage_collect_every_n_commands),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, replica.host, p,
-                                           f'replica_{i}')
             replica_procs.append(p)
+        launcher.barrier()
         bench.log('Replicas started.')
 
         # Launch garbage collectors.
         garbage_collector_procs: List[proc.Proc] = []
         for (i, collector) in enumerate(net.placement().garbage_collectors):
-            p = bench.popen(
+            p = launcher.popen(
                 host=collector.host,
                 label=f'garbage_collector_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'garbage_collector') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.GarbageCollectorMain',
@@ -417,20 +415,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     '--prometheus_port',
                     str(collector.port + 1) if input.monitored else '-1',
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, collector.host, p,
-                                           f'garbage_collector_{i}')
             garbage_collector_procs.append(p)
+        launcher.barrier()
         bench.log('GarbageCollectors started.')
 
         # Launch proposers.
         proposer_procs: List[proc.Proc] = []
         for (i, proposer) in enumerate(net.placement().proposers):
-            p = bench.popen(
+            p = launcher.popen(
                 host=proposer.host,
                 label=f'proposer_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'proposer') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.ProposerMain',
@@ -453,20 +450,19 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     '{}s'.format(input.proposer_options.
                                  resend_phase2as_timer_period.total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, proposer.host, p,
-                                           f'proposer_{i}')
             proposer_procs.append(p)
+        launcher.barrier()
         bench.log('Proposers started.')
 
         # Launch leaders.
         leader_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            p = bench.popen(
+            p = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=java + [
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.LeaderMain',
@@ -487,10 +483,10 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                                  resend_dependency_requests_timer_period.
                                  total_seconds()),
                 ],
+                profiled=input.profiled,
             )
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p, f'leader_{i}')
             leader_procs.append(p)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch Prometheus.
@@ -538,9 +534,9 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -550,14 +546,13 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=[
-                    'java',
+                cmd=jvm_util.client_java(input) + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.simplegcbpaxos.BenchmarkClientMain',
@@ -591,31 +586,48 @@ class SimpleGcBPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.reproposePeriod',
                     '{}s'.format(
                         input.client_options.repropose_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in (leader_procs + proposer_procs + acceptor_procs +
-                  dep_service_node_procs + replica_procs +
-                  garbage_collector_procs):
-            p.kill()
+        bench.wait_for_clients(
+            client_procs,
+            roles={
+                'leaders': leader_procs,
+                'proposers': proposer_procs,
+                'acceptors': acceptor_procs,
+                'dep_service_nodes': dep_service_node_procs,
+                'replicas': replica_procs,
+                'garbage_collectors': garbage_collector_procs,
+            },
+            stall_timeout=args.get('stall_timeout'))
+        launcher.kill(leader_procs + proposer_procs + acceptor_procs +
+                      dep_service_node_procs + replica_procs +
+                      garbage_collector_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
-            bench, client_csvs, drop_prefix=datetime.timedelta(seconds=0))
+            bench,
+            client_csvs,
+            drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
+            columnar=args.get('columnar', False))
 
 
 def get_parser() -> argparse.ArgumentParser:
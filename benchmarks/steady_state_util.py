@@ -0,0 +1,125 @@
+from typing import NamedTuple, Optional
+import numpy as np
+
+# When a benchmark starts, the JVMs are still warming up (classes are loading,
+# the JIT hasn't compiled the hot paths yet), so throughput is low and latency
+# is high. When a benchmark ends, clients stop one by one and throughput
+# drains. Neither is representative of the protocol, so we only summarize the
+# steady state in between.
+#
+# We find the steady state using the per-second throughput and latency series.
+# The steady state level of a series is its median, and its noise is its
+# median absolute deviation (MAD), both of which are barely affected by the
+# transients at either end. A second is in the steady state if it is within
+# `num_deviations` MADs (scaled to standard deviations) or `tolerance` percent
+# of the level, whichever is looser. We trim the seconds before the first
+# steady second and after the last one, in both series.
+#
+# We looked at the Marginal Standard Error Rule (MSER), which is the standard
+# way to truncate the warm-up of a simulation, but on series as short as ours
+# (tens of seconds), it often truncates half the series because of noise.
+
+
+# A Window is the steady state window of a benchmark. start_ns and stop_ns are
+# nanoseconds since the epoch. Measurements that start in [start_ns, stop_ns)
+# are in the steady state.
+class Window(NamedTuple):
+    start_ns: int
+    stop_ns: int
+
+
+# Every series is summarized with windows this long.
+BIN_NS = 10**9
+
+
+class Bins:
+    """
+    Bins accumulates the per-second throughput and mean latency of a stream of
+    measurements, all of which start at or after origin_ns. A grouped
+    measurement (see frankenpaxos.BenchmarkUtil.LabeledRecorder) with count c
+    and mean latency l counts as c measurements of latency l.
+    """
+    def __init__(self, origin_ns: int) -> None:
+        self.origin_ns = origin_ns
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._latency_sums = np.zeros(0, dtype=np.float64)
+
+    def add(self,
+            start_ns: np.ndarray,
+            latency_nanos: np.ndarray,
+            count: Optional[np.ndarray] = None) -> None:
+        if len(start_ns) == 0:
+            return
+        if count is None:
+            count = np.ones(len(start_ns), dtype=np.int64)
+        bins = (np.asarray(start_ns, dtype=np.int64) - self.origin_ns) // BIN_NS
+        n = max(len(self._counts), int(bins.max()) + 1)
+        counts = np.bincount(bins, weights=count, minlength=n)
+        latency_sums = np.bincount(bins,
+                                   weights=latency_nanos * count,
+                                   minlength=n)
+        self._counts = np.pad(self._counts, (0, n - len(self._counts)))
+        self._latency_sums = np.pad(self._latency_sums,
+                                    (0, n - len(self._latency_sums)))
+        self._counts += counts.astype(np.int64)
+        self._latency_sums += latency_sums
+
+    def throughput(self) -> np.ndarray:
+        """throughput returns the number of measurements per second."""
+        return self._counts * (1e9 / BIN_NS)
+
+    def latency(self) -> np.ndarray:
+        """
+        latency returns the mean latency of every second. Seconds without
+        measurements are filled in with the latency of the previous one.
+        """
+        latency = np.full(len(self._counts), np.nan)
+        nonempty = self._counts > 0
+        latency[nonempty] = (self._latency_sums[nonempty] /
+                             self._counts[nonempty])
+        # Forward fill, so that an empty second doesn't look like a transient.
+        indices = np.where(nonempty, np.arange(len(latency)), 0)
+        np.maximum.accumulate(indices, out=indices)
+        return latency[indices]
+
+
+def transient_length(xs: np.ndarray,
+                     num_deviations: float = 3,
+                     tolerance: float = 0.05,
+                     max_fraction: float = 0.5) -> int:
+    """
+    transient_length returns the number of leading points of `xs` that are not
+    yet in the steady state, at most `max_fraction` of them. See above.
+    """
+    n = len(xs)
+    if n < 4:
+        return 0
+    level = np.median(xs)
+    # 1.4826 scales the MAD of normally distributed data to its standard
+    # deviation.
+    noise = 1.4826 * np.median(np.abs(xs - level))
+    band = max(num_deviations * noise, tolerance * abs(level))
+    steady = np.abs(xs - level) <= band
+    d = int(np.argmax(steady)) if steady.any() else n
+    return min(d, int(n * max_fraction))
+
+
+def detect(bins: Bins) -> Window:
+    """
+    detect returns the steady state window of the measurements in `bins`. The
+    first and last seconds are always excluded since they're only partially
+    covered by measurements.
+    """
+    throughput = bins.throughput()
+    latency = bins.latency()
+    n = len(throughput)
+    if n < 4:
+        return Window(bins.origin_ns, bins.origin_ns + n * BIN_NS)
+
+    # Drop the partial first and last seconds. Then, trim the warm-up from the
+    # start and the drain from the end.
+    lo = 1 + max(transient_length(throughput[1:-1]),
+                 transient_length(latency[1:-1]))
+    hi = n - 1 - max(transient_length(throughput[lo:-1][::-1]),
+                     transient_length(latency[lo:-1][::-1]))
+    return Window(bins.origin_ns + lo * BIN_NS, bins.origin_ns + hi * BIN_NS)
@@ -0,0 +1,66 @@
+from . import steady_state_util
+import numpy as np
+import unittest
+
+
+class SteadyStateTest(unittest.TestCase):
+    def test_transient_length(self):
+        rng = np.random.default_rng(0)
+        xs = np.concatenate([np.linspace(0, 900, 10), rng.normal(1000, 10, 50)])
+        self.assertEqual(steady_state_util.transient_length(xs), 10)
+
+        # A series that's steady from the start isn't truncated.
+        self.assertEqual(
+            steady_state_util.transient_length(rng.normal(1000, 10, 60)), 0)
+
+    def _bins(self, throughput: np.ndarray,
+              latency_ms: np.ndarray) -> steady_state_util.Bins:
+        origin = 10**18
+        starts = []
+        latencies = []
+        for (second, (n, l)) in enumerate(zip(throughput, latency_ms)):
+            starts.append(origin + second * 10**9 +
+                          np.linspace(0, 10**9 - 1, int(n)).astype(np.int64))
+            latencies.append(np.full(int(n), l * 1e6))
+        bins = steady_state_util.Bins(origin)
+        bins.add(np.concatenate(starts), np.concatenate(latencies))
+        return bins
+
+    def test_detect(self):
+        rng = np.random.default_rng(1)
+        # 5 seconds of warm-up, 40 seconds of steady state, and 3 seconds of
+        # drain.
+        throughput = np.concatenate([
+            [100, 300, 500, 700, 900],
+            rng.normal(1000, 20, 40),
+            [600, 300, 100],
+        ])
+        latency = np.concatenate([
+            [10, 8, 6, 4, 2],
+            rng.normal(1, 0.05, 40),
+            [1, 1, 1],
+        ])
+        bins = self._bins(throughput, latency)
+        np.testing.assert_allclose(bins.throughput(), throughput.astype(int))
+        np.testing.assert_allclose(bins.latency() / 1e6, latency)
+
+        window = steady_state_util.detect(bins)
+        self.assertEqual(window.start_ns, bins.origin_ns + 5 * 10**9)
+        self.assertEqual(window.stop_ns, bins.origin_ns + 45 * 10**9)
+
+    def test_grouped(self):
+        bins = steady_state_util.Bins(0)
+        bins.add(np.array([0, 10**9, 10**9 + 1]), np.array([10, 20, 40]),
+                 np.array([1, 1, 3]))
+        np.testing.assert_allclose(bins.throughput(), [1, 4])
+        np.testing.assert_allclose(bins.latency(), [10, 35])
+
+    def test_short(self):
+        bins = steady_state_util.Bins(0)
+        bins.add(np.array([0, 10**9]), np.array([1, 1]))
+        self.assertEqual(steady_state_util.detect(bins),
+                         steady_state_util.Window(0, 2 * 10**9))
+
+
+if __name__ == '__main__':
+    unittest.main()
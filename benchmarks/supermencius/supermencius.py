@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -22,7 +23,6 @@ import os
 import pandas as pd
 import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -32,7 +32,10 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: mencius.Input) -> mencius.Output:
-        net = mencius.MenciusNet(args['cluster'], args['identity_file'], input)
+        net = mencius.MenciusNet(cluster_file=args['cluster'],
+                                 key_filename=args['identity_file'],
+                                 input=input,
+                                 args=args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -45,24 +48,20 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        # If we're monitoring the code, run garbage collection verbosely.
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            # Super node i runs every role with index i, on leader i's host.
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    [(f'super_node_{i}', leaders[0])
+                     for (i, leaders) in enumerate(net.placement().leaders)] +
+                    [(f'client_{i}', client)
+                     for (i, client) in enumerate(net.placement().clients)]))
 
         # Launch super nodes.
         super_node_procs: List[proc.Proc] = []
         for (i, leaders) in enumerate(net.placement().leaders):
-            cmd = java(input.leader_jvm_heap_size) + [
+            cmd = jvm_util.java(input, 'leader') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.mencius.SuperNodeMain',
@@ -131,13 +130,12 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
                     str(input.batcher_options.batch_size),
                 ]
 
-            p = bench.popen(host=leaders[0].host,
-                            label=f'super_node_{i}',
-                            cmd=cmd)
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leaders[0].host, p,
-                                           f'super_node_{i}')
+            p = launcher.popen(host=leaders[0].host,
+                               label=f'super_node_{i}',
+                               cmd=cmd,
+                               profiled=input.profiled)
             super_node_procs.append(p)
+        launcher.barrier()
         bench.log('SuperNodes started.')
 
         # Launch Prometheus.
@@ -189,9 +187,10 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the super nodes to start serving. If they don't, the
+        # benchmark is aborted. Every leader is run by some super node.
+        bench.wait_until_ready(
+            benchmark.placement_endpoints(net.placement(), roles=['leaders']))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -201,13 +200,13 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=java(input.client_jvm_heap_size) + [
+                cmd=jvm_util.java(input, 'client') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.mencius.ClientMain',
@@ -241,31 +240,39 @@ class SuperMenciusSuite(benchmark.Suite[mencius.Input, mencius.Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in super_node_procs:
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'super_nodes': super_node_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(super_node_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
             bench,
             client_csvs,
             drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False),
             save_data=False)
 
 
@@ -1,9 +1,10 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
-from .. import perf_util
 from .. import proc
 from .. import prometheus
 from .. import proto_util
@@ -22,7 +23,6 @@ import os
 import pandas as pd
 import paramiko
 import subprocess
-import time
 import tqdm
 import yaml
 
@@ -30,11 +30,29 @@ import yaml
 # Suite ########################################################################
 class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
                           ):
+    def __init__(self) -> None:
+        super().__init__()
+        self._cluster = cluster.Cluster.from_json_file(self.args()['cluster'],
+                                                       self._connect)
+
+    def _connect(self, address: str) -> host.Host:
+        return host.connect(address,
+                            self.args()['identity_file'],
+                            local=self.args().get('local', False))
+
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any],
                       input: multipaxos.Input) -> multipaxos.Output:
-        net = multipaxos.MultiPaxosNet(args['cluster'], args['identity_file'],
-                                       input)
+        # Binary records can't be grouped (see BenchmarkUtil.BinaryRecorder),
+        # so the clients would refuse to start.
+        if args.get('binary_recorder') and input.measurement_group_size > 1:
+            raise ValueError('binary_recorder requires a '
+                             'measurement_group_size of 1.')
+
+        optimize_placement = args.get('optimize_placement', False)
+        net = multipaxos.MultiPaxosNet(cluster=self._cluster.pool(args),
+                                       input=input,
+                                       optimize_placement=optimize_placement)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -47,19 +65,6 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
                            proto_util.message_to_pbtext(config))
         bench.log('Config file config.pbtxt written.')
 
-        def java(heap_size: str) -> List[str]:
-            cmd = ['java', f'-Xms{heap_size}', f'-Xmx{heap_size}']
-            if input.monitored:
-                cmd += [
-                    '-verbose:gc',
-                    '-XX:-PrintGC',
-                    '-XX:+PrintHeapAtGC',
-                    '-XX:+PrintGCDetails',
-                    '-XX:+PrintGCTimeStamps',
-                    '-XX:+PrintGCDateStamps',
-                ]
-            return cmd
-
         # Launch super nodes.
         assert (len(net.placement().batchers) == 0 or
                 len(net.placement().leaders) == len(net.placement().batchers))
@@ -71,9 +76,19 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
         assert len(net.placement().leaders) == len(
             net.placement().proxy_replicas)
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            # Super node i runs every role with index i, on leader i's host.
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    [(f'super_node_{i}', leader)
+                     for (i, leader) in enumerate(net.placement().leaders)] +
+                    [(f'client_{i}', client)
+                     for (i, client) in enumerate(net.placement().clients)]))
+
         super_node_procs: List[proc.Proc] = []
         for (i, leader) in enumerate(net.placement().leaders):
-            cmd = java(input.leader_jvm_heap_size) + [
+            cmd = jvm_util.java(input, 'leader') + [
                 '-cp',
                 os.path.abspath(args['jar']),
                 'frankenpaxos.multipaxos.SuperNodeMain',
@@ -138,11 +153,12 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
                     str(input.batcher_options.batch_size),
                 ]
 
-            p = bench.popen(host=leader.host, label=f'super_node_{i}', cmd=cmd)
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, leader.host, p,
-                                           f'super_node_{i}')
+            p = launcher.popen(host=leader.host,
+                               label=f'super_node_{i}',
+                               cmd=cmd,
+                               profiled=input.profiled)
             super_node_procs.append(p)
+        launcher.barrier()
         bench.log('SuperNodes started.')
 
         # Launch Prometheus.
@@ -192,9 +208,9 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -204,14 +220,13 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
 
         client_procs: List[proc.Proc] = []
         for (i, client) in enumerate(net.placement().clients):
-            p = bench.popen(
+            p = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
                 # TODO(mwhittaker): For now, we don't run clients with large
                 # heaps and verbose garbage collection because they are all
                 # colocated on one machine.
-                cmd=[
-                    'java',
+                cmd=jvm_util.client_java(input) + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.multipaxos.ClientMain',
@@ -245,29 +260,39 @@ class SuperMultiPaxosSuite(benchmark.Suite[multipaxos.Input, multipaxos.Output]
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.resendClientRequestPeriod',
                     '{}s'.format(input.client_options.
                                  resend_client_request_period.total_seconds()),
-                ])
-            if input.profiled:
-                p = perf_util.JavaPerfProc(bench, client.host, p, f'client_{i}')
+                ],
+                profiled=input.profiled)
             client_procs.append(p)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for p in client_procs:
-            p.wait()
-        for p in super_node_procs:
-            p.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'super_nodes': super_node_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(super_node_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         return benchmark.parse_recorder_data(
-            bench, client_csvs, drop_prefix=datetime.timedelta(seconds=0))
+            bench,
+            client_csvs,
+            drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False))
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -1,6 +1,8 @@
 from .. import benchmark
 from .. import cluster
 from .. import host
+from .. import jvm_util
+from .. import launch_util
 from .. import parser_util
 from .. import pd_util
 from .. import prometheus
@@ -15,8 +17,6 @@ import datetime
 import enum
 import itertools
 import os
-import paramiko
-import time
 import yaml
 
 # Input/Output #################################################################
@@ -56,6 +56,8 @@ class Input(NamedTuple):
     # Benchmark parameters. ####################################################
     duration: datetime.timedelta
     timeout: datetime.timedelta
+    # Unused. Clients start once the servers are ready (see
+    # BenchmarkDirectory.wait_until_ready).
     client_lag: datetime.timedelta
     state_machine: str
     workload: Workload
@@ -80,26 +82,36 @@ class Input(NamedTuple):
     client_options: ClientOptions
     client_log_level: str
 
+    # JVM options. #############################################################
+    leader_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    acceptor_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    dep_service_node_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+    client_jvm_options: jvm_util.JvmOptions = jvm_util.JvmOptions()
+
 
 Output = benchmark.RecorderOutput
 
 
 # Networks #####################################################################
 class UnanimousBPaxosNet:
-    def __init__(self, cluster_file: str, key_filename: Optional[str],
-                 input: Input) -> None:
+    def __init__(self,
+                 cluster_file: str,
+                 key_filename: Optional[str],
+                 input: Input,
+                 args: Optional[Dict[Any, Any]] = None) -> None:
         self._key_filename = key_filename
+        self._local = (args or {}).get('local', False)
         # It's important that we initialize the cluster after we set
-        # _key_filename since _connect reads _key_filename.
-        self._cluster = (cluster.Cluster.from_json_file(
-            cluster_file, self._connect).f(input.f))
+        # _key_filename and _local since _connect reads them. If the suite is
+        # run on multiple pools, `args` tells us which pool we were assigned.
+        pool = cluster.Cluster.from_json_file(cluster_file,
+                                              self._connect).pool(args or {})
+        self._cluster = pool.f(input.f)
+        self._port_base = pool.port_base
         self._input = input
 
     def _connect(self, address: str) -> host.Host:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.client.AutoAddPolicy)
-        client.connect(address)
-        return host.RemoteHost(client)
+        return host.connect(address, local=self._local)
 
     class Placement(NamedTuple):
         clients: List[host.Endpoint]
@@ -108,7 +120,7 @@ class UnanimousBPaxosNet:
         acceptors: List[host.Endpoint]
 
     def placement(self) -> Placement:
-        ports = itertools.count(10000, 100)
+        ports = itertools.count(self._port_base, 100)
 
         def portify(hosts: List[host.Host]) -> List[host.Endpoint]:
             return [host.Endpoint(h, next(ports)) for h in hosts]
@@ -153,7 +165,8 @@ class UnanimousBPaxosNet:
 class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
     def run_benchmark(self, bench: benchmark.BenchmarkDirectory,
                       args: Dict[Any, Any], input: Input) -> Output:
-        net = UnanimousBPaxosNet(args['cluster'], args['identity_file'], input)
+        net = UnanimousBPaxosNet(args['cluster'], args['identity_file'], input,
+                                 args)
         return self._run_benchmark(bench, args, input, net)
 
     def _run_benchmark(self, bench: benchmark.BenchmarkDirectory,
@@ -165,14 +178,19 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
                            proto_util.message_to_pbtext(net.config()))
         bench.log('Config file config.pbtxt written.')
 
+        launcher = launch_util.Launcher(bench)
+        if args.get('pin_cpus'):
+            bench.pin_cpus(
+                benchmark.assign_cpus(
+                    benchmark.placement_labels(net.placement())))
+
         # Launch leaders.
         leader_procs = []
         for (i, leader) in enumerate(net.placement().leaders):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=leader.host,
                 label=f'leader_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.java(input, 'leader') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.unanimousbpaxos.LeaderMain',
@@ -211,16 +229,16 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             leader_procs.append(proc)
+        launcher.barrier()
         bench.log('Leaders started.')
 
         # Launch acceptors.
         acceptor_procs = []
         for (i, acceptor) in enumerate(net.placement().acceptors):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=acceptor.host,
                 label=f'acceptor_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.java(input, 'acceptor') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.unanimousbpaxos.AcceptorMain',
@@ -237,16 +255,16 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             acceptor_procs.append(proc)
+        launcher.barrier()
         bench.log('Acceptors started.')
 
         # Launch dep service nodes.
         dep_service_node_procs = []
         for (i, dep) in enumerate(net.placement().dep_service_nodes):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=dep.host,
                 label=f'dep_service_node_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.java(input, 'dep_service_node') + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.unanimousbpaxos.DepServiceNodeMain',
@@ -265,6 +283,7 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
                 ],
             )
             dep_service_node_procs.append(proc)
+        launcher.barrier()
         bench.log('DepServiceNodes started.')
 
         # Launch Prometheus.
@@ -300,9 +319,9 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
             )
             bench.log('Prometheus started.')
 
-        # Lag clients.
-        time.sleep(input.client_lag.total_seconds())
-        bench.log('Client lag ended.')
+        # Wait for the servers to start serving. If they don't, the benchmark
+        # is aborted.
+        bench.wait_until_ready(benchmark.placement_endpoints(net.placement()))
 
         # Launch clients.
         workload_filename = bench.abspath('workload.pbtxt')
@@ -312,11 +331,10 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
 
         client_procs = []
         for (i, client) in enumerate(net.placement().clients):
-            proc = bench.popen(
+            proc = launcher.popen(
                 host=client.host,
                 label=f'client_{i}',
-                cmd=[
-                    'java',
+                cmd=jvm_util.client_java(input) + [
                     '-cp',
                     os.path.abspath(args['jar']),
                     'frankenpaxos.unanimousbpaxos.BenchmarkClientMain',
@@ -342,28 +360,41 @@ class UnanimousBPaxosSuite(benchmark.Suite[Input, Output]):
                     f'{workload_filename}',
                     '--output_file_prefix',
                     bench.abspath(f'client_{i}'),
+                    '--binary_recorder',
+                    str(args.get('binary_recorder', False)).lower(),
                     '--options.reproposePeriod',
                     '{}s'.format(
                         input.client_options.repropose_period.total_seconds()),
                 ])
             client_procs.append(proc)
+        launcher.barrier()
         bench.log(f'Clients started and running for {input.duration}.')
 
         # Wait for clients to finish and then terminate leaders and acceptors.
-        for proc in client_procs:
-            proc.wait()
-        for proc in leader_procs + acceptor_procs + dep_service_node_procs:
-            proc.kill()
+        bench.wait_for_clients(client_procs,
+                               roles={
+                                   'leaders': leader_procs,
+                                   'acceptors': acceptor_procs,
+                                   'dep_service_nodes': dep_service_node_procs,
+                               },
+                               stall_timeout=args.get('stall_timeout'))
+        launcher.kill(leader_procs + acceptor_procs + dep_service_node_procs)
         bench.log('Clients finished and processes terminated.')
 
-        # Client i writes results to `client_i_data.csv`.
+        # Client i writes results to `client_i_data.csv`, or to
+        # `client_i_data.bin` if it uses a binary recorder.
+        extension = 'bin' if args.get('binary_recorder') else 'csv'
         client_csvs = [
-            bench.abspath(f'client_{i}_data.csv')
+            bench.abspath(f'client_{i}_data.{extension}')
             for i in range(input.num_client_procs)
         ]
         # TODO(mwhittaker): Add warmup.
         return benchmark.parse_recorder_data(
-            bench, client_csvs, drop_prefix=datetime.timedelta(seconds=0))
+            bench,
+            client_csvs,
+            drop_prefix=datetime.timedelta(seconds=0),
+            steady_state=not args.get('keep_transients', False),
+            streaming=args.get('streaming', False))
 
 
 def get_parser() -> argparse.ArgumentParser:
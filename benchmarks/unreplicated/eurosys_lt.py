@@ -18,7 +18,7 @@ def main(args) -> None:
                     warmup_sleep=datetime.timedelta(seconds=5),
                     duration=datetime.timedelta(seconds=8),
                     timeout=datetime.timedelta(seconds=13),
-                    client_lag=datetime.timedelta(seconds=5),
+                    client_lag=datetime.timedelta(seconds=0),
                     state_machine='Noop',
                     workload=workload.StringWorkload(size_mean=1, size_std=0),
                     profiled=args.profile,
@@ -3,6 +3,7 @@ from . import pd_util
 from typing import Any, Dict, List, NamedTuple, Tuple
 import os
 import subprocess
+import typing
 
 
 def flatten_tuple_fields(t: Any, prefixes=None) -> List[str]:
@@ -27,6 +28,26 @@ def flatten_tuple_fields(t: Any, prefixes=None) -> List[str]:
     return _flatten_tuple_fields(t, [])
 
 
+def flatten_type_fields(t: type) -> List[str]:
+    """
+    flatten_type_fields is like flatten_tuple_fields, but it takes in a
+    potentially nested named tuple type instead of a named tuple. With A and B
+    as above, `flatten_type_fields(B)` is `['z', 'a1.x', 'a1.y', 'a2.x',
+    'a2.y']`.
+    """
+    # A plain type has no _fields as far as mypy knows, so we use getattr.
+    fields: List[str] = []
+    annotations = typing.get_type_hints(t)
+    for field in getattr(t, '_fields'):
+        if _is_namedtuple_type(annotations.get(field)):
+            fields += [
+                f'{field}.{f}' for f in flatten_type_fields(annotations[field])
+            ]
+        else:
+            fields.append(field)
+    return fields
+
+
 def flatten_tuple(t: Any) -> List[Any]:
     """
     flatten_tuple recursively flattens a nested tuple.
@@ -76,11 +97,18 @@ def tuple_to_dict(t: Any) -> Dict[str, Any]:
 
 # See https://stackoverflow.com/a/2166841/3187068.
 def _is_namedtuple_instance(x):
-    b = type(x).__bases__
+    return _is_namedtuple_type(type(x))
+
+
+def _is_namedtuple_type(t):
+    if not isinstance(t, type):
+        return False
+
+    b = t.__bases__
     if len(b) != 1 or b[0] != tuple:
         return False
 
-    f = getattr(type(x), '_fields', None)
+    f = getattr(t, '_fields', None)
     if not isinstance(f, tuple):
         return False
 
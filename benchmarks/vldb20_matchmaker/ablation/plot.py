@@ -20,7 +20,7 @@ def read_data(file,
               drop_head: float,
               drop_tail: float) -> Tuple[pd.DataFrame, Any]:
     # Read the data.
-    df = pd.read_csv(file, parse_dates=['start', 'stop'])
+    df = pd_util.read_recorder_data(file, columns=['start', 'latency_nanos'])
 
     # Chop off the head and tail.
     start_time = df['start'].iloc[0]
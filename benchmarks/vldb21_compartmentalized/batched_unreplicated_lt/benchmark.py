@@ -24,7 +24,7 @@ def main(args) -> None:
                     warmup_sleep=datetime.timedelta(seconds=5),
                     duration=datetime.timedelta(seconds=15),
                     timeout=datetime.timedelta(seconds=20),
-                    client_lag=datetime.timedelta(seconds=5),
+                    client_lag=datetime.timedelta(seconds=0),
                     state_machine='KeyValueStore',
                     workload = workload.UniformSingleKeyWorkload(
                         num_keys=1,
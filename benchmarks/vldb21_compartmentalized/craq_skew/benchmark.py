@@ -22,7 +22,7 @@ def main(args) -> None:
                     warmup_sleep = datetime.timedelta(seconds=5),
                     duration = datetime.timedelta(seconds=15),
                     timeout = datetime.timedelta(seconds=20),
-                    client_lag = datetime.timedelta(seconds=5),
+                    client_lag = datetime.timedelta(seconds=0),
                     workload_label = workload_label,
                     workload = read_write_workload.PointSkewedReadWriteWorkload(
                         num_keys=num_keys,
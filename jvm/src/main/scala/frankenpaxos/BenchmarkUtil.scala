@@ -1,6 +1,11 @@
 package frankenpaxos
 
 import com.github.tototoshi.csv.CSVWriter
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.nio.channels.FileChannel
+import java.nio.charset.StandardCharsets
+import java.nio.file.StandardOpenOption
 import scala.collection.mutable
 import scala.concurrent.ExecutionContext
 import scala.concurrent.Future
@@ -65,15 +70,29 @@ object BenchmarkUtil {
     })
   }
 
+  // A MeasurementRecorder records latency measurements. See Recorder and
+  // BinaryRecorder.
+  trait MeasurementRecorder {
+    def record(
+        start: java.time.Instant,
+        stop: java.time.Instant,
+        latencyNanos: Long,
+        host: String,
+        port: Int
+    ): Unit
+
+    def flush(): Unit
+  }
+
   // Benchmark clients repeatedly issue requests to a service and record the
   // latency of each request. Aggregating these latency measurements, we can
   // compute statistics like average latency. Computing the rate of the
   // requests, we can compute statistics like average throughput.
-  class Recorder(filename: String) {
+  class Recorder(filename: String) extends MeasurementRecorder {
     val writer = CSVWriter.open(new java.io.File(filename))
     writer.writeRow(Seq("start", "stop", "latency_nanos", "host", "port"))
 
-    def record(
+    override def record(
         start: java.time.Instant,
         stop: java.time.Instant,
         latencyNanos: Long,
@@ -88,6 +107,75 @@ object BenchmarkUtil {
             port)
       )
     }
+
+    override def flush(): Unit = writer.flush()
+  }
+
+  // Some benchmarks run a driver that perturbs the protocol (e.g., kills a
+  // leader or reconfigures the acceptors) in the middle of the benchmark. An
+  // EventRecorder records when the driver triggers every such event, what kind
+  // of event it is, and which process it targets, so that we can measure how
+  // quickly the protocol recovers from it (see benchmarks/recovery_util.py).
+  class EventRecorder(filename: String) {
+    val writer = CSVWriter.open(new java.io.File(filename))
+    writer.writeRow(Seq("time", "kind", "role", "index"))
+    writer.flush()
+
+    def record(kind: String, role: String, index: Int): Unit = {
+      writer.writeRow(
+        Seq(java.time.Instant.now().toString(), kind, role, index.toString())
+      )
+      // Benchmarks kill the driver rather than stop it, so we flush every
+      // event as soon as we record it.
+      writer.flush()
+    }
+  }
+
+  // A LatencyHistogram is a sparse histogram of latencies with logarithmic
+  // buckets, similar to an HdrHistogram. A latency of x nanoseconds is counted
+  // in bucket ceil(log_gamma(x)) where gamma = (1 + a) / (1 - a) for a relative
+  // accuracy a, so every bucket spans a relative error of at most a.
+  // Histograms with the same relative accuracy can be merged by adding bucket
+  // counts, which is what benchmarks/recorder_util.py does. A histogram is
+  // written as "bucket:count;bucket:count;...".
+  class LatencyHistogram {
+    val buckets = mutable.SortedMap[Int, Int]()
+
+    def record(latencyNanos: Long): Unit = {
+      val bucket = Math
+        .ceil(
+          Math.log(Math.max(latencyNanos, 1L).toDouble) /
+            LatencyHistogram.LogGamma
+        )
+        .toInt
+      buckets(bucket) = buckets.getOrElse(bucket, 0) + 1
+    }
+
+    def clear(): Unit = buckets.clear()
+
+    override def toString(): String =
+      buckets.map({ case (bucket, count) => s"$bucket:$count" }).mkString(";")
+  }
+
+  object LatencyHistogram {
+    // This must match HISTOGRAM_RELATIVE_ACCURACY in
+    // benchmarks/recorder_util.py.
+    val RelativeAccuracy: Double = 0.01
+    val LogGamma: Double =
+      Math.log((1 + RelativeAccuracy) / (1 - RelativeAccuracy))
+  }
+
+  // A LabeledMeasurementRecorder records labeled latency measurements. See
+  // LabeledRecorder and BinaryRecorder.
+  trait LabeledMeasurementRecorder {
+    def record(
+        start: java.time.Instant,
+        stop: java.time.Instant,
+        latencyNanos: Long,
+        label: String
+    ): Unit
+
+    def flush(): Unit
   }
 
   // A LabeledRecorder is like a recorder, but each command is annotated with a
@@ -96,15 +184,20 @@ object BenchmarkUtil {
   // For systems with extremely high throughput, we can collapse measurements.
   // That is, clients can report multiple measurements as a single output. This
   // loses some fidelity but decreases data size and processing time.
-  // Measurements are grouped by label.
-  class LabeledRecorder(filename: String, groupSize: Int) {
+  // Measurements are grouped by label. The mean latency of a group says
+  // nothing about its tail, so every group also includes a LatencyHistogram
+  // of its latencies. Merging the histograms of every group gives accurate
+  // latency percentiles.
+  class LabeledRecorder(filename: String, groupSize: Int)
+      extends LabeledMeasurementRecorder {
     require(groupSize >= 1)
 
     case class Group(
         var count: Int = 0,
         var start: java.time.Instant = java.time.Instant.EPOCH,
         var stop: java.time.Instant = java.time.Instant.EPOCH,
-        var latencyNanosSum: Long = 0
+        var latencyNanosSum: Long = 0,
+        histogram: LatencyHistogram = new LatencyHistogram()
     )
     val groups = mutable.Map[String, Group]()
 
@@ -113,16 +206,26 @@ object BenchmarkUtil {
     //   - the start of the first request,
     //   - the stop time of the last request,
     //   - the number of measurements in the sample,
-    //   - the average latency of the measurements in the sample, and
-    //   - the label.
+    //   - the average latency of the measurements in the sample,
+    //   - the label, and
+    //   - a histogram of the latencies of the measurements in the sample. If
+    //     measurements are not grouped, the histogram is empty.
     val writer = CSVWriter.open(new java.io.File(filename))
-    writer.writeRow(Seq("start", "stop", "count", "latency_nanos", "label"))
+    writer.writeRow(
+      Seq("start",
+          "stop",
+          "count",
+          "latency_nanos",
+          "label",
+          "latency_histogram")
+    )
 
     private def resetGroup(group: Group): Unit = {
       group.count = 0
       group.start = java.time.Instant.EPOCH
       group.stop = java.time.Instant.EPOCH
       group.latencyNanosSum = 0
+      group.histogram.clear()
     }
 
     private def outputGroup(label: String, group: Group): Unit = {
@@ -131,11 +234,12 @@ object BenchmarkUtil {
             group.stop.toString(),
             group.count.toString(),
             (group.latencyNanosSum / group.count).toString(),
-            label)
+            label,
+            group.histogram.toString())
       )
     }
 
-    def record(
+    override def record(
         start: java.time.Instant,
         stop: java.time.Instant,
         latencyNanos: Long,
@@ -149,7 +253,8 @@ object BenchmarkUtil {
               stop.toString(),
               "1",
               latencyNanos.toString(),
-              label)
+              label,
+              "")
         )
         return
       }
@@ -161,6 +266,7 @@ object BenchmarkUtil {
       }
       group.stop = stop
       group.latencyNanosSum += latencyNanos
+      group.histogram.record(latencyNanos)
 
       if (group.count >= groupSize) {
         outputGroup(label, group)
@@ -169,7 +275,7 @@ object BenchmarkUtil {
     }
 
     // Flush any pending groups.
-    def flush(): Unit = {
+    override def flush(): Unit = {
       for ((label, group) <- groups) {
         if (group.count > 0) {
           outputGroup(label, group)
@@ -178,4 +284,134 @@ object BenchmarkUtil {
       }
     }
   }
+
+  // A BinaryRecorder is a Recorder or a LabeledRecorder that writes
+  // fixed-width binary records instead of CSV rows. Formatting timestamps and
+  // CSV rows costs clients a lot of CPU in the middle of a benchmark, and the
+  // resulting files are slow to parse. Measurements recorded with a host and
+  // port, as with a Recorder, are labeled "host:port". Measurements are never
+  // grouped, so a BinaryRecorder can't stand in for a LabeledRecorder with a
+  // groupSize larger than 1. A binary record is 29 little-endian bytes:
+  //
+  //   - int64 start time, in nanoseconds since the epoch,
+  //   - int64 stop time, in nanoseconds since the epoch,
+  //   - int32 count (always 1, since measurements are not grouped),
+  //   - int64 latency, in nanoseconds, and
+  //   - uint8 label id.
+  //
+  // The records follow a HeaderSize byte header that holds the label
+  // dictionary:
+  //
+  //   - the 8 byte magic string Magic,
+  //   - int32 HeaderSize,
+  //   - int32 number of labels, and
+  //   - for every label, in id order, an int16 length and its UTF-8 bytes.
+  //
+  // Labels are assigned ids as they are first recorded, and the header is
+  // rewritten in place whenever a new label is added. Records are buffered and
+  // written in bulk. benchmarks/pd_util.py reads these files with np.memmap.
+  class BinaryRecorder(filename: String)
+      extends MeasurementRecorder
+      with LabeledMeasurementRecorder {
+    private val channel = FileChannel.open(
+      new java.io.File(filename).toPath(),
+      StandardOpenOption.CREATE,
+      StandardOpenOption.TRUNCATE_EXISTING,
+      StandardOpenOption.WRITE
+    )
+    private val labels = mutable.Map[String, Int]()
+    private val labelBytes = mutable.Buffer[Array[Byte]]()
+    private val buffer = ByteBuffer
+      .allocateDirect(BinaryRecorder.RecordSize * 4096)
+      .order(ByteOrder.LITTLE_ENDIAN)
+
+    writeHeader()
+    channel.position(BinaryRecorder.HeaderSize)
+
+    private def writeHeader(): Unit = {
+      val header = ByteBuffer
+        .allocate(BinaryRecorder.HeaderSize)
+        .order(ByteOrder.LITTLE_ENDIAN)
+      header.put(BinaryRecorder.Magic)
+      header.putInt(BinaryRecorder.HeaderSize)
+      header.putInt(labelBytes.size)
+      for (bytes <- labelBytes) {
+        header.putShort(bytes.length.toShort)
+        header.put(bytes)
+      }
+      header.rewind()
+      var position = 0L
+      while (header.hasRemaining()) {
+        position += channel.write(header, position)
+      }
+    }
+
+    private def labelId(label: String): Int = {
+      labels.get(label) match {
+        case Some(id) => id
+        case None =>
+          val bytes = label.getBytes(StandardCharsets.UTF_8)
+          val headerSize = BinaryRecorder.Magic.length + 8 +
+            labelBytes.map(2 + _.length).sum + 2 + bytes.length
+          require(labels.size < 256, "A BinaryRecorder has at most 256 labels.")
+          require(headerSize <= BinaryRecorder.HeaderSize,
+                  "The BinaryRecorder labels do not fit in the header.")
+          val id = labels.size
+          labels(label) = id
+          labelBytes += bytes
+          writeHeader()
+          id
+      }
+    }
+
+    private def nanos(instant: java.time.Instant): Long =
+      instant.getEpochSecond() * 1000000000L + instant.getNano()
+
+    private def writeBuffer(): Unit = {
+      buffer.flip()
+      while (buffer.hasRemaining()) {
+        channel.write(buffer)
+      }
+      buffer.clear()
+    }
+
+    override def record(
+        start: java.time.Instant,
+        stop: java.time.Instant,
+        latencyNanos: Long,
+        label: String
+    ): Unit = {
+      val id = labelId(label)
+      if (buffer.remaining() < BinaryRecorder.RecordSize) {
+        writeBuffer()
+      }
+      buffer.putLong(nanos(start))
+      buffer.putLong(nanos(stop))
+      buffer.putInt(1)
+      buffer.putLong(latencyNanos)
+      buffer.put(id.toByte)
+    }
+
+    override def record(
+        start: java.time.Instant,
+        stop: java.time.Instant,
+        latencyNanos: Long,
+        host: String,
+        port: Int
+    ): Unit = {
+      record(start, stop, latencyNanos, s"$host:$port")
+    }
+
+    override def flush(): Unit = {
+      writeBuffer()
+      channel.force(false)
+    }
+  }
+
+  object BinaryRecorder {
+    // These must match benchmarks/pd_util.py.
+    val Magic: Array[Byte] = "FPREC001".getBytes(StandardCharsets.US_ASCII)
+    val HeaderSize: Int = 4096
+    val RecordSize: Int = 29
+  }
 }
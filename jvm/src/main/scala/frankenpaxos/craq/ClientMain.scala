@@ -40,6 +40,7 @@ object ClientMain extends App {
       timeout: Duration = 10 seconds,
       numClients: Int = 1,
       outputFilePrefix: String = "",
+      binaryRecorder: Boolean = false,
       workload: ReadWriteWorkload = new UniformReadWriteWorkload(1, 0, 1, 0),
       // Options.
       options: ClientOptions = ClientOptions.default
@@ -85,6 +86,23 @@ object ClientMain extends App {
       .action((x, f) => f.copy(numClients = x))
     opt[String]("output_file_prefix")
       .action((x, f) => f.copy(outputFilePrefix = x))
+    opt[Boolean]("binary_recorder")
+      .action((x, f) => f.copy(binaryRecorder = x))
+      .text(
+        s"Write <output_file_prefix>_data.bin instead of _data.csv. " +
+          s"Binary records can't be grouped, so measurement_group_size " +
+          s"must be 1"
+      )
+    checkConfig(f => {
+      if (f.binaryRecorder && f.measurementGroupSize > 1) {
+        failure(
+          "binary_recorder doesn't support a measurement_group_size larger " +
+            "than 1"
+        )
+      } else {
+        success
+      }
+    })
     opt[ReadWriteWorkload]("workload")
       .action((x, f) => f.copy(workload = x))
 
@@ -148,10 +166,15 @@ object ClientMain extends App {
     })
   }
 
-  val recorder = new BenchmarkUtil.LabeledRecorder(
-    s"${flags.outputFilePrefix}_data.csv",
-    groupSize = flags.measurementGroupSize
-  )
+  val recorder: BenchmarkUtil.LabeledMeasurementRecorder =
+    if (flags.binaryRecorder) {
+      new BenchmarkUtil.BinaryRecorder(s"${flags.outputFilePrefix}_data.bin")
+    } else {
+      new BenchmarkUtil.LabeledRecorder(
+        s"${flags.outputFilePrefix}_data.csv",
+        groupSize = flags.measurementGroupSize
+      )
+    }
   def run(pseudonym: Int, workload: ReadWriteWorkload): Future[Unit] = {
     implicit val context = transport.executionContext
     val (f, error, label) = workload.get() match {
@@ -43,6 +43,7 @@ object ClientMain extends App {
       numClients: Int = 1,
       workload: Workload = new StringWorkload(0, 0),
       outputFilePrefix: String = "",
+      binaryRecorder: Boolean = false,
       // Options.
       options: ClientOptions = ClientOptions.default
   )
@@ -89,6 +90,23 @@ object ClientMain extends App {
       .action((x, f) => f.copy(workload = x))
     opt[String]("output_file_prefix")
       .action((x, f) => f.copy(outputFilePrefix = x))
+    opt[Boolean]("binary_recorder")
+      .action((x, f) => f.copy(binaryRecorder = x))
+      .text(
+        s"Write <output_file_prefix>_data.bin instead of _data.csv. " +
+          s"Binary records can't be grouped, so measurement_group_size " +
+          s"must be 1"
+      )
+    checkConfig(f => {
+      if (f.binaryRecorder && f.measurementGroupSize > 1) {
+        failure(
+          "binary_recorder doesn't support a measurement_group_size larger " +
+            "than 1"
+        )
+      } else {
+        success
+      }
+    })
 
     // Options.
     opt[java.time.Duration]("options.resendClientRequestPeriod")
@@ -134,10 +152,15 @@ object ClientMain extends App {
       })
   }
 
-  val recorder = new BenchmarkUtil.LabeledRecorder(
-    s"${flags.outputFilePrefix}_data.csv",
-    groupSize = flags.measurementGroupSize
-  )
+  val recorder: BenchmarkUtil.LabeledMeasurementRecorder =
+    if (flags.binaryRecorder) {
+      new BenchmarkUtil.BinaryRecorder(s"${flags.outputFilePrefix}_data.bin")
+    } else {
+      new BenchmarkUtil.LabeledRecorder(
+        s"${flags.outputFilePrefix}_data.csv",
+        groupSize = flags.measurementGroupSize
+      )
+    }
   def run(pseudonym: Int): Future[Unit] = {
     implicit val context = transport.executionContext
     BenchmarkUtil
@@ -189,6 +212,8 @@ object ClientMain extends App {
       logger.warn(e.toString())
   }
 
+  recorder.flush()
+
   // Shut everything down.
   logger.info("Shutting down transport.")
   transport.shutdown()
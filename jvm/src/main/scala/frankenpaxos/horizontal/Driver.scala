@@ -2,6 +2,7 @@ package frankenpaxos.horizontal
 
 import collection.mutable
 import frankenpaxos.Actor
+import frankenpaxos.BenchmarkUtil
 import frankenpaxos.Chan
 import frankenpaxos.Logger
 import frankenpaxos.Serializer
@@ -32,7 +33,8 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
     transport: Transport,
     logger: Logger,
     config: Config[Transport],
-    workload: DriverWorkload
+    workload: DriverWorkload,
+    eventRecorder: Option[BenchmarkUtil.EventRecorder] = None
 ) extends Actor(address, transport, logger) {
   config.checkValid()
 
@@ -88,6 +90,11 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
     for (a <- config.replicaAddresses)
       yield chan[Replica[Transport]](a, Replica.serializer)
 
+  // Records that the driver triggered an event of kind `kind` targeting the
+  // `index`th process of role `role`.
+  private def event(kind: String, role: String, index: Int): Unit =
+    eventRecorder.foreach(_.record(kind, role, index))
+
   def randomSubset(n: Int, m: Int): Set[Int] = {
     Random
       .shuffle(List() ++ (0 until n))
@@ -157,6 +164,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
       workload.period,
       () => {
         logger.info("reconfigureTimer triggered")
+        event("reconfiguration", "leader", 0)
         reconfigure(0, Set() ++ (0 until (2 * config.f + 1)))
         reconfigureTimer.start()
       }
@@ -191,12 +199,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
           logger.info(
             "LeaderReconfiguration reconfiguration warmup triggered!"
           )
+          event("reconfiguration_warmup", "leader", 0)
           reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
         },
         onLast = () => {
           logger.info(
             "LeaderReconfiguration reconfiguration warmup triggered!"
           )
+          event("reconfiguration_warmup", "leader", 0)
           reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
         }
       )
@@ -208,10 +218,12 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
       n = workload.reconfigurationNum,
       f = () => {
         logger.info("LeaderReconfiguration reconfiguration triggered!")
+        event("reconfiguration", "leader", 0)
         reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
       },
       onLast = () => {
         logger.info("LeaderReconfiguration reconfiguration triggered!")
+        event("reconfiguration", "leader", 0)
         reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
       }
     )
@@ -221,6 +233,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
       workload.failureDelay,
       () => {
         logger.info("LeaderReconfiguration failure triggered!")
+        event("failure", "acceptor", 0)
         acceptors(0).send(AcceptorInbound().withDie(Die()))
       }
     )
@@ -231,6 +244,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
       workload.recoverDelay,
       () => {
         logger.info("LeaderReconfiguration recover triggered!")
+        event("recover", "leader", 0)
         reconfigure(0, Set() ++ (1 to 2 * config.f + 1))
       }
     )
@@ -259,6 +273,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
           logger.info(
             "LeaderFailure leader change warmup triggered!"
           )
+          event("leader_change_warmup", "leader", 1)
           // I found that we need to let the second leader get some warmup in,
           // so we actually just change to it again and again.
           becomeLeader(1)
@@ -267,6 +282,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
           logger.info(
             "LeaderFailure leader change warmup triggered!"
           )
+          event("leader_change_warmup", "leader", 0)
           becomeLeader(0)
         }
       )
@@ -276,6 +292,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
       workload.failureDelay,
       () => {
         logger.info("LeaderFailure failure triggered!")
+        event("failure", "leader", 0)
         leaders(0).send(LeaderInbound().withDie(Die()))
       }
     )
@@ -1,6 +1,7 @@
 package frankenpaxos.horizontal
 
 import frankenpaxos.Actor
+import frankenpaxos.BenchmarkUtil
 import frankenpaxos.Flags.durationRead
 import frankenpaxos.LogLevel
 import frankenpaxos.NettyTcpAddress
@@ -21,7 +22,8 @@ object DriverMain extends App {
       port: Int = 9000,
       configFile: File = new File("."),
       logLevel: frankenpaxos.LogLevel = frankenpaxos.LogDebug,
-      driverWorkload: DriverWorkload = DoNothing
+      driverWorkload: DriverWorkload = DoNothing,
+      eventsFile: Option[File] = None
   )
 
   val parser = new scopt.OptionParser[Flags]("") {
@@ -33,6 +35,9 @@ object DriverMain extends App {
     opt[DriverWorkload]("driver_workload")
       .required()
       .action((x, f) => f.copy(driverWorkload = x))
+    opt[File]("events_file")
+      .action((x, f) => f.copy(eventsFile = Some(x)))
+      .text("If set, the driver records the events it triggers to this file.")
   }
 
   // Parse flags.
@@ -51,6 +56,9 @@ object DriverMain extends App {
     transport = new NettyTcpTransport(logger),
     logger = logger,
     config = config,
-    workload = flags.driverWorkload
+    workload = flags.driverWorkload,
+    eventRecorder = flags.eventsFile.map(
+      f => new BenchmarkUtil.EventRecorder(f.getAbsolutePath())
+    )
   )
 }
@@ -2,6 +2,7 @@ package frankenpaxos.matchmakermultipaxos
 
 import collection.mutable
 import frankenpaxos.Actor
+import frankenpaxos.BenchmarkUtil
 import frankenpaxos.Chan
 import frankenpaxos.Logger
 import frankenpaxos.Serializer
@@ -29,7 +30,8 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
     transport: Transport,
     logger: Logger,
     config: Config[Transport],
-    workload: DriverWorkload
+    workload: DriverWorkload,
+    eventRecorder: Option[BenchmarkUtil.EventRecorder] = None
 ) extends Actor(address, transport, logger) {
   config.checkValid()
 
@@ -117,6 +119,11 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
     for (a <- config.replicaAddresses)
       yield chan[Replica[Transport]](a, Replica.serializer)
 
+  // Records that the driver triggered an event of kind `kind` targeting the
+  // `index`th process of role `role`.
+  private def event(kind: String, role: String, index: Int): Unit =
+    eventRecorder.foreach(_.record(kind, role, index))
+
   def randomSubset(n: Int, m: Int): Set[Int] = {
     Random
       .shuffle(List() ++ (0 until n))
@@ -193,6 +200,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
           workload.period,
           () => {
             logger.info("reconfigureTimer triggered")
+            event("reconfiguration", "leader", 0)
             leaders(0).send(
               LeaderInbound().withForceReconfiguration(
                 ForceReconfiguration(acceptorIndex = 0 until (2 * config.f + 1))
@@ -228,12 +236,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "LeaderReconfiguration reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
           },
           onLast = () => {
             logger.info(
               "LeaderReconfiguration reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
           }
         )
@@ -245,10 +255,12 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         n = workload.reconfigurationNum,
         f = () => {
           logger.info("LeaderReconfiguration reconfiguration triggered!")
+          event("reconfiguration", "leader", 0)
           reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
         },
         onLast = () => {
           logger.info("LeaderReconfiguration reconfiguration triggered!")
+          event("reconfiguration", "leader", 0)
           reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
         }
       )
@@ -258,6 +270,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.failureDelay,
         () => {
           logger.info("LeaderReconfiguration failure triggered!")
+          event("failure", "acceptor", 0)
           acceptors(0).send(AcceptorInbound().withDie(Die()))
         }
       )
@@ -268,6 +281,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.recoverDelay,
         () => {
           logger.info("LeaderReconfiguration recover triggered!")
+          event("recover", "leader", 0)
           reconfigure(0, Set() ++ (1 to 2 * config.f + 1))
         }
       )
@@ -293,12 +307,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "MatchmakerReconfiguration reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
           },
           onLast = () => {
             logger.info(
               "MatchmakerReconfiguration reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
           }
         )
@@ -314,6 +330,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "MatchmakerReconfiguration matchmaker reconfiguration triggered!"
             )
+            event("matchmaker_reconfiguration", "reconfigurer", 0)
             matchmakerReconfigure(
               0,
               randomSubset(matchmakers.size, 2 * config.f + 1)
@@ -323,6 +340,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "MatchmakerReconfiguration matchmaker reconfiguration triggered!"
             )
+            event("matchmaker_reconfiguration", "reconfigurer", 0)
             matchmakerReconfigure(0, Set() ++ (1 to 2 * config.f + 1))
           }
         )
@@ -332,6 +350,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.failureDelay,
         () => {
           logger.info("MatchmakerReconfiguration failure triggered!")
+          event("failure", "matchmaker", 2 * config.f + 1)
           matchmakers(2 * config.f + 1).send(MatchmakerInbound().withDie(Die()))
         }
       )
@@ -342,6 +361,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.recoverDelay,
         () => {
           logger.info("MatchmakerReconfiguration recover triggered!")
+          event("recover", "reconfigurer", 0)
           matchmakerReconfigure(0, Set() ++ (0 until 2 * config.f + 1))
         }
       )
@@ -352,6 +372,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.reconfigureDelay,
         () => {
           logger.info("MatchmakerReconfiguration reconfigure triggered!")
+          event("reconfiguration", "leader", 0)
           reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
         }
       )
@@ -379,12 +400,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "LeaderFailure leader change warmup triggered!"
             )
+            event("leader_change_warmup", "leader", 1)
             becomeLeader(1)
           },
           onLast = () => {
             logger.info(
               "LeaderFailure leader change warmup triggered!"
             )
+            event("leader_change_warmup", "leader", 0)
             becomeLeader(0)
           }
         )
@@ -394,6 +417,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.failureDelay,
         () => {
           logger.info("LeaderFailure failure triggered!")
+          event("failure", "leader", 0)
           leaders(0).send(LeaderInbound().withDie(Die()))
         }
       )
@@ -416,12 +440,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "Leader change warmup triggered!"
             )
+            event("leader_change_warmup", "leader", 1)
             becomeLeader(1)
           },
           onLast = () => {
             logger.info(
               "Leader change warmup triggered!"
             )
+            event("leader_change_warmup", "leader", 0)
             becomeLeader(0)
           }
         )
@@ -436,12 +462,14 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "Reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, randomSubset(acceptors.size, 2 * config.f + 1))
           },
           onLast = () => {
             logger.info(
               "Reconfiguration warmup triggered!"
             )
+            event("reconfiguration_warmup", "leader", 0)
             reconfigure(0, Set() ++ (0 until 2 * config.f + 1))
           }
         )
@@ -457,6 +485,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "Matchmaker reconfiguration warmup triggered!"
             )
+            event("matchmaker_reconfiguration_warmup", "reconfigurer", 0)
             matchmakerReconfigure(
               0,
               randomSubset(matchmakers.size, 2 * config.f + 1)
@@ -466,6 +495,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
             logger.info(
               "Matchmaker reconfiguration warmup triggered!"
             )
+            event("matchmaker_reconfiguration_warmup", "reconfigurer", 0)
             matchmakerReconfigure(0, Set() ++ (0 until 2 * config.f + 1))
           }
         )
@@ -475,6 +505,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.leaderFailureDelay,
         () => {
           logger.info("Leader failure triggered!")
+          event("failure", "leader", 0)
           leaders(0).send(LeaderInbound().withDie(Die()))
         }
       )
@@ -485,6 +516,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.acceptorFailureDelay,
         () => {
           logger.info("Acceptor failure triggered!")
+          event("failure", "acceptor", 0)
           acceptors(0).send(AcceptorInbound().withDie(Die()))
         }
       )
@@ -495,6 +527,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.matchmakerFailureDelay,
         () => {
           logger.info("Matchmaker failure triggered!")
+          event("failure", "matchmaker", 0)
           matchmakers(0).send(MatchmakerInbound().withDie(Die()))
         }
       )
@@ -505,6 +538,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.acceptorRecoverDelay,
         () => {
           logger.info("acceptor recover triggered!")
+          event("recover", "leader", 1)
           reconfigure(1, Set() ++ (1 to 2 * config.f + 1))
         }
       )
@@ -515,6 +549,7 @@ class Driver[Transport <: frankenpaxos.Transport[Transport]](
         workload.matchmakerRecoverDelay,
         () => {
           logger.info("matchmaker recover triggered!")
+          event("recover", "reconfigurer", 0)
           matchmakerReconfigure(0, Set() ++ (1 to 2 * config.f + 1))
         }
       )
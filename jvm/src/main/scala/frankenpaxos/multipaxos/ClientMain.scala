@@ -50,6 +50,7 @@ object ClientMain extends App {
       timeout: Duration = 10 seconds,
       numClients: Int = 1,
       outputFilePrefix: String = "",
+      binaryRecorder: Boolean = false,
       readConsistency: ReadConsistency = Linearizable,
       // Workload flags.
       //
@@ -121,6 +122,23 @@ object ClientMain extends App {
       .action((x, f) => f.copy(numClients = x))
     opt[String]("output_file_prefix")
       .action((x, f) => f.copy(outputFilePrefix = x))
+    opt[Boolean]("binary_recorder")
+      .action((x, f) => f.copy(binaryRecorder = x))
+      .text(
+        s"Write <output_file_prefix>_data.bin instead of _data.csv. " +
+          s"Binary records can't be grouped, so measurement_group_size " +
+          s"must be 1"
+      )
+    checkConfig(f => {
+      if (f.binaryRecorder && f.measurementGroupSize > 1) {
+        failure(
+          "binary_recorder doesn't support a measurement_group_size larger " +
+            "than 1"
+        )
+      } else {
+        success
+      }
+    })
     opt[ReadConsistency]("read_consistency")
       .action((x, f) => f.copy(readConsistency = x))
 
@@ -213,10 +231,15 @@ object ClientMain extends App {
     })
   }
 
-  val recorder = new BenchmarkUtil.LabeledRecorder(
-    s"${flags.outputFilePrefix}_data.csv",
-    groupSize = flags.measurementGroupSize
-  )
+  val recorder: BenchmarkUtil.LabeledMeasurementRecorder =
+    if (flags.binaryRecorder) {
+      new BenchmarkUtil.BinaryRecorder(s"${flags.outputFilePrefix}_data.bin")
+    } else {
+      new BenchmarkUtil.LabeledRecorder(
+        s"${flags.outputFilePrefix}_data.csv",
+        groupSize = flags.measurementGroupSize
+      )
+    }
   def run(pseudonym: Int, workload: ReadWriteWorkload): Future[Unit] = {
     implicit val context = transport.executionContext
     val (f, error, label) = (workload.get(), flags.readConsistency) match {
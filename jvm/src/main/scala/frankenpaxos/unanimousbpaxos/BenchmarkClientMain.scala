@@ -38,6 +38,7 @@ object BenchmarkClientMain extends App {
       numClients: Int = 1,
       workload: Workload = new StringWorkload(0, 0),
       outputFilePrefix: String = "",
+      binaryRecorder: Boolean = false,
       // Options.
       options: ClientOptions = ClientOptions.default
   )
@@ -74,6 +75,9 @@ object BenchmarkClientMain extends App {
       .action((x, f) => f.copy(workload = x))
     opt[String]("output_file_prefix")
       .action((x, f) => f.copy(outputFilePrefix = x))
+    opt[Boolean]("binary_recorder")
+      .action((x, f) => f.copy(binaryRecorder = x))
+      .text(s"Write <output_file_prefix>_data.bin instead of _data.csv")
 
     // Options.
     opt[java.time.Duration]("options.reproposePeriod")
@@ -104,8 +108,12 @@ object BenchmarkClientMain extends App {
   )
 
   // Run clients.
-  val recorder =
-    new BenchmarkUtil.Recorder(s"${flags.outputFilePrefix}_data.csv")
+  val recorder: BenchmarkUtil.MeasurementRecorder =
+    if (flags.binaryRecorder) {
+      new BenchmarkUtil.BinaryRecorder(s"${flags.outputFilePrefix}_data.bin")
+    } else {
+      new BenchmarkUtil.Recorder(s"${flags.outputFilePrefix}_data.csv")
+    }
   def run(pseudonym: Int): Future[Unit] = {
     implicit val context = transport.executionContext
     BenchmarkUtil
@@ -140,6 +148,8 @@ object BenchmarkClientMain extends App {
       logger.warn(e.toString())
   }
 
+  recorder.flush()
+
   // Shut everything down.
   logger.debug("Shutting down transport.")
   transport.shutdown()
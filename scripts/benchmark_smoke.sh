@@ -11,8 +11,7 @@ main() {
         echo "Running $protocol."
         python -m "benchmarks.${protocol}.smoke" \
             -m \
-            --cluster "benchmarks/${protocol}/local_cluster.json" \
-            -i ~/.ssh/id_rsa
+            --cluster "benchmarks/${protocol}/local_cluster.json"
         echo
     done
 }